@@ -1,10 +1,36 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import utils.config  # noqa: F401  (loads .env before any module reads its settings)
+
 from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 
 
-from routes import meal_plan, image_gen, ingredient_image_gen, meal_log, recipe_gen, analyze_image
+from routes import meal_plan, image_gen, ingredient_image_gen, meal_log, recipe_gen, analyze_image, image_batch, stats, jobs, metrics
+from utils.http_client import close_http_client
+from utils.image_variants import shutdown_variant_pool
+from utils.jobs import job_queue
+from utils.metrics import MetricsMiddleware
+from utils.services import services
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.services = services
+    # Serve health checks right away; heavy SDK imports finish in the background
+    warm = asyncio.create_task(services.warm())
+    job_queue.start()
+    yield
+    warm.cancel()
+    await job_queue.stop()
+    shutdown_variant_pool()
+    await services.aclose()
+    await close_http_client()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], 
@@ -21,6 +47,10 @@ app.include_router(ingredient_image_gen.router)
 app.include_router(meal_log.router)
 app.include_router(recipe_gen.router)
 app.include_router(analyze_image.router)
+app.include_router(image_batch.router)
+app.include_router(stats.router)
+app.include_router(jobs.router)
+app.include_router(metrics.router)
 
 
 
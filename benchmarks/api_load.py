@@ -0,0 +1,273 @@
+"""End-to-end load test of the API against benchmarks.fake_services (no network, no credentials).
+
+Starts the stand-in and a uvicorn worker pointed at it. Then it drives each
+endpoint in turn at --concurrency. For each endpoint it prints throughput,
+p50/p95/p99 latency, errors and the worker's RSS. Peak RSS is printed at the
+end.
+
+--variety is the number of distinct payloads per endpoint. A low value makes
+repeat requests hit the response, photo and image-URL caches; a value of
+--requests or more makes every request a miss. Quotas are lifted unless
+--real-quotas is given, so the numbers show the app and not the limiter.
+The worker's logs are discarded unless --server-log names a file.
+
+    python -m benchmarks.api_load
+    python -m benchmarks.api_load --endpoints meals,analyze --requests 500 --concurrency 64
+    python -m benchmarks.api_load --gemini-latency 2 --gemini-jitter 0.5 --gemini-error-rate 0.05 --variety 1000
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.fake_gemini import wait_for_port
+from benchmarks.fake_services import start_fake_services
+
+DISHES = ["chicken biryani", "grilled salmon", "vegetable stir fry", "lentil soup", "beef tacos",
+          "caesar salad", "mushroom risotto", "pancakes", "shakshuka", "pad thai"]
+SIDES = ["rice", "salad", "flatbread", "roast potatoes", "steamed greens"]
+INGREDIENTS = ["tomato", "spinach", "chickpea", "salmon", "egg", "rice", "quinoa", "avocado", "garlic",
+               "onion", "broccoli", "tofu", "lentil", "carrot", "bell pepper", "mushroom", "oats", "banana",
+               "yogurt", "almond", "paneer", "sweet potato", "cucumber", "lemon", "ginger"]
+MEAL_LOGS = ["{n} eggs and toast with butter", "chicken biryani with {n} cups of raita",
+             "a bowl of oatmeal with {n} bananas and honey", "grilled salmon, rice and {n} cups of salad"]
+
+
+def meal_plan_request(variant: int) -> dict:
+    return {
+        "meal_goal": ["weight loss", "muscle gain", "maintenance"][variant % 3],
+        "dietary_preferences": [["vegetarian"], [], ["high protein"]][variant % 3],
+        "allergies": [],
+        "region": ["India", "USA", "Mexico", "Italy"][variant % 4],
+        "activity_level": "moderate",
+        "age": 20 + variant % 50,
+        "gender": ["female", "male"][variant % 2],
+        "portion_size": "medium",
+        "cooking_experience": "intermediate",
+        "health_issues": [],
+        "eating_frequency": "3 meals",
+        "bmi": 22.5,
+        "bmi_category": "normal",
+        "is_pro": variant % 4 == 0,
+    }
+
+
+def regenerate_request(variant: int) -> dict:
+    slots = ["Breakfast", "Lunch", "Snack", "Dinner"]
+    meals = [{
+        "meal": slot,
+        "name": f"{DISHES[(variant + i) % len(DISHES)]} with {SIDES[i % len(SIDES)]}",
+        "ingredients": [{"name": ingredient_name(variant + i * 3 + j), "quantity": "100g"} for j in range(5)],
+        "calories": 450,
+        "cooking_instructions": ["Prepare the ingredients.", "Cook.", "Serve."],
+        "macros": {"protein": 25, "carbs": 50, "fats": 15},
+        "cooking_time": "20 minutes",
+        "difficulty": "easy",
+        "total_weight": "500g",
+    } for i, slot in enumerate(slots)]
+    return {**meal_plan_request(variant), "meals": meals, "replace_slot": slots[variant % len(slots)]}
+
+
+def photo(variant: int, side: int) -> str:
+    """A smooth random JPEG (so each variant has its own dHash) the size of a phone photo, base64-encoded."""
+    from PIL import Image
+
+    rng = random.Random(variant)
+    image = Image.frombytes("RGB", (8, 6), bytes(rng.randrange(256) for _ in range(8 * 6 * 3)))
+    buffer = io.BytesIO()
+    image.resize((side, side * 3 // 4), Image.Resampling.BICUBIC).save(buffer, "JPEG", quality=90)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def ingredient_name(variant: int) -> str:
+    name = INGREDIENTS[variant % len(INGREDIENTS)]
+    rounds = variant // len(INGREDIENTS)
+    return f"{name} variety {rounds}" if rounds else name
+
+
+ENDPOINTS = {
+    "meals": lambda v, args: ("POST", "/generate-meals", {"json": meal_plan_request(v)}),
+    "meals_week": lambda v, args: ("POST", "/generate-meals/week", {"json": meal_plan_request(v)}),
+    "regenerate_meal": lambda v, args: ("POST", "/regenerate-meal", {"json": regenerate_request(v)}),
+    "analyze": lambda v, args: ("POST", "/analyze-image", {"json": {"image_base64": photo(v, args.photo_side), "user_id": f"user-{v}"}}),
+    "meal_log": lambda v, args: ("POST", "/generate-meal-log-from-text",
+                                 {"json": {"meal_description": MEAL_LOGS[v % len(MEAL_LOGS)].format(n=1 + v // len(MEAL_LOGS))}}),
+    "recipe": lambda v, args: ("POST", "/generate-recipe-from-leftovers",
+                               {"json": {"ingredients": [ingredient_name(v), ingredient_name(v + 7), ingredient_name(v + 13)], "is_pro": False}}),
+    "meal_image": lambda v, args: ("GET", "/generate-meal-image",
+                                   {"params": {"meal_name": f"{DISHES[v % len(DISHES)]} with {SIDES[v // len(DISHES) % len(SIDES)]}"
+                                               + (f" {v // (len(DISHES) * len(SIDES))}" if v >= len(DISHES) * len(SIDES) else "")}}),
+    "ingredient_image": lambda v, args: ("GET", "/generate-ingredient-image", {"params": {"ingredient_name": ingredient_name(v)}}),
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _proc_status(pid: int, field: str) -> int:
+    """VmRSS / VmHWM of a process in bytes (0 where /proc isn't available)."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _children(pid: int) -> list:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            return [int(child) for child in children.read().split()]
+    except OSError:
+        return []
+
+
+def rss(pid: int) -> tuple:
+    """(worker RSS, RSS of its child processes, e.g. the image variant pool)."""
+    return _proc_status(pid, "VmRSS"), sum(_proc_status(child, "VmRSS") for child in _children(pid))
+
+
+async def drive(client: httpx.AsyncClient, name: str, args) -> dict:
+    # Build payloads up front so encoding photos isn't part of the measurement
+    requests = [ENDPOINTS[name](i % args.variety, args) for i in range(args.requests)]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, statuses = [], {}
+
+    async def one(method, path, kwargs):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(*request) for request in requests))
+    return {"wall": time.perf_counter() - started, "latencies": latencies, "statuses": statuses}
+
+
+def app_env(args, fake_url: str, state_dir: str) -> dict:
+    env = {
+        **os.environ,
+        "GEMINI_API_KEY": "fake-key",
+        "GEMINI_BASE_URL": fake_url,
+        "SUPABASE_URL": fake_url,
+        "SUPABASE_KEY": "fake-key",
+        "SPOONACULAR_BASE_URL": fake_url,
+        "SPOONACULAR_CDN_URL": fake_url,
+        "SPOONACULAR_API_KEY": "fake-key",
+        # Keep the run self-contained: in-process caches and queues, throwaway SQLite files
+        "REDIS_URL": "",
+        "JOBS_BACKEND": "memory",
+        "NAME_INDEX_PATH": os.path.join(state_dir, "name-index.sqlite3"),
+        # No template library, so /generate-meals measures the model path
+        "MEAL_TEMPLATES_PATH": os.path.join(state_dir, "meal-templates.sqlite3"),
+        "LOG_LEVEL": "WARNING",
+    }
+    if not args.real_quotas:
+        from utils.rate_limiter import GEMINI_RATE_LIMITS
+
+        unlimited = {"rpm": 1_000_000, "tpm": 1_000_000_000}
+        env["GEMINI_RATE_LIMITS"] = json.dumps({model: unlimited for model in GEMINI_RATE_LIMITS})
+        env["GEMINI_DEFAULT_RPM"] = str(unlimited["rpm"])
+        env["GEMINI_DEFAULT_TPM"] = str(unlimited["tpm"])
+        env["LLM_CONCURRENCY_INITIAL"] = env["LLM_CONCURRENCY_MAX"] = "1024"
+    return env
+
+
+def fake_settings(args) -> dict:
+    return {
+        "FAKE_GEMINI_LATENCY": args.gemini_latency,
+        "FAKE_GEMINI_JITTER": args.gemini_jitter,
+        "FAKE_GEMINI_ERROR_RATE": args.gemini_error_rate,
+        "FAKE_GEMINI_ARRAY_ITEMS": args.array_items,
+        "FAKE_IMAGE_BYTES": args.image_bytes,
+        "FAKE_STORAGE_LATENCY": args.storage_latency,
+        "FAKE_STORAGE_ERROR_RATE": args.storage_error_rate,
+        "FAKE_STORAGE_HIT_RATE": args.storage_hit_rate,
+        "FAKE_SPOONACULAR_LATENCY": args.spoonacular_latency,
+        "FAKE_SPOONACULAR_ERROR_RATE": args.spoonacular_error_rate,
+        "FAKE_SPOONACULAR_HIT_RATE": args.spoonacular_hit_rate,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help=f"comma-separated, from: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--variety", type=int, default=50, help="distinct payloads per endpoint")
+    parser.add_argument("--photo-side", type=int, default=2048, help="width of the photos sent to /analyze-image (px)")
+    parser.add_argument("--real-quotas", action="store_true", help="keep the production Gemini rate limits")
+    parser.add_argument("--gemini-latency", type=float, default=1.0, help="median seconds per generateContent")
+    parser.add_argument("--gemini-jitter", type=float, default=0.3, help="log-normal sigma on that latency")
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--array-items", type=int, default=3, help="entries per array in structured responses")
+    parser.add_argument("--image-bytes", type=int, default=300 * 1024, help="size of generated/stored images")
+    parser.add_argument("--storage-latency", type=float, default=0.03)
+    parser.add_argument("--storage-error-rate", type=float, default=0.0)
+    parser.add_argument("--storage-hit-rate", type=float, default=0.5, help="share of images already in storage")
+    parser.add_argument("--spoonacular-latency", type=float, default=0.15)
+    parser.add_argument("--spoonacular-error-rate", type=float, default=0.0)
+    parser.add_argument("--spoonacular-hit-rate", type=float, default=0.8)
+    parser.add_argument("--server-log", help="write the worker's stderr here instead of discarding it")
+    parser.add_argument("--port", type=int, default=8793)
+    parser.add_argument("--fake-port", type=int, default=8794)
+    args = parser.parse_args()
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    fake = start_fake_services(args.fake_port, fake_settings(args))
+    with tempfile.TemporaryDirectory() as state_dir, open(args.server_log or os.devnull, "w") as server_log:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"],
+            env=app_env(args, f"http://127.0.0.1:{args.fake_port}", state_dir),
+            stderr=server_log,
+        )
+        try:
+            wait_for_port(args.port)
+            print(f"{'endpoint':<17} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'rss MB':>8} {'pool MB':>8}")
+
+            async def run_all():
+                limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+                async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=120, limits=limits) as client:
+                    for name in endpoints:
+                        result = await drive(client, name, args)
+                        latencies = result["latencies"]
+                        errors = sum(count for status, count in result["statuses"].items() if not (isinstance(status, int) and status < 400))
+                        worker_rss, pool_rss = rss(server.pid)
+                        print(f"{name:<17} {len(latencies) / result['wall']:>8.1f} "
+                              f"{percentile(latencies, 0.50) * 1000:>9.0f} {percentile(latencies, 0.95) * 1000:>9.0f} "
+                              f"{percentile(latencies, 0.99) * 1000:>9.0f} {errors:>7} "
+                              f"{worker_rss / 2 ** 20:>8.0f} {pool_rss / 2 ** 20:>8.0f}", flush=True)
+                        if errors:
+                            print(f"  statuses: {result['statuses']}")
+
+            asyncio.run(run_all())
+            print(f"peak worker RSS: {_proc_status(server.pid, 'VmHWM') / 2 ** 20:.0f} MB")
+        finally:
+            server.terminate()
+            server.wait()
+            fake.terminate()
+
+
+if __name__ == "__main__":
+    main()
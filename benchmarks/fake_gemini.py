@@ -0,0 +1,145 @@
+"""Minimal stand-in for the Gemini REST API used by the benchmark harnesses.
+
+Structured requests (responseSchema) get a schema-shaped dummy object back,
+with FAKE_GEMINI_ARRAY_ITEMS entries in every array; image requests
+(responseModalities IMAGE) get a noise PNG of about FAKE_IMAGE_BYTES; plain
+text requests get "yes". Latency is FAKE_GEMINI_LATENCY seconds, scaled by a
+log-normal factor with sigma FAKE_GEMINI_JITTER, and FAKE_GEMINI_ERROR_RATE of
+calls fail with 503 UNAVAILABLE. Context caches can be created and extended
+but are not otherwise simulated.
+
+Run standalone with:
+    uvicorn benchmarks.fake_gemini:app --port 8765
+"""
+import asyncio
+import base64
+import functools
+import io
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+
+FAKE_GEMINI_LATENCY = float(os.getenv('FAKE_GEMINI_LATENCY', '2.0'))
+FAKE_GEMINI_JITTER = float(os.getenv('FAKE_GEMINI_JITTER', '0'))
+FAKE_GEMINI_ERROR_RATE = float(os.getenv('FAKE_GEMINI_ERROR_RATE', '0'))
+FAKE_GEMINI_ARRAY_ITEMS = int(os.getenv('FAKE_GEMINI_ARRAY_ITEMS', '2'))
+# Generated images, and the stand-in Spoonacular/storage images in fake_services
+FAKE_IMAGE_BYTES = int(os.getenv('FAKE_IMAGE_BYTES', str(300 * 1024)))
+
+
+def sample_from_schema(schema: dict):
+    kind = schema.get("type", "OBJECT").upper()
+    if kind == "OBJECT":
+        return {name: sample_from_schema(prop) for name, prop in schema.get("properties", {}).items()}
+    if kind == "ARRAY":
+        return [sample_from_schema(schema.get("items", {})) for _ in range(FAKE_GEMINI_ARRAY_ITEMS)]
+    if kind == "INTEGER":
+        return 100
+    if kind == "NUMBER":
+        return 1.5
+    if kind == "BOOLEAN":
+        return True
+    return "sample"
+
+
+@functools.lru_cache(maxsize=8)
+def noise_png(size: int) -> bytes:
+    """A PNG of roughly `size` bytes; random pixels don't compress, so decoding and resizing cost what a photo would."""
+    from PIL import Image
+
+    side = max(16, int((size / 3) ** 0.5))
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (side, side), random.randbytes(side * side * 3)).save(buffer, "PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def response_body(text: str = None, image: bytes = None) -> bytes:
+    parts = [{"text": text}] if text is not None else []
+    if image is not None:
+        parts.append({"inlineData": {"mimeType": "image/png", "data": base64.b64encode(image).decode()}})
+    return json.dumps({
+        "candidates": [
+            {
+                "content": {"role": "model", "parts": parts},
+                "finishReason": "STOP",
+            }
+        ],
+        "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 5, "totalTokenCount": 15},
+    }).encode()
+
+
+# Pre-serialized so the stand-in spends as little CPU per request as possible
+TEXT_RESPONSE_BODY = response_body("yes")
+ERROR_BODY = json.dumps({"error": {"code": 503, "message": "The model is overloaded.", "status": "UNAVAILABLE"}}).encode()
+
+
+async def generate_content(request):
+    body = json.loads(await request.body() or b"{}")
+    await asyncio.sleep(FAKE_GEMINI_LATENCY * random.lognormvariate(0, FAKE_GEMINI_JITTER))
+    if random.random() < FAKE_GEMINI_ERROR_RATE:
+        return Response(ERROR_BODY, status_code=503, media_type="application/json")
+    config = body.get("generationConfig", {})
+    if "IMAGE" in config.get("responseModalities", []):
+        return Response(response_body("Here is your image.", noise_png(FAKE_IMAGE_BYTES)), media_type="application/json")
+    schema = config.get("responseSchema")
+    if schema is None:
+        return Response(TEXT_RESPONSE_BODY, media_type="application/json")
+    return Response(response_body(json.dumps(sample_from_schema(schema))), media_type="application/json")
+
+
+_cache_ids = itertools.count(1)
+
+
+def cached_content_body(name: str, model: str, ttl: str) -> bytes:
+    expire = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + float(ttl.rstrip("s") or 0)))
+    return json.dumps({"name": name, "model": model, "expireTime": expire}).encode()
+
+
+async def create_cached_content(request):
+    body = json.loads(await request.body() or b"{}")
+    name = f"cachedContents/fake-{next(_cache_ids)}"
+    return Response(cached_content_body(name, body.get("model", ""), body.get("ttl", "3600s")), media_type="application/json")
+
+
+async def update_cached_content(request):
+    body = json.loads(await request.body() or b"{}")
+    name = f"cachedContents/{request.path_params['cache_id']}"
+    return Response(cached_content_body(name, "", body.get("ttl", "3600s")), media_type="application/json")
+
+
+ROUTES = [
+    Route("/{api_version}/models/{model}:generateContent", generate_content, methods=["POST"]),
+    Route("/{api_version}/cachedContents", create_cached_content, methods=["POST"]),
+    Route("/{api_version}/cachedContents/{cache_id}", update_cached_content, methods=["PATCH"]),
+]
+
+app = Starlette(routes=ROUTES)
+
+
+def start_fake_gemini(port: int, latency: float, jitter: float = 0.0) -> subprocess.Popen:
+    """Run the stand-in in a child process (so it doesn't share the client's GIL) and wait until it listens."""
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.fake_gemini:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, "FAKE_GEMINI_LATENCY": str(latency), "FAKE_GEMINI_JITTER": str(jitter)},
+    )
+    wait_for_port(port)
+    return server
+
+
+def wait_for_port(port: int):
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
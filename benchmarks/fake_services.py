@@ -0,0 +1,134 @@
+"""Local stand-in for every upstream the API talks to: Gemini, Supabase Storage and Spoonacular.
+
+One server answers all three, so GEMINI_BASE_URL, SUPABASE_URL,
+SPOONACULAR_BASE_URL and SPOONACULAR_CDN_URL can all point at it. Gemini is
+simulated by benchmarks.fake_gemini (same FAKE_GEMINI_* settings). Storage
+and Spoonacular each have a median latency, a log-normal jitter (sigma), an
+error rate, and a hit rate:
+
+  FAKE_STORAGE_LATENCY / _JITTER / _ERROR_RATE
+  FAKE_STORAGE_HIT_RATE        share of never-uploaded objects that exist anyway
+  FAKE_SPOONACULAR_LATENCY / _JITTER / _ERROR_RATE
+  FAKE_SPOONACULAR_HIT_RATE    share of ingredient searches with a result
+  FAKE_SPOONACULAR_IMAGE_BYTES size of the CDN thumbnails
+
+Hits are decided by hashing the object path or query, so repeated lookups get
+the same answer. Storage remembers what was uploaded (names only). Every
+object is served as a FAKE_IMAGE_BYTES noise PNG.
+
+Run standalone with:
+    uvicorn benchmarks.fake_services:app --port 8794
+"""
+import asyncio
+import hashlib
+import os
+import random
+import subprocess
+import sys
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from benchmarks import fake_gemini
+from benchmarks.fake_gemini import FAKE_IMAGE_BYTES, noise_png, wait_for_port
+
+FAKE_STORAGE_LATENCY = float(os.getenv('FAKE_STORAGE_LATENCY', '0.03'))
+FAKE_STORAGE_JITTER = float(os.getenv('FAKE_STORAGE_JITTER', '0.3'))
+FAKE_STORAGE_ERROR_RATE = float(os.getenv('FAKE_STORAGE_ERROR_RATE', '0'))
+FAKE_STORAGE_HIT_RATE = float(os.getenv('FAKE_STORAGE_HIT_RATE', '0.5'))
+
+FAKE_SPOONACULAR_LATENCY = float(os.getenv('FAKE_SPOONACULAR_LATENCY', '0.15'))
+FAKE_SPOONACULAR_JITTER = float(os.getenv('FAKE_SPOONACULAR_JITTER', '0.3'))
+FAKE_SPOONACULAR_ERROR_RATE = float(os.getenv('FAKE_SPOONACULAR_ERROR_RATE', '0'))
+FAKE_SPOONACULAR_HIT_RATE = float(os.getenv('FAKE_SPOONACULAR_HIT_RATE', '0.8'))
+FAKE_SPOONACULAR_IMAGE_BYTES = int(os.getenv('FAKE_SPOONACULAR_IMAGE_BYTES', str(8 * 1024)))
+
+_uploaded = set()
+
+
+def _hit(key: str, rate: float) -> bool:
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64 < rate
+
+
+async def _delay(latency: float, jitter: float):
+    await asyncio.sleep(latency * random.lognormvariate(0, jitter))
+
+
+def _failed(rate: float) -> bool:
+    return random.random() < rate
+
+
+def _image(request, size: int) -> Response:
+    png = noise_png(size)
+    body = b"" if request.method == "HEAD" else png
+    return Response(body, media_type="image/png", headers={"Content-Length": str(len(png))})
+
+
+async def storage_public_object(request):
+    await _delay(FAKE_STORAGE_LATENCY, FAKE_STORAGE_JITTER)
+    if _failed(FAKE_STORAGE_ERROR_RATE):
+        return JSONResponse({"error": "Internal Server Error"}, status_code=500)
+    key = f"{request.path_params['bucket']}/{request.path_params['path']}"
+    if key not in _uploaded and not _hit(key, FAKE_STORAGE_HIT_RATE):
+        return JSONResponse({"statusCode": "404", "error": "not_found", "message": "Object not found"}, status_code=400)
+    return _image(request, FAKE_IMAGE_BYTES)
+
+
+async def storage_upload(request):
+    await request.body()
+    await _delay(FAKE_STORAGE_LATENCY, FAKE_STORAGE_JITTER)
+    if _failed(FAKE_STORAGE_ERROR_RATE):
+        return JSONResponse({"error": "Internal Server Error"}, status_code=500)
+    key = f"{request.path_params['bucket']}/{request.path_params['path']}"
+    if key in _uploaded and request.headers.get("x-upsert") != "true":
+        return JSONResponse({"statusCode": "409", "error": "Duplicate", "message": "The resource already exists"}, status_code=400)
+    _uploaded.add(key)
+    return JSONResponse({"Key": key})
+
+
+async def spoonacular_search(request):
+    await _delay(FAKE_SPOONACULAR_LATENCY, FAKE_SPOONACULAR_JITTER)
+    if _failed(FAKE_SPOONACULAR_ERROR_RATE):
+        return JSONResponse({"status": "failure", "message": "Internal error"}, status_code=500)
+    query = request.query_params.get("query", "")
+    if not _hit(query, FAKE_SPOONACULAR_HIT_RATE):
+        return JSONResponse({"results": [], "offset": 0, "number": 10, "totalResults": 0})
+    slug = query.replace(" ", "-").lower()
+    return JSONResponse({
+        "results": [{"id": 1, "name": query, "image": f"{slug}.jpg"}],
+        "offset": 0,
+        "number": 10,
+        "totalResults": 1,
+    })
+
+
+async def spoonacular_cdn(request):
+    await _delay(FAKE_SPOONACULAR_LATENCY / 3, FAKE_SPOONACULAR_JITTER)
+    if _failed(FAKE_SPOONACULAR_ERROR_RATE):
+        return Response(status_code=502)
+    return _image(request, FAKE_SPOONACULAR_IMAGE_BYTES)
+
+
+app = Starlette(routes=[
+    *fake_gemini.ROUTES,
+    Route("/storage/v1/object/public/{bucket}/{path:path}", storage_public_object, methods=["GET", "HEAD"]),
+    Route("/storage/v1/object/{bucket}/{path:path}", storage_upload, methods=["POST"]),
+    Route("/food/ingredients/search", spoonacular_search, methods=["GET"]),
+    Route("/cdn/ingredients_100x100/{name}", spoonacular_cdn, methods=["GET", "HEAD"]),
+])
+
+
+def start_fake_services(port: int, settings: dict = None) -> subprocess.Popen:
+    """Run the stand-in in a child process and wait until it listens.
+
+    `settings` overrides the FAKE_* variables, e.g. {"FAKE_GEMINI_LATENCY": 1.5}.
+    """
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.fake_services:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, **{name: str(value) for name, value in (settings or {}).items()}},
+    )
+    wait_for_port(port)
+    return server
@@ -0,0 +1,76 @@
+"""Compare meal-log latency across the meal-log pipelines.
+
+Runs generate_meal_log_from_text against the fake Gemini server with
+MEAL_LOG_VALIDATION_MODE=two_call, =single, and with the local nutrition
+table enabled ("local"), and prints p50/p95 per mode.
+
+    python -m benchmarks.meal_log_latency --requests 100 --concurrency 20 --latency 1.5 --jitter 0.3
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.fake_gemini import start_fake_gemini
+
+DESCRIPTIONS = [
+    "2 eggs and toast with butter",
+    "chicken biryani with raita",
+    "a bowl of oatmeal with banana and honey",
+    "grilled salmon, rice and salad",
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run_mode(mode: str, requests: int, concurrency: int):
+    from utils import meal_log_utils
+
+    # The sample descriptions are all in data/nutrition.csv, so "local" never calls the model
+    meal_log_utils.MEAL_LOG_LOCAL_NUTRITION = mode == "local"
+    meal_log_utils.MEAL_LOG_VALIDATION_MODE = "two_call" if mode == "two_call" else "single"
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            result = await meal_log_utils.generate_meal_log_from_text(DESCRIPTIONS[i % len(DESCRIPTIONS)])
+            if not isinstance(result, dict):
+                raise RuntimeError(f"meal log failed: {result.body.decode()}")
+            return time.perf_counter() - started
+
+    return await asyncio.gather(*(one(i) for i in range(requests)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=1.5, help="median fake Gemini latency per call (s)")
+    parser.add_argument("--jitter", type=float, default=0.3, help="log-normal sigma applied to the latency")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    server = start_fake_gemini(args.port, args.latency, args.jitter)
+    os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+    async def run_all():
+        # One event loop for both modes: the gateway's pooled client is bound to the loop it was created on
+        return {mode: await run_mode(mode, args.requests, args.concurrency) for mode in ("two_call", "single", "local")}
+
+    try:
+        results = asyncio.run(run_all())
+        print(f"{'mode':<10} {'p50 ms':>10} {'p95 ms':>10} {'mean ms':>10}")
+        for mode, latencies in results.items():
+            print(f"{mode:<10} {percentile(latencies, 0.5) * 1000:>10.1f} {percentile(latencies, 0.95) * 1000:>10.1f} "
+                  f"{statistics.mean(latencies) * 1000:>10.1f}")
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Cold-start benchmark: how long until a fresh worker can serve.
+
+Measures, with no network access and no real credentials:
+  * import time of app.main in fresh interpreters (median of --imports runs)
+  * time from spawning uvicorn until it answers a cheap request (/stats/cache)
+  * latency of the first LLM-backed request (/generate-recipe-from-leftovers,
+    answered by the local fake Gemini with no added latency), which is where
+    lazily imported SDKs are paid for if they haven't been warmed yet
+  * latency of a second such request, for comparison
+
+    python -m benchmarks.startup_time
+    python -m benchmarks.startup_time --imports 10 --no-warm
+    python -m benchmarks.startup_time --delay 1   # traffic arrives a second after the worker is up
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.fake_gemini import start_fake_gemini
+
+RECIPE_REQUEST = {"ingredients": ["rice", "egg", "spinach"], "is_pro": False}
+
+
+def _env(gemini_port: int, warm: bool) -> dict:
+    env = {
+        **os.environ,
+        "GEMINI_API_KEY": "fake-key",
+        "GEMINI_BASE_URL": f"http://127.0.0.1:{gemini_port}",
+        # Nothing in this benchmark touches storage; the URL only has to parse
+        "SUPABASE_URL": os.getenv("SUPABASE_URL", "http://127.0.0.1:9"),
+        "SUPABASE_KEY": os.getenv("SUPABASE_KEY", "fake-key"),
+        "LOG_LEVEL": "WARNING",
+    }
+    if not warm:
+        env["SERVICES_WARM_IMPORTS"] = ""
+        env["SERVICES_WARM_CLIENTS"] = ""
+    return env
+
+
+def measure_import(runs: int, env: dict) -> list:
+    code = "import time; s = time.perf_counter(); import app.main; print(time.perf_counter() - s)"
+    return [float(subprocess.check_output([sys.executable, "-c", code], env=env).strip()) for _ in range(runs)]
+
+
+def measure_first_requests(port: int, env: dict, delay: float) -> dict:
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            while True:
+                try:
+                    if client.get("/stats/cache").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited before serving")
+                time.sleep(0.01)
+            ready = time.perf_counter() - started
+
+            timings = {"ready": ready}
+            time.sleep(delay)
+            for label in ("first_llm_request", "second_llm_request"):
+                request_started = time.perf_counter()
+                response = client.post("/generate-recipe-from-leftovers", json=RECIPE_REQUEST)
+                response.raise_for_status()
+                timings[label] = time.perf_counter() - request_started
+            return timings
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imports", type=int, default=5, help="fresh interpreters to time `import app.main` in")
+    parser.add_argument("--port", type=int, default=8791)
+    parser.add_argument("--gemini-port", type=int, default=8792)
+    parser.add_argument("--no-warm", action="store_true", help="disable background warm-up of heavy imports")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds between ready and the first LLM request")
+    args = parser.parse_args()
+
+    gemini = start_fake_gemini(args.gemini_port, latency=0.0)
+    try:
+        env = _env(args.gemini_port, warm=not args.no_warm)
+        imports = measure_import(args.imports, env)
+        timings = measure_first_requests(args.port, env, args.delay)
+    finally:
+        gemini.terminate()
+
+    print(f"import app.main:     {statistics.median(imports) * 1000:.0f}ms median, {min(imports) * 1000:.0f}ms best ({len(imports)} runs)")
+    print(f"spawn -> ready:      {timings['ready'] * 1000:.0f}ms")
+    print(f"first LLM request:   {timings['first_llm_request'] * 1000:.0f}ms")
+    print(f"second LLM request:  {timings['second_llm_request'] * 1000:.0f}ms")
+    print(f"warm-up:             {'off' if args.no_warm else 'on'}, first request {args.delay:.1f}s after ready")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,74 +1,161 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import ValidationError
+from starlette.datastructures import UploadFile
 import base64
-from io import BytesIO
-from PIL import Image
-from google import genai
-import re
-import json
 import os
-from dotenv import load_dotenv
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+from typing import Optional
+
+from schemas.analyze_image_model import AnalyzeImageRequest, ImageAnalysis
+from utils.prompts import IMAGE_ANALYSIS_SYSTEM_PROMPT, generate_ai_analysis_prompt
+from utils.llm_gateway import structured_config, parse_structured
+from utils.model_router import routed_generate
+from utils.image_processing import prepare_image_for_model, image_dhash
+from utils.photo_cache import PhotoAnalysisCache
+from utils.metrics import stage
+from utils.log import get_logger
 
-from utils.prompts import generate_ai_analysis_prompt
+# Hard cap on uploaded photo size; bodies up to UPLOAD_SPOOL_MEMORY stay in RAM, the rest spills to disk
+ANALYZE_IMAGE_MAX_BYTES = int(os.getenv('ANALYZE_IMAGE_MAX_BYTES', str(15 * 1024 * 1024)))
+UPLOAD_SPOOL_MEMORY = 1024 * 1024
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 16 * 1024
 
-load_dotenv()
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+# Near-duplicate photos (same plate re-sent, retried upload) reuse the earlier analysis
+ANALYZE_IMAGE_DEDUPE = os.getenv('ANALYZE_IMAGE_DEDUPE', 'true').lower() == 'true'
+# Max differing dHash bits (of 64) for two photos to count as the same
+ANALYZE_IMAGE_DEDUPE_DISTANCE = int(os.getenv('ANALYZE_IMAGE_DEDUPE_DISTANCE', '4'))
+# When true, a photo only matches the same user's earlier uploads, and requests without a user_id
+# skip dedupe. Turning it off shares analyses across all users.
+ANALYZE_IMAGE_DEDUPE_PER_USER = os.getenv('ANALYZE_IMAGE_DEDUPE_PER_USER', 'true').lower() == 'true'
+ANALYZE_IMAGE_DEDUPE_TTL = float(os.getenv('ANALYZE_IMAGE_DEDUPE_TTL', str(24 * 60 * 60)))
+ANALYZE_IMAGE_DEDUPE_SIZE = int(os.getenv('ANALYZE_IMAGE_DEDUPE_SIZE', '100000'))
+
+photo_analysis_cache = PhotoAnalysisCache(
+    "analyze_image",
+    max_entries=ANALYZE_IMAGE_DEDUPE_SIZE,
+    max_distance=ANALYZE_IMAGE_DEDUPE_DISTANCE,
+    ttl=ANALYZE_IMAGE_DEDUPE_TTL,
+)
 
 router = APIRouter()
 
-# Configure Gemini API
-client = genai.Client(api_key=GEMINI_API_KEY)
+log = get_logger(__name__)
+
+
+def dedupe_scope(user_id: Optional[str]) -> Optional[str]:
+    """Cache scope for this caller's photos, or None to skip dedupe (no user_id to scope by)."""
+    if not ANALYZE_IMAGE_DEDUPE_PER_USER:
+        return "global"
+    return f"user:{user_id}" if user_id else None
+
+
+async def analyze_prepared_image(image_jpeg: bytes, user_id: Optional[str] = None):
+    scope = dedupe_scope(user_id) if ANALYZE_IMAGE_DEDUPE else None
+    if scope is not None:
+        photo_hash = await image_dhash(image_jpeg)
+        cached = photo_analysis_cache.get(scope, photo_hash)
+        if cached is not None:
+            log.info("near-duplicate photo, returning cached analysis", extra={"user_id": user_id})
+            return cached
+
+    from google.genai import types
+
+    with stage("prompt_build"):
+        prompt = generate_ai_analysis_prompt()
+
+    response = await routed_generate(
+        "analyze_image",
+        contents=[types.Part.from_bytes(data=image_jpeg, mime_type="image/jpeg"), prompt],
+        config=structured_config(ImageAnalysis, system_instruction=IMAGE_ANALYSIS_SYSTEM_PROMPT),
+    )
+
+    try:
+        parsed = parse_structured(response, ImageAnalysis).model_dump()
+    except ValidationError as e:
+        log.warning("image analysis did not match the schema", extra={"error": str(e)})
+        return {
+            "error": "Unable to detect a valid meal in the image.",
+            "invalid_input": True
+        }
+
+    if not parsed.get("meal_data") or not parsed["meal_data"].get("name"):
+        log.warning("image analysis has no meal name")
+        return {
+            "error": "Could not confidently identify food in this image.",
+            "invalid_input": True
+        }
+
+    if scope is not None:
+        photo_analysis_cache.set(scope, photo_hash, parsed)
+
+    return parsed
 
-class AnalyzeImageRequest(BaseModel):
-    image_base64: str
 
 @router.post("/analyze-image")
 async def analyze_image(payload: AnalyzeImageRequest):
     try:
-        print("📥 Step 1: Decode base64 image")
-        image_data = base64.b64decode(payload.image_base64)
-        image = Image.open(BytesIO(image_data))
-        max_width = 800
-
-        if image.width > max_width:
-            ratio = max_width / float(image.width)
-            new_height = int(float(image.height) * ratio)
-            image = image.resize((max_width, new_height), Image.Resampling.LANCZOS)
-            print(f"📐 Image resized to: {image.size}")
-
-        print("🧠 Step 2: Build prompt")
-        prompt = generate_ai_analysis_prompt()
+        with stage("image_decode"):
+            image_data = base64.b64decode(payload.image_base64)
+        image_jpeg = await prepare_image_for_model(BytesIO(image_data))
+        return await analyze_prepared_image(image_jpeg, payload.user_id)
+
+    except Exception as e:
+        log.exception("image analysis failed")
+        raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
-        print("📤 Step 3: Send image + prompt to Gemini")
-        response = client.models.generate_content(
-            model="gemini-2.5-pro-preview-03-25",  
-            contents=[image, prompt]
-        )
 
-        print("📥 Step 4: Extract JSON from Gemini response")
-        response_text = response.text.strip()
-        print("📤 Gemini Response:\n", response_text)
+async def _read_upload(request: Request):
+    """Return the uploaded image as a spooled file, enforcing ANALYZE_IMAGE_MAX_BYTES."""
+    content_type = request.headers.get("content-type", "")
+    content_length = request.headers.get("content-length")
 
-        match = re.search(r'{.*}', response_text, re.DOTALL)
-        if not match:
-            print("⚠️ No JSON found")
-            return {
-                "error": "Unable to detect a valid meal in the image.",
-                "invalid_input": True
-            }
+    if content_type.startswith("image/"):
+        if content_length and int(content_length) > ANALYZE_IMAGE_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Image too large")
+        spooled = SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MEMORY)
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > ANALYZE_IMAGE_MAX_BYTES:
+                spooled.close()
+                raise HTTPException(status_code=413, detail="Image too large")
+            spooled.write(chunk)
+        spooled.seek(0)
+        return spooled
 
-        parsed = json.loads(match.group())
+    if content_type.startswith("multipart/form-data"):
+        # The multipart parser spools to disk on its own; a declared length is what bounds it
+        if not content_length:
+            raise HTTPException(status_code=411, detail="Content-Length required for multipart uploads")
+        if int(content_length) > ANALYZE_IMAGE_MAX_BYTES + MULTIPART_OVERHEAD:
+            raise HTTPException(status_code=413, detail="Image too large")
+        form = await request.form(max_files=1, max_fields=5)
+        upload = form.get("image") or form.get("file")
+        if not isinstance(upload, UploadFile):
+            raise HTTPException(status_code=400, detail="Expected an 'image' file field")
+        if upload.size is not None and upload.size > ANALYZE_IMAGE_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Image too large")
+        return upload.file
 
-        if not parsed.get("meal_data") or not parsed["meal_data"].get("name"):
-            print("⚠️ Missing meal_data or name field")
-            return {
-                "error": "Could not confidently identify food in this image.",
-                "invalid_input": True
-            }
+    raise HTTPException(status_code=415, detail="Send the photo as image/* or multipart/form-data")
 
-        print("✅ Success")
-        return parsed
+
+@router.post("/analyze-image/upload")
+async def analyze_image_upload(request: Request, user_id: Optional[str] = None):
+    """
+    Same analysis as /analyze-image, for a raw `image/*` body or a multipart
+    `image` field instead of base64 JSON. The photo is never held in memory at
+    full resolution.
+    """
+    with stage("image_upload_read"):
+        upload = await _read_upload(request)
+    try:
+        with upload:
+            image_jpeg = await prepare_image_for_model(upload)
+        return await analyze_prepared_image(image_jpeg, user_id)
 
     except Exception as e:
-        print("❌ Server Error:", str(e))
+        log.exception("image analysis failed")
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
@@ -0,0 +1,64 @@
+import asyncio
+import json
+import os
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from schemas.image_batch_model import ImageBatchRequest
+from utils.image_helper import generate_meal_image, get_deterministic_filename
+from utils.ingredient_image_utils import generate_ingredient_image, get_ingredient_filename
+
+IMAGE_BATCH_CONCURRENCY = int(os.getenv('IMAGE_BATCH_CONCURRENCY', '16'))
+
+router = APIRouter()
+
+
+async def _resolve(kind: str, name: str, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        try:
+            if kind == "meal":
+                result = await generate_meal_image(name)
+            else:
+                result = await generate_ingredient_image(name)
+            return {"image_url": (result or {}).get("image_url"), "srcset": (result or {}).get("srcset")}
+        except HTTPException as e:
+            return {"image_url": None, "error": e.detail}
+        except Exception as e:
+            return {"image_url": None, "error": str(e)}
+
+
+@router.post("/images/batch")
+async def image_batch_route(request: ImageBatchRequest):
+    """
+    Resolve many meal and ingredient images in one call.
+
+    Results stream back as NDJSON, one line per requested name, in completion order.
+    Names that map to the same stored image are resolved once.
+    """
+    # (kind, storage key) -> every requested spelling that maps to it
+    groups = {}
+    for name in request.meal_names:
+        groups.setdefault(("meal", get_deterministic_filename(name)), []).append(name)
+    for name in request.ingredient_names:
+        groups.setdefault(("ingredient", get_ingredient_filename(name)), []).append(name)
+
+    semaphore = asyncio.Semaphore(IMAGE_BATCH_CONCURRENCY)
+
+    async def resolve_group(kind, names):
+        return kind, names, await _resolve(kind, names[0], semaphore)
+
+    async def stream():
+        tasks = [asyncio.create_task(resolve_group(kind, names)) for (kind, _), names in groups.items()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                kind, names, result = await next_done
+                for name in dict.fromkeys(names):
+                    yield json.dumps({"type": kind, "name": name, **result}) + "\n"
+        finally:
+            # Client went away mid-stream. This only stops our own waits: generations shared
+            # with other requests run in SingleFlight's detached tasks and carry on for them.
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,134 @@
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import JSONResponse, Response
+
+from routes.meal_plan import generate_meal_plan, generate_week_plan
+from schemas.meal_plan_model import MealRequest, WeekMealRequest
+from schemas.recipe_model import RecipeRequest
+from utils.image_helper import generate_meal_image
+from utils.ingredient_image_utils import generate_ingredient_image
+from utils.jobs import IdempotencyConflict, JobQueueFull, WebhookRejected, check_webhook_url, job_queue, public_job
+from utils.recipe_utils import generate_recipe_from_leftovers
+
+router = APIRouter()
+
+
+def _unwrap(result):
+    """The endpoints report some failures in the body; a job reports them as failed."""
+    if isinstance(result, Response):
+        body = json.loads(result.body)
+        if result.status_code >= 400:
+            raise RuntimeError(body.get("message") or body.get("detail") or f"HTTP {result.status_code}")
+        return body
+    if isinstance(result, dict) and "error" in result:
+        raise RuntimeError(result["error"])
+    return result
+
+
+async def _meal_plan_job(payload: dict):
+    return _unwrap(await generate_meal_plan(MealRequest(**payload)))
+
+
+async def _week_plan_job(payload: dict):
+    return _unwrap(await generate_week_plan(WeekMealRequest(**payload)))
+
+
+async def _recipe_job(payload: dict):
+    return _unwrap(await generate_recipe_from_leftovers(RecipeRequest(**payload)))
+
+
+async def _meal_image_job(payload: dict):
+    return await generate_meal_image(payload["meal_name"])
+
+
+async def _ingredient_image_job(payload: dict):
+    return await generate_ingredient_image(payload["ingredient_name"])
+
+
+job_queue.register("meal_plan", _meal_plan_job)
+job_queue.register("week_plan", _week_plan_job)
+job_queue.register("recipe", _recipe_job)
+job_queue.register("meal_image", _meal_image_job)
+job_queue.register("ingredient_image", _ingredient_image_job)
+
+
+async def _submit(kind: str, payload: dict, idempotency_key: Optional[str], webhook_url: Optional[str]):
+    if webhook_url:
+        try:
+            await check_webhook_url(webhook_url)
+        except WebhookRejected as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    try:
+        job = await job_queue.submit(kind, payload, idempotency_key=idempotency_key, webhook_url=webhook_url)
+    except IdempotencyConflict:
+        raise HTTPException(status_code=409, detail="Idempotency-Key was already used for a different request")
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Too many queued jobs, try again shortly", headers={"Retry-After": "5"})
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job["id"], "status": job["status"], "status_url": f"/jobs/{job['id']}"},
+    )
+
+
+@router.post("/jobs/generate-meals", status_code=202)
+async def meal_plan_job_route(
+    request: MealRequest, webhook_url: Optional[str] = None, idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Queue a /generate-meals call. Poll `GET /jobs/{job_id}` or pass `webhook_url` to get the result.
+    Retrying with the same `Idempotency-Key` header returns the existing job instead of starting another.
+    """
+    return await _submit("meal_plan", request.model_dump(), idempotency_key, webhook_url)
+
+
+@router.post("/jobs/generate-meals/week", status_code=202)
+async def week_plan_job_route(
+    request: WeekMealRequest, webhook_url: Optional[str] = None, idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Queue a /generate-meals/week call.
+    """
+    return await _submit("week_plan", request.model_dump(), idempotency_key, webhook_url)
+
+
+@router.post("/jobs/generate-recipe-from-leftovers", status_code=202)
+async def recipe_job_route(
+    request: RecipeRequest, webhook_url: Optional[str] = None, idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Queue a /generate-recipe-from-leftovers call.
+    """
+    return await _submit("recipe", request.model_dump(), idempotency_key, webhook_url)
+
+
+@router.post("/jobs/generate-meal-image", status_code=202)
+async def meal_image_job_route(
+    meal_name: str, webhook_url: Optional[str] = None, idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Queue a /generate-meal-image call.
+    """
+    return await _submit("meal_image", {"meal_name": meal_name}, idempotency_key, webhook_url)
+
+
+@router.post("/jobs/generate-ingredient-image", status_code=202)
+async def ingredient_image_job_route(
+    ingredient_name: str, webhook_url: Optional[str] = None, idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Queue a /generate-ingredient-image call.
+    """
+    return await _submit("ingredient_image", {"ingredient_name": ingredient_name}, idempotency_key, webhook_url)
+
+
+@router.get("/jobs/{job_id}")
+async def job_status_route(job_id: str):
+    """
+    Status of a queued job: `queued`, `running`, `succeeded` (with `result`) or `failed` (with `error`).
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return public_job(job)
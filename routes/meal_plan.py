@@ -1,68 +1,339 @@
-from google import genai
-import re
+import asyncio
 import json
-
-from schemas.meal_plan_model import MealRequest
-from fastapi import APIRouter
 import os
-from dotenv import load_dotenv
-from utils.prompts import generate_meal_plan_prompt
 
-load_dotenv()
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+from pydantic import ValidationError
+from schemas.meal_plan_model import Meal, MealRegenerateRequest, MealRequest, WeekMealRequest
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from utils.prompts import (
+    MEAL_PLAN_SYSTEM_PROMPT,
+    generate_meal_plan_prompt,
+    generate_meal_replacement_prompt,
+    generate_week_day_prompt,
+)
+from utils.llm_gateway import structured_config, parse_structured
+from utils.model_router import ROUTES, answered_by_primary, routed_generate, routed_generate_stream
+from utils.rate_limiter import PRIORITY_FREE, PRIORITY_PRO
+from utils.json_stream import JsonArrayStream
+from utils.meal_templates import template_meal_plan
+from utils.metrics import stage
+from utils.response_cache import ResponseCache, canonical_key, make_backend
+from utils.week_plan import WEEK_PLAN_CONCURRENCY, WEEK_PLAN_DEDUPE_ROUNDS, UsedMeals, find_duplicates, week_day_style
+from utils.log import get_logger
+
+MEAL_PLAN_CACHE_BACKEND = os.getenv('MEAL_PLAN_CACHE_BACKEND', 'memory')  # memory | disk | redis
+MEAL_PLAN_CACHE_TTL = float(os.getenv('MEAL_PLAN_CACHE_TTL', str(24 * 3600)))
+MEAL_PLAN_CACHE_SIZE = int(os.getenv('MEAL_PLAN_CACHE_SIZE', '5000'))
+MEAL_PLAN_CACHE_PATH = os.getenv('MEAL_PLAN_CACHE_PATH')
 
-client = genai.Client(api_key=GEMINI_API_KEY)
+meal_plan_cache = ResponseCache(
+    "meal-plan",
+    make_backend(MEAL_PLAN_CACHE_BACKEND, "meal-plan", MEAL_PLAN_CACHE_SIZE, MEAL_PLAN_CACHE_PATH),
+    MEAL_PLAN_CACHE_TTL,
+)
 
 router = APIRouter()
 
-@router.post("/generate-meals")
-async def generate_meal_plan(request: MealRequest):
-    print("✅ Received Meal Request:", request.model_dump())
-    
-    eating_frequency_mapping = {
-        "three_meals": 3,
-        "two_meals": 2,
-        "intermittent_fasting": 2,
-        "small_frequent_meals": 5,
-        "one_large_meal": 1,
-    }
+log = get_logger(__name__)
+
 
+def meal_plan_cache_key(request: MealRequest, route_name: str) -> str:
+    # Only what ends up in the prompt (plus the primary model); regenerate_count and is_pro only pick the route.
+    # Plans from a fallback or hedge model are never stored under this key (see answered_by_primary).
+    fields = request.model_dump(exclude={"regenerate_count", "is_pro"})
+    if fields["bmi"] is not None:
+        fields["bmi"] = round(fields["bmi"], 1)
+    fields["model"] = ROUTES[route_name].tiers[0]
+    return canonical_key(fields)
+
+
+eating_frequency_mapping = {
+    "three_meals": 3,
+    "two_meals": 2,
+    "intermittent_fasting": 2,
+    "small_frequent_meals": 5,
+    "one_large_meal": 1,
+}
+
+
+def prepare_meal_request(request: MealRequest) -> str:
+    """Fill in meal_count and return the model route to use for this request."""
     request.meal_count = eating_frequency_mapping.get(request.eating_frequency, 3)
-    if request.is_pro:
-        if request.regenerate_count == 0:
-            model_name = "gemini-2.5-pro-preview-03-25"
-        elif request.regenerate_count % 2 != 0:
-            model_name =  "gemini-2.5-flash-preview-04-17-thinking"
-        else:
-            model_name =  "gemini-2.5-pro-preview-03-25"       
-        
+    if not request.is_pro:
+        route_name = "meal_plan.free"
+    elif request.regenerate_count % 2 != 0:
+        route_name = "meal_plan.pro_alternate"
     else:
-        model_name = "gemini-2.5-flash-preview-04-17-thinking"    
-      
+        route_name = "meal_plan.pro"
 
+    log.info("meal plan request", extra={"route": route_name, "regenerate_count": request.regenerate_count})
+    return route_name
 
-    print(f"🔁 Using Gemini Model: {model_name}")
-    print('Regenerate count = ', request.regenerate_count)
 
-    prompt = generate_meal_plan_prompt(request=request)
-       
-    try:
-        response = client.models.generate_content(
-    model=model_name,
-    contents=[prompt],
-  
-)
-        ai_response = response.text.strip()
-        print(f"🛠 DEBUG: Raw AI Response:\n{ai_response}")
+async def generate_meals(request: MealRequest, route_name: str, prompt: str) -> list:
+    """One day of meals from the model. Raises ValidationError if the output doesn't match the schema."""
+    response = await routed_generate(
+        route_name,
+        contents=[prompt],
+        config=structured_config(list[Meal], system_instruction=MEAL_PLAN_SYSTEM_PROMPT),
+        priority=PRIORITY_PRO if request.is_pro else PRIORITY_FREE,
+    )
+    return [meal.model_dump() for meal in parse_structured(response, list[Meal])]
+
 
-        clean_json = re.sub(r"```json\n|\n```", "", ai_response).strip()
+async def generate_replacement(request: MealRequest, replaced: Meal, kept: list, used_this_week: str = "") -> dict:
+    """A single meal for `replaced`'s slot that differs from `kept` (and `used_this_week`)."""
+    route_name = "meal_replace.pro" if request.is_pro else "meal_replace.free"
+    with stage("prompt_build"):
+        prompt = generate_meal_replacement_prompt(request, replaced, kept, used_this_week)
+    response = await routed_generate(
+        route_name,
+        contents=[prompt],
+        config=structured_config(Meal, system_instruction=MEAL_PLAN_SYSTEM_PROMPT),
+        priority=PRIORITY_PRO if request.is_pro else PRIORITY_FREE,
+    )
+    meal = parse_structured(response, Meal)
+    # The slot isn't the model's to change
+    meal.meal = replaced.meal
+    return meal.model_dump()
 
-        meals = json.loads(clean_json)
 
+@router.post("/generate-meals")
+async def generate_meal_plan(request: MealRequest):
+    log.debug("meal plan request body", extra={"request": request.model_dump()})
+
+    route_name = prepare_meal_request(request)
+
+    # Common free-tier profiles come from the pre-generated library without a model call
+    with stage("meal_template"):
+        template_meals = template_meal_plan(request)
+    if template_meals is not None:
+        return {"meals": template_meals}
+
+    # First-time plans can be shared between identical profiles; an explicit regenerate always goes to the model
+    use_cache = not request.regenerate_count
+    cache_key = meal_plan_cache_key(request, route_name)
+    if use_cache:
+        cached_meals = await meal_plan_cache.get(cache_key)
+        if cached_meals is not None:
+            return {"meals": cached_meals}
+
+    with stage("prompt_build"):
+        prompt = generate_meal_plan_prompt(request=request)
+
+    try:
+        meals = await generate_meals(request, route_name, prompt)
+
+        if use_cache and answered_by_primary(route_name):
+            await meal_plan_cache.set(cache_key, meals)
         return {"meals": meals}
 
-    except json.JSONDecodeError as e:
-        print(f"⚠️ JSON Decode Error: {e}")
+    except ValidationError as e:
+        log.warning("meal plan did not match the schema", extra={"route": route_name, "error": str(e)})
         return {"error": "Failed to parse AI response. Ensure model outputs valid JSON."}
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        log.exception("meal plan generation failed", extra={"route": route_name})
+        return {"error": str(e)}
+
+
+def replacement_index(request: MealRegenerateRequest) -> int:
+    if request.replace_index is not None:
+        if not 0 <= request.replace_index < len(request.meals):
+            raise HTTPException(status_code=422, detail=f"replace_index must be between 0 and {len(request.meals) - 1}")
+        return request.replace_index
+    if request.replace_slot:
+        slot = request.replace_slot.strip().lower()
+        for index, meal in enumerate(request.meals):
+            if meal.meal.strip().lower() == slot:
+                return index
+        raise HTTPException(status_code=422, detail=f"No {request.replace_slot} in the current plan")
+    raise HTTPException(status_code=422, detail="Set replace_index or replace_slot")
+
+
+@router.post("/regenerate-meal")
+async def regenerate_meal(request: MealRegenerateRequest):
+    """
+    Replace one meal of a plan from /generate-meals, picked by `replace_index` or `replace_slot`.
+    Only that meal is generated; the others are sent along as one-line summaries so it won't repeat them.
+    Returns the whole plan with the new meal in place, plus `replaced_index`.
+    """
+    index = replacement_index(request)
+    request.meal_count = eating_frequency_mapping.get(request.eating_frequency, 3)
+    replaced = request.meals[index]
+    kept = request.meals[:index] + request.meals[index + 1:]
+    log.info("meal replace request", extra={"slot": replaced.meal, "meals": len(request.meals), "is_pro": request.is_pro})
+
+    try:
+        meal = await generate_replacement(request, replaced, kept)
+    except ValidationError as e:
+        log.warning("replacement meal did not match the schema", extra={"error": str(e)})
+        return {"error": "Failed to parse AI response. Ensure model outputs valid JSON."}
+    except Exception as e:
+        log.exception("meal replacement failed")
+        return {"error": str(e)}
+
+    meals = [m.model_dump() for m in request.meals]
+    meals[index] = meal
+    return {"meals": meals, "replaced_index": index}
+
+
+@router.post("/generate-meals/week")
+async def generate_week_plan(request: WeekMealRequest):
+    """
+    A plan for `days` days (default 7), generated concurrently rather than one day after another.
+    Each day gets its own style and the meals the week already has; repeated meals
+    (or one main ingredient used too often) are replaced at the end.
+    Returns `days` as [{"day": 1, "meals": [...]}, ...] plus how many meals were `replaced`.
+    """
+    route_name = prepare_meal_request(request)
+    use_cache = not request.regenerate_count
+    # days and avoid_meals are part of the request, so weeks never share keys with single days
+    cache_key = meal_plan_cache_key(request, route_name)
+    if use_cache:
+        cached_week = await meal_plan_cache.get(cache_key)
+        if cached_week is not None:
+            return cached_week
+
+    used = UsedMeals(request.avoid_meals)
+    semaphore = asyncio.Semaphore(WEEK_PLAN_CONCURRENCY)
+    fallback_days = set()
+
+    async def day_plan(day: int) -> list:
+        async with semaphore:
+            # Built once the day can start, so it sees every day finished before it
+            with stage("prompt_build"):
+                prompt = generate_week_day_prompt(request, day, request.days, week_day_style(day), used.summary())
+            meals = await generate_meals(request, route_name, prompt)
+            if not answered_by_primary(route_name):
+                fallback_days.add(day)
+            used.add(meals)
+            return meals
+
+    days = await asyncio.gather(*(day_plan(day) for day in range(request.days)), return_exceptions=True)
+    failed = [day for day, meals in enumerate(days) if isinstance(meals, BaseException)]
+    if failed:
+        log.warning("retrying failed days of a weekly plan", extra={"route": route_name, "days": failed})
+        retried = await asyncio.gather(*(day_plan(day) for day in failed), return_exceptions=True)
+        for day, meals in zip(failed, retried):
+            days[day] = meals
+    errors = [meals for meals in days if isinstance(meals, BaseException)]
+    if errors:
+        if isinstance(errors[0], ValidationError):
+            log.warning("weekly plan day did not match the schema", extra={"route": route_name, "error": str(errors[0])})
+            return {"error": "Failed to parse AI response. Ensure model outputs valid JSON."}
+        log.error("weekly plan generation failed", extra={"route": route_name, "failed_days": len(errors), "error": str(errors[0])})
+        return {"error": str(errors[0])}
+
+    replaced = await _replace_duplicates(request, days)
+    week = {"days": [{"day": day + 1, "meals": meals} for day, meals in enumerate(days)], "replaced": replaced}
+    if use_cache and not fallback_days:
+        await meal_plan_cache.set(cache_key, week)
+    return week
+
+
+async def _replace_duplicates(request: WeekMealRequest, days: list) -> int:
+    """Swap repeated meals for new ones, each told what the rest of the week uses.
+
+    A round replaces every repeat at once, so two replacements can come back
+    as the same dish; the week is checked again after each round, for up to
+    WEEK_PLAN_DEDUPE_ROUNDS rounds. Returns how many meals were replaced and
+    no longer repeat.
+    """
+    duplicates = find_duplicates(days, request.avoid_meals)
+    changed = set()
+    for round_number in range(WEEK_PLAN_DEDUPE_ROUNDS):
+        if not duplicates:
+            break
+        keep = UsedMeals(request.avoid_meals)
+        drop = set(duplicates)
+        keep.add([meal for day, meals in enumerate(days) for index, meal in enumerate(meals) if (day, index) not in drop])
+        used_this_week = keep.summary()
+
+        async def replace(day: int, index: int):
+            meals = [Meal.model_validate(meal) for meal in days[day]]
+            return await generate_replacement(request, meals[index], meals[:index] + meals[index + 1:], used_this_week)
+
+        results = await asyncio.gather(*(replace(day, index) for day, index in duplicates), return_exceptions=True)
+        for (day, index), meal in zip(duplicates, results):
+            if isinstance(meal, BaseException):
+                # A repeat is better than a missing meal
+                log.warning("could not replace a repeated meal", extra={"day": day + 1, "meal": days[day][index]["name"], "error": str(meal)})
+                continue
+            days[day][index] = meal
+            changed.add((day, index))
+        duplicates = find_duplicates(days, request.avoid_meals)
+        log.info("weekly plan deduplicated", extra={"round": round_number + 1, "replaced": len(changed), "still_repeated": len(duplicates)})
+
+    return len(changed - set(duplicates))
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/generate-meals/stream")
+async def generate_meal_plan_stream(request: MealRequest):
+    """
+    Same as /generate-meals, but sends each meal as a Server-Sent Event (`event: meal`)
+    as soon as the model has finished writing it, then `event: done`.
+    """
+    log.debug("meal plan stream request body", extra={"request": request.model_dump()})
+
+    route_name = prepare_meal_request(request)
+    use_cache = not request.regenerate_count
+    cache_key = meal_plan_cache_key(request, route_name)
+
+    async def events():
+        with stage("meal_template"):
+            template_meals = template_meal_plan(request)
+        if template_meals is not None:
+            for meal in template_meals:
+                yield _sse("meal", meal)
+            yield _sse("done", {"count": len(template_meals)})
+            return
+
+        if use_cache:
+            cached_meals = await meal_plan_cache.get(cache_key)
+            if cached_meals is not None:
+                for meal in cached_meals:
+                    yield _sse("meal", meal)
+                yield _sse("done", {"count": len(cached_meals)})
+                return
+
+        with stage("prompt_build"):
+            prompt = generate_meal_plan_prompt(request=request)
+        parser = JsonArrayStream()
+        meals = []
+        try:
+            async for chunk in routed_generate_stream(
+                route_name,
+                contents=[prompt],
+                config=structured_config(list[Meal], system_instruction=MEAL_PLAN_SYSTEM_PROMPT),
+                priority=PRIORITY_PRO if request.is_pro else PRIORITY_FREE,
+            ):
+                for item in parser.feed(chunk.text or ""):
+                    meal = Meal.model_validate(item).model_dump()
+                    meals.append(meal)
+                    yield _sse("meal", meal)
+        except (json.JSONDecodeError, ValidationError) as e:
+            log.warning("streamed meal plan did not match the schema", extra={"route": route_name, "error": str(e)})
+            yield _sse("error", {"error": "Failed to parse AI response. Ensure model outputs valid JSON."})
+            return
+        except Exception as e:
+            log.exception("meal plan stream failed", extra={"route": route_name})
+            yield _sse("error", {"error": str(e)})
+            return
+
+        if not parser.done:
+            yield _sse("error", {"error": "AI response ended before the meal plan was complete."})
+            return
+        if use_cache and answered_by_primary(route_name):
+            await meal_plan_cache.set(cache_key, meals)
+        yield _sse("done", {"count": len(meals)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
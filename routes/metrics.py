@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from utils.metrics import render_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics_route():
+    """
+    Prometheus scrape endpoint: request and per-stage latency histograms, LLM latency and tokens per model, cache hit/miss counters.
+    """
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
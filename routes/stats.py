@@ -0,0 +1,58 @@
+from fastapi import APIRouter
+from utils.response_cache import RESPONSE_CACHES
+from utils.model_router import router_stats
+from utils.rate_limiter import limiter_stats
+from utils.context_cache import context_cache_stats
+from utils.jobs import job_queue
+from utils.meal_templates import get_template_library
+
+router = APIRouter()
+
+@router.get("/stats/cache")
+async def cache_stats_route():
+    """
+    Hit/miss counters for the LLM response caches in this worker.
+    """
+    return {name: cache.stats() for name, cache in RESPONSE_CACHES.items()}
+
+
+@router.get("/stats/models")
+async def model_stats_route():
+    """
+    Model routes and live per-model latency, failures and cooldowns in this worker.
+    """
+    return router_stats()
+
+
+@router.get("/stats/llm")
+async def llm_stats_route():
+    """
+    Per-model quota queues in this worker: concurrency limit, in-flight calls, queue depth and wait times.
+    """
+    return limiter_stats()
+
+
+@router.get("/stats/context-cache")
+async def context_cache_stats_route():
+    """
+    Gemini context caches holding the static system prompts, and how often calls used them.
+    """
+    return context_cache_stats()
+
+
+
+@router.get("/stats/jobs")
+async def job_stats_route():
+    """
+    Background job queue: backend, workers, queue depth and outcome counters in this worker.
+    """
+    return await job_queue.stats()
+
+
+@router.get("/stats/meal-templates")
+async def meal_template_stats_route():
+    """
+    Pre-generated meal-plan library: size, and how many plans it served versus left to the model.
+    """
+    library = get_template_library()
+    return library.stats() if library else {"enabled": False}
@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from schemas.nutrition_model import Ingredient, Macros
+
+
+class AnalyzeImageRequest(BaseModel):
+    image_base64: str
+    user_id: Optional[str] = None
+
+
+class AnalyzedMeal(BaseModel):
+    meal: str = Field(description="e.g. Breakfast, Lunch, Snack, Dinner")
+    name: str
+    macros: Macros
+    calories: int
+    difficulty: str = Field(description="easy, intermediate or expert")
+    ingredients: List[Ingredient]
+    cooking_time: str = Field(description="e.g. '30 minutes'")
+    total_weight: str = Field(description="Total grams, e.g. '180g'")
+
+
+class ImageAnalysis(BaseModel):
+    meal_data: Optional[AnalyzedMeal] = Field(default=None, description="null if the image does not show food")
+    description: str
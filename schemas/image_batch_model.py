@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+
+class ImageBatchRequest(BaseModel):
+    meal_names: List[str] = Field(default_factory=list, max_length=100)
+    ingredient_names: List[str] = Field(default_factory=list, max_length=300)
@@ -1,5 +1,23 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from schemas.nutrition_model import Ingredient, Macros
 
 
 class UserMealLogRequest(BaseModel):
-    meal_description: str
\ No newline at end of file
+    meal_description: str
+
+
+class MealLog(BaseModel):
+    name: str
+    ingredients: List[Ingredient]
+    calories: int
+    macros: Macros
+    cooking_time: str = Field(description="e.g. '25 minutes'")
+    difficulty: str = Field(description="easy, intermediate or expert")
+    total_weight: str = Field(description="Total grams, e.g. '500g'")
+
+
+class MealLogResult(BaseModel):
+    is_valid: bool = Field(description="false if no meal can be confidently extracted from the description")
+    log: Optional[MealLog] = Field(default=None, description="null when is_valid is false")
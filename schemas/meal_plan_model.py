@@ -1,6 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
+from schemas.nutrition_model import Ingredient, Macros
+
 
 class MealRequest(BaseModel):
     meal_goal: str
@@ -20,4 +22,27 @@ class MealRequest(BaseModel):
     is_pro: bool = False
     regenerate_count: Optional[int] = 0
 
-     
+
+class Meal(BaseModel):
+    meal: str = Field(description="Slot in the day, e.g. Breakfast, Lunch, Snack, Dinner, Dessert")
+    name: str
+    ingredients: List[Ingredient]
+    calories: int
+    cooking_instructions: List[str]
+    macros: Macros
+    cooking_time: str = Field(description="e.g. '10 minutes'")
+    difficulty: str = Field(description="easy, intermediate or expert")
+    total_weight: str = Field(description="Total grams, e.g. '450g'")
+
+
+class MealRegenerateRequest(MealRequest):
+    meals: List[Meal] = Field(description="Today's plan as returned by /generate-meals")
+    # Which meal to replace: its position in `meals`, or its slot (e.g. "Dinner"); the index wins if both are set
+    replace_index: Optional[int] = None
+    replace_slot: Optional[str] = None
+
+
+class WeekMealRequest(MealRequest):
+    days: int = Field(7, ge=1, le=14)
+    # e.g. last week's meals, so the new week doesn't repeat them
+    avoid_meals: List[str] = Field(default_factory=list, max_length=100)
@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field
+
+
+class Ingredient(BaseModel):
+    name: str
+    quantity: str = Field(description="Amount with unit, e.g. '150g', '200ml' or '1 cup (195g)'")
+
+
+class Macros(BaseModel):
+    protein: int = Field(description="grams")
+    carbs: int = Field(description="grams")
+    fats: int = Field(description="grams")
@@ -1,8 +1,21 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
+from schemas.nutrition_model import Ingredient, Macros
+
 class RecipeRequest(BaseModel):
     ingredients: List[str]
     tags: List[str] = []
     lifestyle: Optional[str] = None
     is_pro: Optional[bool] = False
+
+
+class Recipe(BaseModel):
+    name: str
+    ingredients: List[Ingredient]
+    instructions: List[str]
+    estimated_time: str = Field(description="e.g. '10 minutes'")
+    difficulty: str = Field(description="easy, intermediate or expert")
+    calories: int
+    macros: Macros
+    servings: int
@@ -0,0 +1,187 @@
+"""Fill the meal-plan template library served by /generate-meals for common free-tier profiles.
+
+Every combination of --goals, --regions, --diets and --frequencies is a
+bucket. Each bucket gets --plans day plans, written by the model with the
+same prompt the API uses for a weekly plan (a neutral profile at the
+"balanced" portion size, a different style per plan, and the bucket's
+earlier meals as "already used"). A plan is only stored if it validates:
+schema, meal count, unique names, a gram or ml amount on every ingredient,
+and mostly meals the bucket doesn't have yet.
+
+At request time the API scales plans to the user's portion size, so it is
+not part of the bucket. Users with allergies or health issues always get a
+plan from the model.
+Buckets that already have enough plans are skipped, so an interrupted run
+picks up where it stopped.
+
+    python -m scripts.build_meal_templates --goals weight_loss,muscle_gain --regions india,usa
+    python -m scripts.build_meal_templates --goals weight_loss --regions india \\
+        --diets none,vegetarian,vegan,vegetarian+gluten_free --frequencies three_meals,two_meals --plans 20
+    python -m scripts.build_meal_templates --goals weight_loss --regions india --dry-run
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import re
+import time
+import zlib
+
+import utils.config  # noqa: F401  (loads .env)
+from utils.meal_templates import BASE_PORTION, MEAL_TEMPLATES_PATH, create_library, encode_plan, template_bucket
+from utils.name_normalizer import canonical_meal_name
+
+_AMOUNT = re.compile(r"\d+(?:\.\d+)?\s*(?:kg|g|ml|l)\b", re.IGNORECASE)
+
+
+def _list(value: str) -> list:
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+def _diet(value: str) -> list:
+    """"vegetarian+gluten_free" -> ["vegetarian", "gluten_free"]; "none" -> []."""
+    return [] if value == "none" else [part for part in value.split("+") if part]
+
+
+def bucket_request(goal: str, region: str, diet: list, frequency: str, meal_count: int):
+    """A neutral MealRequest for a bucket: nothing the template would have to be personalised for."""
+    from schemas.meal_plan_model import MealRequest
+
+    return MealRequest(
+        meal_goal=goal,
+        dietary_preferences=diet,
+        allergies=[],
+        region=region,
+        activity_level="moderate",
+        age=30,
+        gender="unspecified",
+        portion_size=BASE_PORTION,
+        cooking_experience="intermediate",
+        health_issues=[],
+        eating_frequency=frequency,
+        meal_count=meal_count,
+        bmi=22.0,
+        bmi_category="normal",
+    )
+
+
+def plan_problem(meals: list, meal_count: int, bucket_names: set) -> str:
+    """Why a generated plan can't go in the library, or "" if it can."""
+    if len(meals) != meal_count:
+        return f"{len(meals)} meals, expected {meal_count}"
+    names = [canonical_meal_name(meal["name"]) for meal in meals]
+    if len(set(names)) != len(names):
+        return "repeats a meal"
+    if sum(name in bucket_names for name in names) * 2 > len(names):
+        return "mostly meals the bucket already has"
+    for meal in meals:
+        if meal["calories"] <= 0:
+            return f"no calories for {meal['name']}"
+        for ingredient in meal["ingredients"]:
+            if not _AMOUNT.search(ingredient["quantity"]):
+                return f"no g/ml amount for {ingredient['name']} ({ingredient['quantity']!r})"
+    return ""
+
+
+async def fill_bucket(bucket: str, request, have: int, target: int, route: str, attempts: int, db, known_meals: list):
+    """Generate plans for one bucket until it holds `target`, giving up after `attempts` failures in a row."""
+    from pydantic import ValidationError
+    from routes.meal_plan import generate_meals
+    from utils.prompts import generate_week_day_prompt
+    from utils.week_plan import UsedMeals, week_day_style
+
+    used = UsedMeals()
+    used.add(known_meals)
+    stored = failures = 0
+    while have + stored < target and failures < attempts:
+        day = have + stored
+        prompt = generate_week_day_prompt(request, day % 7, 7, week_day_style(day), used.summary())
+        try:
+            meals = await generate_meals(request, route, prompt)
+        except ValidationError as e:
+            meals, problem = None, f"invalid output: {e.error_count()} errors"
+        except Exception as e:
+            meals, problem = None, f"{type(e).__name__}: {e}"
+        else:
+            problem = plan_problem(meals, request.meal_count, set(used.names))
+        if problem:
+            failures += 1
+            print(f"  ❌ {bucket}: {problem}")
+            continue
+        failures = 0
+        db.execute("INSERT INTO templates (bucket, plan) VALUES (?, ?)", (bucket, encode_plan(meals)))
+        db.commit()
+        used.add(meals)
+        stored += 1
+        print(f"  ✅ {bucket} [{have + stored}/{target}]: {', '.join(meal['name'] for meal in meals)}")
+    return stored
+
+
+async def build(todo: list, target: int, route: str, concurrency: int, attempts: int, db):
+    """Fill every (bucket, request, plans it already has) in `todo`, `concurrency` buckets at a time."""
+    from utils.http_client import close_http_client
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(bucket, request, have):
+        async with semaphore:
+            known = [meal for (blob,) in db.execute("SELECT plan FROM templates WHERE bucket = ?", (bucket,))
+                     for meal in json.loads(zlib.decompress(blob))]
+            return await fill_bucket(bucket, request, have, target, route, attempts, db, known)
+
+    started = time.perf_counter()
+    try:
+        stored = await asyncio.gather(*(run(*item) for item in todo))
+    finally:
+        await close_http_client()
+    short = sum(have + count < target for (_, _, have), count in zip(todo, stored))
+    print(f"Done: {sum(stored)} plans stored, {short} buckets still short of {target} ({time.perf_counter() - started:.0f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--goals", required=True, help="comma-separated meal_goal values")
+    parser.add_argument("--regions", required=True, help="comma-separated region values")
+    parser.add_argument("--diets", default="none",
+                        help='comma-separated dietary preference sets; "+" joins preferences, "none" is no preference')
+    parser.add_argument("--frequencies", default="three_meals", help="comma-separated eating_frequency values")
+    parser.add_argument("--plans", type=int, default=10, help="plans per bucket")
+    parser.add_argument("--route", default="meal_plan.pro", help="model route to generate with")
+    parser.add_argument("--concurrency", type=int, default=8, help="buckets generated at once")
+    parser.add_argument("--attempts", type=int, default=3, help="failed generations in a row before a bucket is skipped")
+    parser.add_argument("--output", default=MEAL_TEMPLATES_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="show the buckets to fill; no model calls")
+    args = parser.parse_args()
+
+    from routes.meal_plan import eating_frequency_mapping
+    from utils.model_router import ROUTES
+
+    if args.route not in ROUTES:
+        parser.error(f"unknown route {args.route!r}; one of {', '.join(sorted(ROUTES))}")
+
+    db = create_library(args.output)
+    todo = []
+    for goal, region, diet, frequency in itertools.product(
+        _list(args.goals), _list(args.regions), _list(args.diets), _list(args.frequencies),
+    ):
+        if frequency not in eating_frequency_mapping:
+            parser.error(f"unknown eating frequency {frequency!r}; one of {', '.join(eating_frequency_mapping)}")
+        preferences = _diet(diet)
+        bucket = template_bucket(goal, region, preferences, frequency)
+        have = db.execute("SELECT COUNT(*) FROM templates WHERE bucket = ?", (bucket,)).fetchone()[0]
+        if have < args.plans:
+            request = bucket_request(goal, region, preferences, frequency, eating_frequency_mapping[frequency])
+            todo.append((bucket, request, have))
+    print(f"{len(todo)} buckets to fill in {args.output}, up to {sum(args.plans - have for _, _, have in todo)} plans")
+
+    if args.dry_run:
+        for bucket, _, have in todo:
+            print(f"  would fill: {bucket} ({have}/{args.plans})")
+        return
+
+    asyncio.run(build(todo, args.plans, args.route, args.concurrency, args.attempts, db))
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
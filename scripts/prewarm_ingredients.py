@@ -0,0 +1,154 @@
+"""Pre-warm the `ingredients` bucket for the most common ingredients.
+
+Resolves each name the way /generate-ingredient-image does (storage, then
+Spoonacular, then Gemini + upload) with bounded concurrency, and records the
+public URLs in the ingredient manifest, which the API serves from memory.
+Names already in the manifest are skipped, so an interrupted run picks up
+where it stopped.
+
+Names come from a text file (one per line) and/or are mined from served
+meal plans: a meal-plan DiskCache file (MEAL_PLAN_CACHE_BACKEND=disk) or a
+JSON / JSONL export of plans.
+
+    python -m scripts.prewarm_ingredients --names ingredients.txt
+    python -m scripts.prewarm_ingredients --from-plans meal-plan.cache.sqlite3 --top 500
+    python -m scripts.prewarm_ingredients --from-plans plans.jsonl --top 200 --dry-run
+"""
+import argparse
+import asyncio
+import json
+import sqlite3
+import time
+from collections import Counter
+
+import utils.config  # noqa: F401  (loads .env)
+from utils.ingredient_manifest import INGREDIENT_MANIFEST_PATH, read_manifest, write_manifest
+
+
+def read_names_file(path: str) -> list:
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def _plan_values(path: str):
+    """Yield every stored plan from a DiskCache file or a JSON / JSONL export."""
+    with open(path, "rb") as f:
+        is_sqlite = f.read(16) == b"SQLite format 3\x00"
+    if is_sqlite:
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        for (value,) in db.execute("SELECT value FROM cache"):
+            yield json.loads(value)
+        db.close()
+        return
+    with open(path) as f:
+        text = f.read()
+    try:
+        yield json.loads(text)
+    except json.JSONDecodeError:
+        for line in text.splitlines():
+            if line.strip():
+                yield json.loads(line)
+
+
+def _meals(value):
+    if isinstance(value, dict) and "meals" in value:
+        value = value["meals"]
+    if isinstance(value, dict):
+        value = [value]
+    return [meal for meal in value if isinstance(meal, dict)] if isinstance(value, list) else []
+
+
+def mine_plan_ingredients(path: str) -> Counter:
+    """How often each ingredient name appears across the stored meal plans."""
+    counts = Counter()
+    for value in _plan_values(path):
+        for meal in _meals(value):
+            for ingredient in meal.get("ingredients", []):
+                name = ingredient.get("name", "").strip() if isinstance(ingredient, dict) else ""
+                if name:
+                    counts[name] += 1
+    return counts
+
+
+async def prewarm(todo: dict, manifest: dict, manifest_path: str, concurrency: int, checkpoint: int, force: bool):
+    """Resolve `todo` ({storage key: ingredient name}) and file each URL in `manifest` under its key."""
+    from utils.http_client import close_http_client
+    from utils.ingredient_image_utils import generate_ingredient_image
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def resolve(key: str, name: str):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await generate_ingredient_image(name, use_manifest=not force)
+                return key, name, (result or {}).get("image_url"), None, time.perf_counter() - started
+            except Exception as e:
+                return key, name, None, e, time.perf_counter() - started
+
+    started = time.perf_counter()
+    done = failed = 0
+    total = len(todo)
+    tasks = [asyncio.create_task(resolve(key, name)) for key, name in todo.items()]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            key, name, url, error, elapsed = await next_done
+            done += 1
+            if url:
+                manifest[key] = url
+                print(f"[{done}/{total}] ✅ {name} ({elapsed:.1f}s)")
+            else:
+                failed += 1
+                print(f"[{done}/{total}] ❌ {name}: {error or 'no image'}")
+            if done % checkpoint == 0:
+                write_manifest(manifest, manifest_path)
+                rate = done / (time.perf_counter() - started)
+                print(f"💾 {len(manifest)} in manifest, {rate:.1f}/s, ~{(total - done) / rate:.0f}s left")
+    finally:
+        # Keep whatever finished, even on Ctrl-C, so the next run resumes from here
+        for task in tasks:
+            task.cancel()
+        write_manifest(manifest, manifest_path)
+        await close_http_client()
+    print(f"Done: {done - failed} resolved, {failed} failed, {len(manifest)} in manifest ({time.perf_counter() - started:.0f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--names", help="text file with one ingredient name per line")
+    parser.add_argument("--from-plans", help="meal-plan DiskCache file or JSON/JSONL export to mine for ingredients")
+    parser.add_argument("--top", type=int, help="only the N most frequent mined ingredients")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--checkpoint", type=int, default=25, help="write the manifest every N ingredients")
+    parser.add_argument("--manifest", default=INGREDIENT_MANIFEST_PATH)
+    parser.add_argument("--force", action="store_true", help="re-resolve names already in the manifest")
+    parser.add_argument("--dry-run", action="store_true", help="show what would be resolved; no network calls")
+    args = parser.parse_args()
+    if not args.names and not args.from_plans:
+        parser.error("give --names and/or --from-plans")
+
+    from utils.ingredient_image_utils import get_ingredient_filename
+
+    names = read_names_file(args.names) if args.names else []
+    if args.from_plans:
+        names += [name for name, _ in mine_plan_ingredients(args.from_plans).most_common(args.top)]
+
+    # The manifest is keyed like the bucket, so names that share a file are resolved once
+    by_key = {}
+    for name in names:
+        by_key.setdefault(get_ingredient_filename(name), name)
+
+    manifest = read_manifest(args.manifest)
+    todo = {key: name for key, name in by_key.items() if args.force or key not in manifest}
+    print(f"{len(by_key)} distinct ingredients, {len(by_key) - len(todo)} already in {args.manifest}, {len(todo)} to resolve")
+
+    if args.dry_run:
+        for name in todo.values():
+            print(f"  would resolve: {name}")
+        return
+
+    asyncio.run(prewarm(todo, manifest, args.manifest, args.concurrency, args.checkpoint, args.force))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+import os
+import tempfile
+
+# Unit tests never talk to real services: in-process caches and queues, and placeholder
+# credentials so modules that read them at import time can load. Set before load_dotenv
+# runs, so a developer's .env doesn't leak in.
+os.environ["REDIS_URL"] = ""
+os.environ["JOBS_BACKEND"] = "memory"
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+# Files the app keeps between runs go to a fresh directory, so runs don't leave state in the checkout
+os.environ["NAME_INDEX_PATH"] = os.path.join(tempfile.mkdtemp(prefix="welleats-tests-"), "name-index.sqlite3")
@@ -0,0 +1,53 @@
+import asyncio
+
+import routes.analyze_image as analyze_image
+from schemas.analyze_image_model import ImageAnalysis
+
+ANALYSIS = {
+    "meal_data": {
+        "meal": "Lunch",
+        "name": "Dal chawal",
+        "macros": {"protein": 12, "carbs": 60, "fats": 8},
+        "calories": 360,
+        "difficulty": "easy",
+        "ingredients": [{"name": "rice", "quantity": "200g"}, {"name": "lentils", "quantity": "150g"}],
+        "cooking_time": "30 minutes",
+        "total_weight": "350g",
+    },
+    "description": "A plate of dal and rice",
+}
+
+
+def model_calls(monkeypatch, user_ids) -> int:
+    """Analyze the same photo once per user id and count how often the model was asked."""
+    calls = []
+
+    async def routed_generate(*args, **kwargs):
+        calls.append(1)
+
+    async def image_dhash(image):
+        return 0x1234
+
+    monkeypatch.setattr(analyze_image, "routed_generate", routed_generate)
+    monkeypatch.setattr(analyze_image, "parse_structured", lambda response, model: ImageAnalysis.model_validate(ANALYSIS))
+    monkeypatch.setattr(analyze_image, "image_dhash", image_dhash)
+    monkeypatch.setattr(analyze_image, "photo_analysis_cache", analyze_image.PhotoAnalysisCache("test", 100, 4, 60))
+
+    async def main():
+        for user_id in user_ids:
+            await analyze_image.analyze_prepared_image(b"jpeg", user_id)
+
+    asyncio.run(main())
+    return len(calls)
+
+
+def test_same_user_reuses_the_analysis(monkeypatch):
+    assert model_calls(monkeypatch, ["alice", "alice"]) == 1
+
+
+def test_other_users_never_get_someone_elses_analysis(monkeypatch):
+    assert model_calls(monkeypatch, ["alice", "bob"]) == 2
+
+
+def test_no_user_id_skips_dedupe(monkeypatch):
+    assert model_calls(monkeypatch, [None, None]) == 2
@@ -0,0 +1,32 @@
+import asyncio
+import json
+
+import routes.image_batch as image_batch
+from schemas.image_batch_model import ImageBatchRequest
+from utils.single_flight import SingleFlight
+
+
+def test_disconnect_does_not_cancel_generations_shared_with_other_requests(monkeypatch):
+    flight = SingleFlight("test-meal-image")
+
+    async def generate_meal_image(name):
+        async def generate():
+            await asyncio.sleep(0.1 if name == "Slow curry" else 0)
+            return {"image_url": f"https://img/{name}.png", "srcset": None}
+        return await flight.do(name, generate)
+
+    monkeypatch.setattr(image_batch, "generate_meal_image", generate_meal_image)
+
+    async def main():
+        response = await image_batch.image_batch_route(ImageBatchRequest(meal_names=["Quick salad", "Slow curry"]))
+        first_line = await response.body_iterator.__anext__()
+        # Joins the generation the batch started
+        other_request = asyncio.create_task(generate_meal_image("Slow curry"))
+        await asyncio.sleep(0)
+        # The batch client disconnects while "Slow curry" is still generating
+        await response.body_iterator.aclose()
+        return json.loads(first_line), await other_request
+
+    first, other = asyncio.run(main())
+    assert first["name"] == "Quick salad"
+    assert other == {"image_url": "https://img/Slow curry.png", "srcset": None}
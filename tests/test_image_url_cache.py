@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+import utils.cache as cache
+import utils.image_url_cache as image_url_cache
+from utils.cache import MISSING, MemoryCache, TieredCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class Storage:
+    """Stands in for the HTTP client; answers HEAD with 200 for stored URLs and 404 otherwise."""
+
+    def __init__(self, stored=()):
+        self.stored = set(stored)
+        self.probes = []
+
+    async def head(self, url):
+        self.probes.append(url)
+        return Response(200 if url in self.stored else 404)
+
+
+@pytest.fixture
+def storage(monkeypatch, clock):
+    storage = Storage()
+    monkeypatch.setattr(image_url_cache, "_cache", TieredCache(MemoryCache()))
+    monkeypatch.setattr(image_url_cache, "get_http_client", lambda: storage)
+    monkeypatch.setattr(image_url_cache, "public_object_url", lambda bucket, name: f"https://cdn/{bucket}/{name}")
+    return storage
+
+
+def resolve(name, use_cache=True):
+    return asyncio.run(image_url_cache.resolve_object_url("meals", name, use_cache))
+
+
+def test_memory_cache_expires_entries(clock):
+    memory = MemoryCache()
+    asyncio.run(memory.set("k", None, ttl=10))
+    assert asyncio.run(memory.get("k")) is None
+    clock.now += 11
+    assert asyncio.run(memory.get("k")) is MISSING
+
+
+def test_memory_cache_evicts_least_recently_used(clock):
+    memory = MemoryCache(max_entries=2)
+    asyncio.run(memory.set("a", 1, ttl=10))
+    asyncio.run(memory.set("b", 2, ttl=10))
+    asyncio.run(memory.get("a"))
+    asyncio.run(memory.set("c", 3, ttl=10))
+    assert asyncio.run(memory.get("a")) == 1
+    assert asyncio.run(memory.get("b")) is MISSING
+
+
+def test_tiered_cache_backfills_memory_for_a_short_time(clock):
+    shared = MemoryCache()
+    tiered = TieredCache(MemoryCache(), shared, backfill_ttl=5)
+    asyncio.run(shared.set("k", "v", ttl=100))
+    assert asyncio.run(tiered.get("k")) == "v"
+    asyncio.run(shared.delete("k"))
+    assert asyncio.run(tiered.get("k")) == "v"
+    clock.now += 6
+    assert asyncio.run(tiered.get("k")) is MISSING
+
+
+def test_existing_object_is_probed_once(storage):
+    storage.stored.add("https://cdn/meals/dal.png")
+    assert resolve("dal.png") == "https://cdn/meals/dal.png"
+    assert resolve("dal.png") == "https://cdn/meals/dal.png"
+    assert len(storage.probes) == 1
+
+
+def test_missing_object_is_cached_until_the_negative_ttl(storage, clock):
+    assert resolve("dal.png") is None
+    assert resolve("dal.png") is None
+    assert len(storage.probes) == 1
+
+    storage.stored.add("https://cdn/meals/dal.png")
+    clock.now += image_url_cache.IMAGE_URL_NEGATIVE_TTL + 1
+    assert resolve("dal.png") == "https://cdn/meals/dal.png"
+    assert len(storage.probes) == 2
+
+
+def test_unexpected_status_is_not_cached(storage, monkeypatch):
+    async def head(url):
+        storage.probes.append(url)
+        return Response(503)
+
+    monkeypatch.setattr(storage, "head", head)
+    assert resolve("dal.png") is None
+    assert resolve("dal.png") is None
+    assert len(storage.probes) == 2
+
+
+def test_remembered_upload_skips_the_probe(storage):
+    asyncio.run(image_url_cache.remember_object_url("meals", "dal.png", "https://cdn/meals/dal.png"))
+    assert resolve("dal.png") == "https://cdn/meals/dal.png"
+    assert storage.probes == []
+
+
+def test_bypassing_the_cache_still_probes(storage):
+    asyncio.run(image_url_cache.remember_object_url("meals", "dal.png", "https://cdn/meals/dal.png"))
+    assert resolve("dal.png", use_cache=False) is None
+    assert storage.probes == ["https://cdn/meals/dal.png"]
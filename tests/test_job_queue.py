@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+import utils.jobs as jobs
+from utils.jobs import JobQueue, MemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def make_queue(store):
+    queue = JobQueue(store, workers=1)
+
+    async def echo(payload):
+        return {"echo": payload}
+
+    queue.register("echo", echo)
+    return queue
+
+
+def test_dequeue_marks_the_job_running(store):
+    queue = make_queue(store)
+
+    async def main():
+        job = await queue.submit("echo", {"allergies": [], "notes": {}})
+        claimed = await store.dequeue(timeout=1)
+        return job, claimed, await store.get(job["id"]), await store.depth()
+
+    job, claimed, stored, depth = asyncio.run(main())
+    assert claimed["id"] == job["id"] and claimed["status"] == "running" and claimed["started_at"]
+    assert stored == claimed
+    assert stored["payload"] == {"allergies": [], "notes": {}}
+    assert depth == 0
+
+
+def test_job_lost_after_dequeue_fails_once_the_lease_expires(store, monkeypatch):
+    queue = make_queue(store)
+
+    async def main():
+        job = await queue.submit("echo", {})
+        await store.dequeue(timeout=1)  # the worker dies before running it
+        monkeypatch.setattr(jobs, "JOBS_LEASE", -1)
+        return await queue.get(job["id"])
+
+    job = asyncio.run(main())
+    assert job["status"] == "failed"
+    assert "stopped" in job["error"]
+
+
+def test_worker_runs_queued_jobs(store):
+    queue = make_queue(store)
+
+    async def main():
+        job = await queue.submit("echo", {"n": 1})
+        queue.start()
+        try:
+            for _ in range(100):
+                job = await queue.get(job["id"])
+                if job["status"] == "succeeded":
+                    return job
+                await asyncio.sleep(0.01)
+        finally:
+            await queue.stop()
+
+    job = asyncio.run(main())
+    assert job["result"] == {"echo": {"n": 1}}
@@ -0,0 +1,85 @@
+import asyncio
+
+import httpx
+import pytest
+
+import utils.jobs as jobs
+from utils.jobs import JobQueue, MemoryJobStore, WebhookRejected, check_webhook_url
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:8000/hook",
+    "http://localhost/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://10.0.0.5/hook",
+    "https://192.168.1.10/hook",
+    "http://172.16.0.1/hook",
+    "http://100.64.0.1/hook",
+    "http://0.0.0.0/hook",
+    "http://[::1]/hook",
+    "http://[::ffff:127.0.0.1]/hook",
+    "http://[fe80::1]/hook",
+    "ftp://8.8.8.8/hook",
+    "file:///etc/passwd",
+    "not a url",
+])
+def test_internal_and_non_http_targets_are_rejected(url):
+    with pytest.raises(WebhookRejected):
+        asyncio.run(check_webhook_url(url))
+
+
+def test_public_address_is_allowed():
+    asyncio.run(check_webhook_url("https://8.8.8.8/hooks/welleats"))
+
+
+def test_allowlist_limits_hosts(monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_WEBHOOK_ALLOWED_HOSTS", ["example.com"])
+    with pytest.raises(WebhookRejected):
+        asyncio.run(check_webhook_url("https://8.8.8.8/hook"))
+    with pytest.raises(WebhookRejected):
+        asyncio.run(check_webhook_url("https://notexample.com/hook"))
+
+
+class Resolver:
+    """Answers each lookup with the next address, like a DNS server rebinding the name between lookups."""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+
+    async def __call__(self, host, port, **kwargs):
+        return [(2, 1, 6, "", (self.answers.pop(0), port))]
+
+
+def deliver(monkeypatch, url, resolver, status_code=200):
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        return httpx.Response(status_code)
+
+    async def no_sleep(seconds):
+        pass
+
+    async def main():
+        monkeypatch.setattr(asyncio.get_running_loop(), "getaddrinfo", resolver)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            monkeypatch.setattr(jobs, "get_http_client", lambda: client)
+            await JobQueue(MemoryJobStore())._notify({"id": "job-1", "status": "succeeded", "webhook_url": url})
+
+    monkeypatch.setattr(jobs.asyncio, "sleep", no_sleep)
+    asyncio.run(main())
+    return sent
+
+
+def test_delivery_connects_to_the_checked_address(monkeypatch):
+    sent = deliver(monkeypatch, "https://hooks.example.com:8443/done?x=1", Resolver("93.184.216.34"))
+    [request] = sent
+    assert str(request.url) == "https://93.184.216.34:8443/done?x=1"
+    assert request.headers["Host"] == "hooks.example.com:8443"
+    assert request.extensions["sni_hostname"] == "hooks.example.com"
+
+
+def test_rebinding_between_lookups_never_reaches_the_internal_address(monkeypatch):
+    # The first delivery fails, and by the retry the name points at the metadata endpoint
+    sent = deliver(monkeypatch, "http://hooks.example.com/done", Resolver("93.184.216.34", "169.254.169.254"), 503)
+    assert [request.url.host for request in sent] == ["93.184.216.34"]
@@ -0,0 +1,45 @@
+import json
+
+from utils.json_stream import JsonArrayStream
+
+MEALS = [
+    {"name": "Poha", "cooking_instructions": ["Rinse the poha [thick kind]", "Add {spices}"]},
+    {"name": "Dal \"tadka\"", "macros": {"protein": 12, "carbs": 40}},
+    {"name": "Back\\slash}", "ingredients": [{"name": "rice", "quantity": "150g"}]},
+]
+
+
+def feed_in_chunks(text: str, size: int):
+    parser = JsonArrayStream()
+    items = []
+    for start in range(0, len(text), size):
+        items += parser.feed(text[start:start + size])
+    return parser, items
+
+
+def test_every_chunk_size_yields_the_same_objects():
+    text = json.dumps(MEALS)
+    for size in (1, 2, 3, 7, 64, len(text)):
+        parser, items = feed_in_chunks(text, size)
+        assert items == MEALS
+        assert parser.done
+
+
+def test_objects_are_released_as_soon_as_they_close():
+    parser = JsonArrayStream()
+    assert parser.feed('[{"name": "Poha"}, {"name": "Da') == [{"name": "Poha"}]
+    assert parser.feed('l"}') == [{"name": "Dal"}]
+    assert not parser.done
+    assert parser.feed("]") == []
+    assert parser.done
+
+
+def test_text_before_the_array_is_ignored():
+    _, items = feed_in_chunks('```json\n' + json.dumps(MEALS) + '\n```', 5)
+    assert items == MEALS
+
+
+def test_truncated_stream_is_not_done():
+    parser, items = feed_in_chunks(json.dumps(MEALS)[:-20], 4)
+    assert items == MEALS[:2]
+    assert not parser.done
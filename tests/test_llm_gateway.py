@@ -0,0 +1,32 @@
+import pytest
+from google.genai import errors, types
+
+from utils.llm_gateway import _stale_cache
+
+CACHED = types.GenerateContentConfig(cached_content="cachedContents/abc123")
+
+
+def api_error(code: int, status: str, message: str) -> errors.APIError:
+    return errors.APIError(code, {"error": {"code": code, "status": status, "message": message}})
+
+
+@pytest.mark.parametrize("error", [
+    api_error(404, "NOT_FOUND", "Requested entity was not found."),
+    api_error(403, "PERMISSION_DENIED", "CachedContent not found (or permission denied)"),
+    api_error(400, "INVALID_ARGUMENT", "cachedContents/abc123 has expired"),
+])
+def test_errors_about_the_cache_are_stale(error):
+    assert _stale_cache(CACHED, error)
+
+
+@pytest.mark.parametrize("error", [
+    api_error(400, "INVALID_ARGUMENT", "Request contains an invalid argument."),
+    api_error(403, "PERMISSION_DENIED", "The caller does not have permission"),
+])
+def test_other_client_errors_are_not_stale(error):
+    assert not _stale_cache(CACHED, error)
+
+
+def test_calls_without_a_cache_are_never_stale():
+    assert not _stale_cache(types.GenerateContentConfig(), api_error(404, "NOT_FOUND", "Requested entity was not found."))
+    assert not _stale_cache(None, api_error(404, "NOT_FOUND", "Requested entity was not found."))
@@ -0,0 +1,22 @@
+import pytest
+
+from utils.meal_lexicon import looks_like_meal
+
+
+@pytest.mark.parametrize("description", [
+    "2 eggs and a paratha",
+    "chicken biryani with raita",
+    "bowl of oats, banana",
+    "grilled something with sauce",
+    "انڈے اور پراٹھا",
+    "दाल चावल",
+    "daal chawal aur दही",
+    "ナスの味噌炒め",
+])
+def test_left_to_the_model(description):
+    assert looks_like_meal(description)
+
+
+@pytest.mark.parametrize("description", ["hi", "test", "how are you", "sdfgh jkl", "ok", "12"])
+def test_obviously_not_a_meal(description):
+    assert not looks_like_meal(description)
@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import pytest
+
+import routes.meal_plan as meal_plan
+import utils.model_router as model_router
+from schemas.meal_plan_model import MealRequest
+from utils.rate_limiter import LLMOverloaded
+from utils.response_cache import ResponseCache, make_backend
+
+PRIMARY = "primary-model"
+FALLBACK = "fallback-model"
+
+PROFILE = {
+    "meal_goal": "weight_loss",
+    "dietary_preferences": [],
+    "allergies": [],
+    "region": "India",
+    "activity_level": "moderate",
+    "age": 30,
+    "gender": "female",
+    "portion_size": "balanced",
+    "cooking_experience": "beginner",
+    "health_issues": [],
+    "eating_frequency": "three_meals",
+    "bmi": 22.0,
+    "bmi_category": "normal",
+}
+
+
+def meal_dict(name: str, ingredients=(("rice", "150g"),), slot: str = "Lunch") -> dict:
+    return {
+        "meal": slot,
+        "name": name,
+        "ingredients": [{"name": ingredient, "quantity": quantity} for ingredient, quantity in ingredients],
+        "calories": 450,
+        "cooking_instructions": ["Cook everything."],
+        "macros": {"protein": 20, "carbs": 50, "fats": 15},
+        "cooking_time": "20 minutes",
+        "difficulty": "easy",
+        "total_weight": "575g",
+    }
+
+
+class FakeResponse:
+    def __init__(self, meals):
+        self.text = json.dumps(meals)
+
+
+@pytest.fixture
+def route(monkeypatch):
+    monkeypatch.setitem(model_router.ROUTES, "meal_plan.pro", model_router.Route(tiers=[PRIMARY, FALLBACK], deadline=5))
+    monkeypatch.setattr(model_router, "MODEL_STATS", {})
+    monkeypatch.setattr(meal_plan, "meal_plan_cache", ResponseCache("test-meal-plan", make_backend("memory", "test-meal-plan", 100, None), 60))
+
+
+def serve(monkeypatch, primary_fails: bool):
+    async def generate_content(model, contents, config=None, priority=None):
+        if model == PRIMARY and primary_fails:
+            raise LLMOverloaded("quota queue full")
+        return FakeResponse([meal_dict(f"{model} breakfast", slot="Breakfast"), meal_dict(f"{model} lunch"),
+                             meal_dict(f"{model} dinner", slot="Dinner")])
+
+    monkeypatch.setattr(model_router, "generate_content", generate_content)
+    request = MealRequest(**PROFILE, is_pro=True)
+
+    async def main():
+        response = await meal_plan.generate_meal_plan(request)
+        cached = await meal_plan.meal_plan_cache.get(meal_plan.meal_plan_cache_key(request, "meal_plan.pro"))
+        return response, cached
+
+    return asyncio.run(main())
+
+
+def test_primary_answers_are_cached(monkeypatch, route):
+    response, cached = serve(monkeypatch, primary_fails=False)
+    assert response["meals"][0]["name"] == "primary-model breakfast"
+    assert cached == response["meals"]
+
+
+def test_fallback_answers_are_served_but_not_cached(monkeypatch, route):
+    response, cached = serve(monkeypatch, primary_fails=True)
+    assert response["meals"][0]["name"] == "fallback-model breakfast"
+    assert cached is None
@@ -0,0 +1,115 @@
+import pytest
+
+import utils.meal_templates as meal_templates
+from schemas.meal_plan_model import MealRequest
+from utils.meal_templates import TemplateLibrary, create_library, encode_plan, scale_meals, template_bucket
+
+PROFILE = {
+    "meal_goal": "weight_loss",
+    "dietary_preferences": [],
+    "allergies": [],
+    "region": "India",
+    "activity_level": "moderate",
+    "age": 30,
+    "gender": "female",
+    "portion_size": "balanced",
+    "cooking_experience": "beginner",
+    "health_issues": [],
+    "eating_frequency": "three_meals",
+    "bmi": 22.0,
+    "bmi_category": "normal",
+}
+
+
+def meal_dict(name: str, ingredients=(("rice", "150g"),), slot: str = "Lunch") -> dict:
+    return {
+        "meal": slot,
+        "name": name,
+        "ingredients": [{"name": ingredient, "quantity": quantity} for ingredient, quantity in ingredients],
+        "calories": 450,
+        "cooking_instructions": ["Cook everything."],
+        "macros": {"protein": 20, "carbs": 50, "fats": 15},
+        "cooking_time": "20 minutes",
+        "difficulty": "easy",
+        "total_weight": "575g",
+    }
+
+
+BUCKET = template_bucket("weight_loss", "India", [], "three_meals")
+PLANS = [
+    [
+        meal_dict("Peanut butter toast", [("whole wheat bread", "60g"), ("peanut butter", "20g")], slot="Breakfast"),
+        meal_dict("Basil pesto pasta", [("pasta", "120g"), ("basil pesto", "30g")]),
+        meal_dict("Chicken satay", [("chicken", "150g"), ("satay sauce", "40g")], slot="Dinner"),
+    ],
+    [
+        meal_dict("Granola bowl", [("granola", "50g"), ("yogurt", "150g")], slot="Breakfast"),
+        meal_dict("Egg salad sandwich", [("bread", "60g"), ("mayo", "20g"), ("boiled egg", "100g")]),
+        meal_dict("Caesar salad", [("romaine", "100g"), ("caesar dressing", "30g")], slot="Dinner"),
+    ],
+]
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    path = str(tmp_path / "templates.sqlite3")
+    db = create_library(path)
+    for plan in PLANS:
+        db.execute("INSERT INTO templates (bucket, plan) VALUES (?, ?)", (BUCKET, encode_plan(plan)))
+    db.commit()
+    db.close()
+    library = TemplateLibrary(path)
+    monkeypatch.setattr(meal_templates, "_library", library)
+    return library
+
+
+def served(**overrides):
+    return meal_templates.template_meal_plan(MealRequest(**{**PROFILE, **overrides}))
+
+
+@pytest.mark.parametrize("allergies", [["nuts"], ["tree nuts"], ["peanut"], ["egg"], ["fish"], ["Dairy", "None"]])
+def test_any_allergy_goes_to_the_model(library, allergies):
+    # Name matching can't see the nuts in pesto or satay, the egg in mayo or the anchovy in Caesar dressing
+    for _ in PLANS:
+        assert served(allergies=allergies) is None
+
+
+@pytest.mark.parametrize("allergies", [[], ["None"], ["n/a", "No"], [""]])
+def test_no_allergies_are_served_from_the_library(library, allergies):
+    assert served(allergies=allergies) is not None
+
+
+def test_health_issues_and_pro_users_go_to_the_model(library):
+    assert served(health_issues=["diabetes"]) is None
+    assert served(is_pro=True) is None
+
+
+def test_plans_rotate_within_a_bucket(library):
+    names = [served()[0]["name"] for _ in range(3)]
+    assert names == ["Peanut butter toast", "Granola bowl", "Peanut butter toast"]
+
+
+def test_profile_spelling_picks_the_same_bucket(library):
+    assert served(meal_goal="Weight Loss", region="india", dietary_preferences=["None"]) is not None
+    assert served(region="USA") is None
+    assert library.stats()["fell_back_to_model"] == 1
+
+
+def test_unknown_portion_size_goes_to_the_model(library):
+    assert served(portion_size="enormous") is None
+
+
+def test_portions_scale_amounts_calories_and_macros():
+    meal = meal_dict("Egg bhurji", [("eggs", "2 large eggs"), ("onion", "50g"), ("milk", "100 ml (1/2 cup)")])
+    [large] = scale_meals([meal], 1.4)
+    assert [i["quantity"] for i in large["ingredients"]] == ["3 large eggs", "70g", "140 ml (1/2 cup)"]
+    assert large["calories"] == 630
+    assert large["macros"] == {"protein": 28, "carbs": 70, "fats": 21}
+    assert large["total_weight"] == "805g"
+    [small] = scale_meals([meal], 0.7)
+    assert [i["quantity"] for i in small["ingredients"]] == ["1.5 large eggs", "35g", "70 ml (1/2 cup)"]
+
+
+def test_balanced_portions_are_unchanged():
+    meals = [meal_dict("Poha", [("poha", "80g")])]
+    assert scale_meals(meals, 1.0) is meals
@@ -0,0 +1,50 @@
+import asyncio
+
+from utils.name_normalizer import NameIndex, canonical_ingredient_name, canonical_meal_name, slugify
+
+
+def test_meal_names_ignore_case_spacing_and_punctuation():
+    assert canonical_meal_name("Paneer  Tikka!") == canonical_meal_name("paneer tikka")
+
+
+def test_meal_names_ignore_stopwords_and_ampersand():
+    assert canonical_meal_name("Mac & Cheese") == canonical_meal_name("Mac and Cheese")
+    assert canonical_meal_name("The Chicken with Rice") == "chicken rice"
+
+
+def test_meal_names_keep_word_order():
+    assert canonical_meal_name("Chicken Tikka Masala") != canonical_meal_name("Masala Chicken Tikka")
+
+
+def test_ingredient_names_drop_amounts_descriptors_and_notes():
+    assert canonical_ingredient_name("2 ripe bananas (sliced)") == "banana"
+    assert canonical_ingredient_name("tomato, diced") == "tomato"
+    assert canonical_ingredient_name("boneless chicken breast") == canonical_ingredient_name("Chicken breasts")
+
+
+def test_ingredient_synonyms_resolve_to_one_name():
+    assert canonical_ingredient_name("Garbanzo beans") == "chickpea"
+    assert canonical_ingredient_name("Cilantro") == "coriander"
+
+
+def test_non_latin_names_are_kept():
+    assert canonical_meal_name("पनीर टिक्का") == "पनीर टिक्का"
+    assert canonical_ingredient_name("पनीर") == "पनीर"
+
+
+def test_slugify():
+    assert slugify("Paneer  Tikka!") == "paneer_tikka"
+    assert slugify("पनीर") == ""
+
+
+def test_name_index_falls_back_to_a_hash_for_unsluggable_names(tmp_path):
+    index = NameIndex(str(tmp_path / "names.db"))
+    assert index.file_name("meal", "paneer tikka") == "paneer_tikka.png"
+    name = index.file_name("meal", "पनीर टिक्का")
+    assert name.endswith(".png") and len(name) == len("0123456789abcdef.png")
+
+
+def test_name_index_links_persist(tmp_path):
+    path = str(tmp_path / "names.db")
+    asyncio.run(NameIndex(path).link("meal", "paneer tikka", "Paneer_Tikka.png"))
+    assert NameIndex(path).file_name("meal", "paneer tikka") == "Paneer_Tikka.png"
@@ -0,0 +1,73 @@
+import pytest
+
+from utils.nutrition_db import NutritionDB
+
+
+@pytest.fixture(scope="module")
+def db():
+    return NutritionDB(db_path=":memory:")
+
+
+def foods(estimate):
+    return [item.food.name for item in estimate.items]
+
+
+@pytest.mark.parametrize("description, food", [
+    ("fish and chips", "Fish and Chips"),
+    ("2 plates of fish & chips", "Fish and Chips"),
+    ("mac and cheese", "Mac and Cheese"),
+    ("macaroni and cheese for dinner", "Mac and Cheese"),
+    ("mac n cheese", "Mac and Cheese"),
+])
+def test_dish_names_with_separators_are_one_item(db, description, food):
+    estimate = db.estimate(description)
+    assert foods(estimate) == [food]
+    assert estimate.unknown == []
+
+
+@pytest.mark.parametrize("description", [
+    "no eggs, just toast",
+    "toast without butter",
+    "didn't have rice, only dal",
+    "skipped breakfast",
+])
+def test_negations_go_to_the_model(db, description):
+    estimate = db.estimate(description)
+    assert estimate.items == []
+    assert estimate.unknown == [description]
+
+
+def test_implausible_amounts_go_to_the_model(db):
+    estimate = db.estimate("500 eggs and a banana")
+    assert foods(estimate) == ["Banana"]
+    assert estimate.unknown == ["500 eggs"]
+
+
+def test_separate_items_are_still_split(db):
+    estimate = db.estimate("2 eggs and toast, a glass of milk")
+    assert foods(estimate) == ["Egg", "Toast", "Whole Milk"]
+    assert estimate.items[0].grams == 100
+    assert estimate.unknown == []
+
+
+def test_protected_alias_is_not_split(db):
+    assert foods(db.estimate("corn on the cob and an apple")) == ["Corn", "Apple"]
+
+
+@pytest.mark.parametrize("description", ["1/0 apple", "0 apples", "0 cups of rice", "a plate of 0 rice", "a plate of 2 rice"])
+def test_zero_or_unclear_counts_go_to_the_model(db, description):
+    estimate = db.estimate(description)
+    assert estimate.items == []
+    assert estimate.unknown == [description]
+
+
+def test_zero_count_only_drops_its_own_item(db):
+    estimate = db.estimate("2/0 eggs and a banana")
+    assert foods(estimate) == ["Banana"]
+    assert estimate.unknown == ["2/0 eggs"]
+
+
+def test_fractions_still_count(db):
+    [item] = db.estimate("1/2 apple").items
+    assert item.grams == 91
+    assert item.quantity == "0.5 piece (91g)"
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from utils.photo_cache import MultiIndexHash, PhotoAnalysisCache
+
+
+def flip(value: int, bits) -> int:
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+@pytest.mark.parametrize("radius", [0, 1, 4, 7])
+def test_search_matches_a_brute_force_scan(radius):
+    rng = random.Random(radius)
+    index = MultiIndexHash(radius)
+    stored = {}
+    for entry_id in range(300):
+        base = rng.getrandbits(64)
+        stored[entry_id] = base
+        index.add(base, entry_id)
+        # Near neighbours of earlier entries, so there is something inside the radius
+        near = flip(base, rng.sample(range(64), rng.randint(0, radius + 2)))
+        stored[entry_id + 1000] = near
+        index.add(near, entry_id + 1000)
+
+    for _ in range(100):
+        query = flip(rng.choice(list(stored.values())), rng.sample(range(64), rng.randint(0, radius + 1)))
+        expected = sorted(
+            ((value ^ query).bit_count(), entry_id)
+            for entry_id, value in stored.items()
+            if (value ^ query).bit_count() <= radius
+        )
+        assert sorted(index.search(query)) == expected
+
+
+def test_removed_entries_are_not_found():
+    index = MultiIndexHash(4)
+    index.add(0xFFFF, "a")
+    index.add(0xFFFE, "b")
+    index.remove(0xFFFF, "a")
+    assert index.search(0xFFFF) == [(1, "b")]
+    assert index.size == 1
+
+
+def test_cache_serves_near_duplicates_within_their_scope():
+    cache = PhotoAnalysisCache("test-photos", max_entries=10, max_distance=4, ttl=60)
+    cache.set("user:alice", 0b1010_1010, {"name": "Poha"})
+    assert cache.get("user:alice", flip(0b1010_1010, [0, 5, 40])) == {"name": "Poha"}
+    assert cache.get("user:alice", flip(0b1010_1010, [0, 5, 40, 41, 60])) is None
+    assert cache.get("user:bob", 0b1010_1010) is None
+
+
+def test_cache_evicts_least_recently_used():
+    cache = PhotoAnalysisCache("test-photos", max_entries=2, max_distance=0, ttl=60)
+    cache.set("global", 1, "first")
+    cache.set("global", 2, "second")
+    assert cache.get("global", 1) == "first"
+    cache.set("global", 4, "third")
+    assert cache.get("global", 2) is None
+    assert cache.get("global", 1) == "first"
+    assert cache.get("global", 4) == "third"
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+import utils.rate_limiter as rate_limiter
+from utils.rate_limiter import PRIORITY_FREE, PRIORITY_PRO, LLMOverloaded, ModelLimiter, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    return clock
+
+
+def test_bucket_starts_full_and_refills_at_its_rate(clock):
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.wait_time(60) == 0
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    clock.now += 600
+    bucket.take(0)
+    assert bucket.tokens == 60
+
+
+def test_requests_larger_than_a_minute_wait_for_a_full_bucket_only(clock):
+    bucket = TokenBucket(per_minute=1000)
+    assert bucket.wait_time(5000) == 0
+    bucket.take(5000)
+    assert bucket.tokens == 0
+
+
+def test_adjust_corrects_estimates_and_may_go_into_debt(clock):
+    bucket = TokenBucket(per_minute=100)
+    bucket.take(50)
+    bucket.adjust(80)
+    assert bucket.tokens == -30
+    assert bucket.wait_time(10) == pytest.approx(40 / (100 / 60))
+    bucket.adjust(-500)
+    assert bucket.tokens == 100
+
+
+def test_concurrency_limit_is_aimd():
+    limiter = ModelLimiter("test-model", rpm=1000, tpm=1_000_000)
+    limiter.limit = 8
+    limiter.on_throttled()
+    assert limiter.limit == 4
+    limiter.on_success(100)
+    assert limiter.limit == pytest.approx(4.25)
+    for _ in range(20):
+        limiter.on_throttled()
+    assert limiter.limit == rate_limiter.LLM_CONCURRENCY_MIN
+
+
+def test_pro_calls_are_admitted_before_free_ones():
+    async def main():
+        limiter = ModelLimiter("test-model", rpm=1000, tpm=1_000_000)
+        limiter.limit = 1
+        await limiter.acquire(10, PRIORITY_FREE)
+        order = []
+
+        async def call(name, priority):
+            await limiter.acquire(10, priority)
+            order.append(name)
+            limiter.release()
+
+        waiters = [asyncio.create_task(call("free", PRIORITY_FREE)), asyncio.create_task(call("pro", PRIORITY_PRO))]
+        await asyncio.sleep(0)
+        assert limiter.queue_depth() == 2
+        limiter.release()
+        await asyncio.gather(*waiters)
+        return order
+
+    assert asyncio.run(main()) == ["pro", "free"]
+
+
+def test_full_queue_rejects_at_once(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "LLM_QUEUE_MAX_DEPTH", 1)
+
+    async def main():
+        limiter = ModelLimiter("test-model", rpm=1000, tpm=1_000_000)
+        limiter.limit = 1
+        await limiter.acquire(10, PRIORITY_FREE)
+        queued = asyncio.create_task(limiter.acquire(10, PRIORITY_FREE))
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloaded):
+            await limiter.acquire(10, PRIORITY_PRO)
+        queued.cancel()
+        return limiter.rejected
+
+    assert asyncio.run(main()) == 1
+
+
+def test_waiting_past_the_deadline_raises_overloaded(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "LLM_QUEUE_MAX_WAIT", 0.05)
+
+    async def main():
+        limiter = ModelLimiter("test-model", rpm=1, tpm=1_000_000)
+        await limiter.acquire(10, PRIORITY_FREE)
+        limiter.release()
+        # The one request this minute is used up
+        with pytest.raises(LLMOverloaded):
+            await limiter.acquire(10, PRIORITY_FREE)
+
+    asyncio.run(main())
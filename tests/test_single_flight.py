@@ -0,0 +1,77 @@
+import asyncio
+
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def main():
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def fn():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "image-url"
+
+        results = await asyncio.gather(*(flight.do("dish", fn) for _ in range(5)))
+        return results, calls, flight._inflight
+
+    results, calls, inflight = asyncio.run(main())
+    assert results == ["image-url"] * 5
+    assert calls == 1
+    assert inflight == {}
+
+
+def test_cancelling_the_first_caller_does_not_cancel_the_others():
+    async def main():
+        flight = SingleFlight("test")
+
+        async def fn():
+            await asyncio.sleep(0.05)
+            return "image-url"
+
+        leader = asyncio.create_task(flight.do("dish", fn))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("dish", fn))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower, leader
+
+    result, leader = asyncio.run(main())
+    assert result == "image-url"
+    assert leader.cancelled()
+
+
+def test_work_finishes_after_every_caller_is_cancelled():
+    async def main():
+        flight = SingleFlight("test")
+        finished = asyncio.Event()
+
+        async def fn():
+            await asyncio.sleep(0.02)
+            finished.set()
+            return "image-url"
+
+        caller = asyncio.create_task(flight.do("dish", fn))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.wait_for(finished.wait(), 1)
+        await asyncio.sleep(0)
+        return flight._inflight
+
+    assert asyncio.run(main()) == {}
+
+
+def test_errors_reach_every_caller():
+    async def main():
+        flight = SingleFlight("test")
+
+        async def fn():
+            await asyncio.sleep(0.01)
+            raise ValueError("upload failed")
+
+        return await asyncio.gather(*(flight.do("dish", fn) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
@@ -0,0 +1,105 @@
+import asyncio
+
+import routes.meal_plan as meal_plan
+from schemas.meal_plan_model import WeekMealRequest
+from utils.week_plan import UsedMeals, find_duplicates, primary_ingredient
+
+PROFILE = {
+    "meal_goal": "weight_loss",
+    "dietary_preferences": [],
+    "allergies": [],
+    "region": "India",
+    "activity_level": "moderate",
+    "age": 30,
+    "gender": "female",
+    "portion_size": "balanced",
+    "cooking_experience": "beginner",
+    "health_issues": [],
+    "eating_frequency": "three_meals",
+    "bmi": 22.0,
+    "bmi_category": "normal",
+}
+
+
+def meal_dict(name: str, ingredients=(("rice", "150g"),), slot: str = "Lunch") -> dict:
+    return {
+        "meal": slot,
+        "name": name,
+        "ingredients": [{"name": ingredient, "quantity": quantity} for ingredient, quantity in ingredients],
+        "calories": 450,
+        "cooking_instructions": ["Cook everything."],
+        "macros": {"protein": 20, "carbs": 50, "fats": 15},
+        "cooking_time": "20 minutes",
+        "difficulty": "easy",
+        "total_weight": "575g",
+    }
+
+
+def test_primary_ingredient_is_the_heaviest():
+    meal = meal_dict("Dal chawal", [("Basmati rice", "150g"), ("Red lentils", "200 g"), ("Ghee", "1 tsp (5g)")])
+    assert primary_ingredient(meal) == "red lentil"
+
+
+def test_repeated_names_are_duplicates_after_the_first():
+    days = [
+        [meal_dict("Chicken Tikka Masala", [("chicken", "200g")]), meal_dict("Oats", [("oats", "60g")])],
+        [meal_dict("chicken tikka masala", [("chicken", "200g")]), meal_dict("Poha", [("poha", "80g")])],
+    ]
+    assert find_duplicates(days) == [(1, 0)]
+
+
+def test_avoid_names_count_as_already_used():
+    days = [[meal_dict("Masoor Dal", [("lentils", "150g")]), meal_dict("Paneer Wrap", [("paneer", "100g")])]]
+    assert find_duplicates(days, avoid_names=["masoor dal"]) == [(0, 0)]
+
+
+def test_primary_ingredient_repeats_are_capped(monkeypatch):
+    monkeypatch.setattr("utils.week_plan.WEEK_PLAN_MAX_PRIMARY_REPEATS", 2)
+    names = ["Chicken curry", "Chicken salad", "Chicken wrap", "Chicken soup"]
+    days = [[meal_dict(name, [("chicken breast", "200g"), ("rice", "100g")])] for name in names]
+    assert find_duplicates(days) == [(2, 0), (3, 0)]
+
+
+def test_used_meals_summary():
+    used = UsedMeals(["Poha"])
+    assert used.summary() == "meals: Poha"
+    used.add([meal_dict("Chana Masala", [("chickpeas", "150g")]), meal_dict("Chole", [("chickpea", "200g")])])
+    assert used.summary() == "meals: Poha, Chana Masala, Chole\nmain ingredients: chickpea x2"
+
+
+def test_replacements_that_repeat_each_other_are_replaced_again(monkeypatch):
+    calls = []
+
+    async def generate_replacement(request, replaced, kept, used_this_week=""):
+        calls.append(used_this_week)
+        # The first round sends every replacement back as the same dish
+        name = "Veg Pulao" if len(calls) <= 2 else f"Fresh dish {len(calls)}"
+        return meal_dict(name, [(f"ingredient {len(calls)}", "150g")], slot=replaced.meal)
+
+    monkeypatch.setattr(meal_plan, "generate_replacement", generate_replacement)
+    days = [
+        [meal_dict("Rajma", [("kidney beans", "150g")])],
+        [meal_dict("Rajma", [("kidney beans", "150g")])],
+        [meal_dict("Rajma", [("kidney beans", "150g")])],
+    ]
+    request = WeekMealRequest(**PROFILE, days=3)
+
+    replaced = asyncio.run(meal_plan._replace_duplicates(request, days))
+
+    names = [meals[0]["name"] for meals in days]
+    assert len(set(names)) == 3
+    assert find_duplicates(days) == []
+    assert replaced == 2
+    assert len(calls) == 3
+    assert "Veg Pulao" in calls[2]
+
+
+def test_replacements_still_repeated_after_the_last_round_are_not_counted(monkeypatch):
+    async def generate_replacement(request, replaced, kept, used_this_week=""):
+        return meal_dict("Rajma", [("kidney beans", "150g")], slot=replaced.meal)
+
+    monkeypatch.setattr(meal_plan, "generate_replacement", generate_replacement)
+    days = [[meal_dict("Rajma", [("kidney beans", "150g")])], [meal_dict("Rajma", [("kidney beans", "150g")])]]
+    request = WeekMealRequest(**PROFILE, days=2)
+
+    assert asyncio.run(meal_plan._replace_duplicates(request, days)) == 0
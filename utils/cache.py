@@ -0,0 +1,166 @@
+import asyncio
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+
+from utils.config import REDIS_URL
+
+_redis = None
+
+
+def get_redis():
+    """Shared redis.asyncio client for REDIS_URL, created on first use."""
+    global _redis
+    if _redis is None:
+        import redis.asyncio as redis
+
+        _redis = redis.from_url(REDIS_URL)
+    return _redis
+
+
+# Returned by get() on a miss, so that a cached None (e.g. "image does not exist") is still a hit
+MISSING = object()
+
+
+class MemoryCache:
+    """Bounded in-process LRU with a TTL per entry."""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+
+class RedisCache:
+    """Shared cache across workers. Values are stored as JSON."""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._redis = get_redis()
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str):
+        raw = await self._redis.get(self._key(key))
+        if raw is None:
+            return MISSING
+        return json.loads(raw)
+
+    async def set(self, key: str, value, ttl: float):
+        await self._redis.set(self._key(key), json.dumps(value), px=int(ttl * 1000))
+
+    async def delete(self, key: str):
+        await self._redis.delete(self._key(key))
+
+
+class DiskCache:
+    """SQLite-backed cache that survives restarts. Evicts least recently used rows past `max_entries`."""
+
+    def __init__(self, path: str, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL, used_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_used_at ON cache (used_at)")
+        self._db.commit()
+        self._lock = asyncio.Lock()
+
+    def _get(self, key: str):
+        row = self._db.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return MISSING
+        if row[1] < time.time():
+            self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._db.commit()
+            return MISSING
+        self._db.execute("UPDATE cache SET used_at = ? WHERE key = ?", (time.time(), key))
+        self._db.commit()
+        return json.loads(row[0])
+
+    def _set(self, key: str, value, ttl: float):
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now + ttl, now),
+        )
+        self._db.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self._db.commit()
+
+    def _delete(self, key: str):
+        self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+        self._db.commit()
+
+    async def get(self, key: str):
+        async with self._lock:
+            return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value, ttl: float):
+        async with self._lock:
+            await asyncio.to_thread(self._set, key, value, ttl)
+
+    async def delete(self, key: str):
+        async with self._lock:
+            await asyncio.to_thread(self._delete, key)
+
+
+class TieredCache:
+    """In-process LRU in front of an optional shared backend.
+
+    A hit in memory never touches the network; a hit in the shared backend is
+    copied into memory for at most `backfill_ttl` seconds.
+    """
+
+    def __init__(self, memory: MemoryCache, shared=None, backfill_ttl: float = 300):
+        self.memory = memory
+        self.shared = shared
+        self.backfill_ttl = backfill_ttl
+
+    async def get(self, key: str):
+        value = await self.memory.get(key)
+        if value is not MISSING or self.shared is None:
+            return value
+        value = await self.shared.get(key)
+        if value is not MISSING:
+            await self.memory.set(key, value, self.backfill_ttl)
+        return value
+
+    async def set(self, key: str, value, ttl: float):
+        await self.memory.set(key, value, min(ttl, self.backfill_ttl) if self.shared else ttl)
+        if self.shared is not None:
+            await self.shared.set(key, value, ttl)
+
+    async def delete(self, key: str):
+        await self.memory.delete(key)
+        if self.shared is not None:
+            await self.shared.delete(key)
+
+
+def make_cache(namespace: str, max_entries: int = 10_000, backfill_ttl: float = 300) -> TieredCache:
+    """Memory LRU, plus Redis when REDIS_URL is configured."""
+    shared = RedisCache(namespace) if REDIS_URL else None
+    return TieredCache(MemoryCache(max_entries), shared, backfill_ttl)
@@ -1,8 +1,16 @@
 import os
+from dotenv import load_dotenv
+
+# The one place .env is read. Entry points (app/main.py, scripts/) import this module before
+# anything else, so every module-level os.getenv afterwards sees the values.
+load_dotenv()
 
 PEXELS_API_KEY = os.getenv('PEXELS_API_KEY')
 
 
 
 HUGGING_FACE_ACCESS_TOKEN=os.getenv('HUGGING_FACE_API_KEY')
-HUGGING_FACE_MODEL = "stabilityai/stable-diffusion-xl-base-1.0"
\ No newline at end of file
+HUGGING_FACE_MODEL = "stabilityai/stable-diffusion-xl-base-1.0"
+
+# Optional shared cache backend (needs `pip install redis`); in-process caches are used alone when unset
+REDIS_URL = os.getenv('REDIS_URL')
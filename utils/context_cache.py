@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+from utils.log import get_logger
+from utils.metrics import cache_lookup
+
+if TYPE_CHECKING:
+    from google.genai import types
+
+log = get_logger(__name__)
+
+# Register static system instructions with Gemini's explicit context cache and reference them by name
+GEMINI_CONTEXT_CACHE = os.getenv('GEMINI_CONTEXT_CACHE', 'true').lower() == 'true'
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv('GEMINI_CONTEXT_CACHE_TTL', '3600'))
+# Extend a cache's TTL once it has less than this many seconds left
+GEMINI_CONTEXT_CACHE_REFRESH_MARGIN = int(os.getenv('GEMINI_CONTEXT_CACHE_REFRESH_MARGIN', '300'))
+# After a failed create (e.g. the prefix is under the model's minimum cacheable size), wait this long before retrying
+GEMINI_CONTEXT_CACHE_RETRY_AFTER = int(os.getenv('GEMINI_CONTEXT_CACHE_RETRY_AFTER', '3600'))
+
+
+@dataclass
+class CachedPrefix:
+    name: Optional[str] = None
+    expires_at: float = 0.0
+    retry_at: float = 0.0
+
+
+_entries = {}
+# Background create/refresh tasks, one per prefix; kept here so they aren't garbage collected
+_tasks = {}
+_stats = {"hits": 0, "misses": 0, "created": 0, "refreshed": 0, "failed": 0, "invalidated": 0}
+
+
+def _key(model: str, instruction: str) -> tuple:
+    return model, hashlib.sha256(instruction.encode()).hexdigest()
+
+
+def _spawn(key: tuple, coro):
+    if key in _tasks:
+        coro.close()
+        return
+    task = asyncio.create_task(coro)
+    _tasks[key] = task
+    task.add_done_callback(lambda _: _tasks.pop(key, None))
+
+
+async def _create(client, key: tuple, model: str, instruction: str):
+    from google.genai import types
+
+    entry = _entries.setdefault(key, CachedPrefix())
+    try:
+        cached = await client.aio.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                system_instruction=instruction,
+                ttl=f"{GEMINI_CONTEXT_CACHE_TTL}s",
+                display_name=f"welleats-{key[1][:12]}",
+            ),
+        )
+    except Exception as e:
+        log.warning("context cache unavailable, sending the prompt inline", extra={"model": model, "error": str(e)})
+        _stats["failed"] += 1
+        entry.retry_at = time.monotonic() + GEMINI_CONTEXT_CACHE_RETRY_AFTER
+        return
+    entry.name = cached.name
+    entry.expires_at = time.monotonic() + GEMINI_CONTEXT_CACHE_TTL
+    _stats["created"] += 1
+    log.info("cached system prompt", extra={"model": model, "cache": cached.name})
+
+
+async def _refresh(client, key: tuple):
+    from google.genai import types
+
+    entry = _entries[key]
+    try:
+        await client.aio.caches.update(
+            name=entry.name,
+            config=types.UpdateCachedContentConfig(ttl=f"{GEMINI_CONTEXT_CACHE_TTL}s"),
+        )
+    except Exception as e:
+        log.warning("could not refresh context cache", extra={"cache": entry.name, "error": str(e)})
+        entry.name = None
+        return
+    entry.expires_at = time.monotonic() + GEMINI_CONTEXT_CACHE_TTL
+    _stats["refreshed"] += 1
+
+
+def with_cached_prefix(client, model: str, config: "types.GenerateContentConfig"):
+    """Swap `config.system_instruction` for a reference to its cached copy, if one is live.
+
+    Never waits: a missing cache is created (or a near-expiry one extended)
+    in the background and this call goes out with the instruction inline.
+    """
+    if not GEMINI_CONTEXT_CACHE or config is None or not isinstance(config.system_instruction, str):
+        return config
+
+    key = _key(model, config.system_instruction)
+    entry = _entries.get(key)
+    now = time.monotonic()
+    if entry is not None and entry.name and entry.expires_at - now > 5:
+        if entry.expires_at - now < GEMINI_CONTEXT_CACHE_REFRESH_MARGIN:
+            _spawn(key, _refresh(client, key))
+        _stats["hits"] += 1
+        cache_lookup("gemini-context", True)
+        return config.model_copy(update={"system_instruction": None, "cached_content": entry.name})
+
+    _stats["misses"] += 1
+    cache_lookup("gemini-context", False)
+    if entry is None or entry.retry_at <= now:
+        _spawn(key, _create(client, key, model, config.system_instruction))
+    return config
+
+
+def invalidate(cache_name: str):
+    """Forget a cache Gemini no longer recognises (expired or deleted server-side)."""
+    for entry in _entries.values():
+        if entry.name == cache_name:
+            entry.name = None
+            _stats["invalidated"] += 1
+
+
+def context_cache_stats() -> dict:
+    now = time.monotonic()
+    return {
+        **_stats,
+        "prefixes": [
+            {
+                "model": model,
+                "prefix": digest[:12],
+                "cache": entry.name,
+                "expires_in": round(entry.expires_at - now) if entry.name else None,
+            }
+            for (model, digest), entry in _entries.items()
+        ],
+    }
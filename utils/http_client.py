@@ -0,0 +1,57 @@
+import importlib.util
+import os
+from urllib.parse import urlsplit
+
+import httpx
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '20'))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv('HTTP_MAX_CONNECTIONS_PER_HOST', '32'))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '60'))
+
+# HTTP/2 needs the optional `h2` package (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Hosts we talk to on every image request get their own pool so one slow host can't starve the others
+POOLED_HOSTS = [
+    os.getenv('SUPABASE_URL'),
+    os.getenv('SPOONACULAR_BASE_URL', 'https://api.spoonacular.com'),
+    os.getenv('SPOONACULAR_CDN_URL', 'https://spoonacular.com'),
+]
+
+_client = None
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _transport() -> httpx.AsyncHTTPTransport:
+    return httpx.AsyncHTTPTransport(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+            max_keepalive_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the app-lifetime HTTP client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            transport=_transport(),
+            mounts={_origin(host): _transport() for host in POOLED_HOSTS if host},
+        )
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
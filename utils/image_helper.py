@@ -1,57 +1,68 @@
-import requests
-from io import BytesIO
+import httpx
 from fastapi import HTTPException
 import re
 import unicodedata
-from google import genai
-from google.genai import types
-import os
-from dotenv import load_dotenv
-from utils.supabase_helper import supabase, SUPABASE_BUCKET, SUPABASE_PUBLIC_URL
-from supabase import StorageException
+from utils.name_normalizer import canonical_meal_name, get_name_index
+from utils.supabase_helper import SUPABASE_BUCKET, upload_object
+from utils.image_url_cache import resolve_object_url, remember_object_url
+from utils.image_variants import store_variants, variant_srcset
+from utils.single_flight import SingleFlight
+from utils.llm_gateway import generate_content
+from utils.log import get_logger
 
-load_dotenv()
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-
-# Gemini config
-client = genai.Client(api_key=GEMINI_API_KEY)
+log = get_logger(__name__)
 
 
 def get_deterministic_filename(meal_name: str) -> str:
+    """Stored image for a dish; every spelling of the same dish gets the same file."""
+    return get_name_index().file_name("meal", canonical_meal_name(meal_name))
+
+
+def legacy_meal_filename(meal_name: str) -> str:
+    """Key used before names were canonicalized; older images live here."""
     normalized = unicodedata.normalize("NFKD", meal_name).encode("ascii", "ignore").decode("ascii")
     slug = re.sub(r"[^\w\s-]", "", normalized).strip().lower()
     slug = re.sub(r"[\s_-]+", "_", slug)
     return f"{slug}.png"
 
 
-def check_supabase_image(meal_name: str):
-    meal_file_name = get_deterministic_filename(meal_name)
-    image_url = f"{SUPABASE_PUBLIC_URL}/storage/v1/object/public/{SUPABASE_BUCKET}/{meal_file_name}"
+_meal_image_flight = SingleFlight("meal-image")
 
-    response = requests.get(image_url)
-    if response.status_code == 200:
+
+async def check_supabase_image(meal_name: str, use_cache: bool = True):
+    meal_file_name = get_deterministic_filename(meal_name)
+    image_url = await resolve_object_url(SUPABASE_BUCKET, meal_file_name, use_cache=use_cache)
+    if image_url:
         return image_url
-    return None
 
-def upload_to_supabase(meal_name, image_data):
+    # Reuse an image stored under the old key, and remember it for every spelling of this dish
+    legacy_file_name = legacy_meal_filename(meal_name)
+    if legacy_file_name != meal_file_name:
+        image_url = await resolve_object_url(SUPABASE_BUCKET, legacy_file_name, use_cache=use_cache)
+        if image_url:
+            await get_name_index().link("meal", canonical_meal_name(meal_name), legacy_file_name)
+    return image_url
+
+async def upload_to_supabase(meal_name, image_data):
     meal_file_name = get_deterministic_filename(meal_name)
     try:
-        response = supabase.storage.from_("meal_images").upload(meal_file_name, image_data)
-        if isinstance(response, StorageException):
-            print("❌ Supabase Upload Error:", response.message)
-            return None
-        return f"{SUPABASE_PUBLIC_URL}/storage/v1/object/public/{SUPABASE_BUCKET}/{meal_file_name}"
-    except Exception as e:
-        print("❌ Unexpected Error During Upload:", str(e))
+        stored_url = await upload_object(SUPABASE_BUCKET, meal_file_name, image_data)
+        if stored_url:
+            await remember_object_url(SUPABASE_BUCKET, meal_file_name, stored_url)
+        return stored_url
+    except httpx.HTTPError as e:
+        log.warning("meal image upload failed", extra={"file": meal_file_name, "error": str(e)})
         return None
 
 # image_helper.py
 
 
-def generate_image_from_gemini(meal_name: str):
+async def generate_image_from_gemini(meal_name: str):
+    from google.genai import types
+
     prompt = f"A realistic, high-quality photo of {meal_name} served beautifully on a plate. Clean background."
 
-    response = client.models.generate_content(
+    response = await generate_content(
         model="gemini-2.0-flash-exp-image-generation",
         contents=prompt,
         config=types.GenerateContentConfig(response_modalities=["TEXT", "IMAGE"]),
@@ -67,18 +78,39 @@ def generate_image_from_gemini(meal_name: str):
 
 async def generate_meal_image(meal_name: str):
     # ✅ Step 1: Check Supabase
-    existing_image_url = check_supabase_image(meal_name)
+    existing_image_url = await check_supabase_image(meal_name)
     if existing_image_url:
-        return {"image_url": existing_image_url}
+        return await _stored_meal_image(meal_name, existing_image_url)
+
+    # ✅ Steps 2-3 run once per dish, however many requests miss at the same time
+    async def recheck():
+        stored_url = await check_supabase_image(meal_name, use_cache=False)
+        return await _stored_meal_image(meal_name, stored_url) if stored_url else None
+
+    return await _meal_image_flight.do(
+        get_deterministic_filename(meal_name),
+        lambda: _generate_and_store_meal_image(meal_name),
+        recheck=recheck,
+    )
+
+
+async def _stored_meal_image(meal_name: str, image_url: str):
+    # check_supabase_image links legacy hits, so this is the file that was found
+    srcset = await variant_srcset(SUPABASE_BUCKET, get_deterministic_filename(meal_name), image_url)
+    return {"image_url": image_url, "srcset": srcset}
+
 
+async def _generate_and_store_meal_image(meal_name: str):
     # ✅ Step 2: Generate using Gemini
-    generated_image_data = generate_image_from_gemini(meal_name)
+    generated_image_data = await generate_image_from_gemini(meal_name)
     if not generated_image_data:
         raise HTTPException(status_code=500, detail="Gemini failed to generate image")
 
     # ✅ Step 3: Upload to Supabase
-    stored_url = upload_to_supabase(meal_name, generated_image_data)
+    stored_url = await upload_to_supabase(meal_name, generated_image_data)
     if not stored_url:
         raise HTTPException(status_code=500, detail="Image upload failed")
 
-    return {"image_url": stored_url}
+    # ✅ Step 4: Small WebP/AVIF copies for list views
+    srcset = await store_variants(SUPABASE_BUCKET, get_deterministic_filename(meal_name), generated_image_data)
+    return {"image_url": stored_url, "srcset": srcset}
@@ -0,0 +1,65 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from utils.metrics import stage
+
+IMAGE_DECODE_WORKERS = int(os.getenv('IMAGE_DECODE_WORKERS', str(min(4, os.cpu_count() or 1))))
+ANALYZE_IMAGE_MAX_WIDTH = 800
+ANALYZE_IMAGE_JPEG_QUALITY = 85
+
+# Pillow (~60ms to import) is imported inside the functions below, on the decode pool
+# Pillow releases the GIL while decoding/resampling, so threads give real parallelism here
+_executor = ThreadPoolExecutor(max_workers=IMAGE_DECODE_WORKERS, thread_name_prefix="image-decode")
+
+
+def downscale_to_jpeg(fileobj, max_width: int = ANALYZE_IMAGE_MAX_WIDTH) -> bytes:
+    """Decode, downscale to at most `max_width` and re-encode as JPEG.
+
+    For JPEG input, draft() makes libjpeg decode at 1/2, 1/4 or 1/8 scale, so
+    the full-resolution bitmap of a phone photo is never materialized.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(fileobj) as image:
+        image.draft("RGB", (max_width, max_width))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if image.width > max_width:
+            ratio = max_width / float(image.width)
+            new_height = int(float(image.height) * ratio)
+            image = image.resize((max_width, new_height), Image.Resampling.LANCZOS)
+
+        output = BytesIO()
+        image.save(output, format="JPEG", quality=ANALYZE_IMAGE_JPEG_QUALITY, optimize=True)
+        return output.getvalue()
+
+
+async def prepare_image_for_model(fileobj, max_width: int = ANALYZE_IMAGE_MAX_WIDTH) -> bytes:
+    """downscale_to_jpeg on the decode pool, off the event loop."""
+    with stage("image_resize"):
+        return await asyncio.get_running_loop().run_in_executor(_executor, downscale_to_jpeg, fileobj, max_width)
+
+
+def dhash(image_jpeg: bytes, hash_size: int = 8) -> int:
+    """64-bit difference hash: each bit says whether a pixel is brighter than its right neighbour."""
+    from PIL import Image
+
+    with Image.open(BytesIO(image_jpeg)) as image:
+        image.draft("L", (hash_size * 8, hash_size * 8))
+        pixels = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR).tobytes()
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+async def image_dhash(image_jpeg: bytes) -> int:
+    """dhash on the decode pool, off the event loop."""
+    with stage("image_hash"):
+        return await asyncio.get_running_loop().run_in_executor(_executor, dhash, image_jpeg)
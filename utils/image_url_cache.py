@@ -0,0 +1,43 @@
+import os
+
+from utils.cache import MISSING, make_cache
+from utils.http_client import get_http_client
+from utils.metrics import cache_lookup, stage
+from utils.supabase_helper import public_object_url
+
+# Stored objects are never deleted, so positives can live long; negatives expire quickly
+# so that an image uploaded by another worker is picked up soon.
+IMAGE_URL_POSITIVE_TTL = float(os.getenv('IMAGE_URL_POSITIVE_TTL', str(24 * 3600)))
+IMAGE_URL_NEGATIVE_TTL = float(os.getenv('IMAGE_URL_NEGATIVE_TTL', '60'))
+IMAGE_URL_CACHE_SIZE = int(os.getenv('IMAGE_URL_CACHE_SIZE', '50000'))
+
+_cache = make_cache("image-url", max_entries=IMAGE_URL_CACHE_SIZE)
+
+
+async def resolve_object_url(bucket: str, file_name: str, use_cache: bool = True):
+    """Return the public URL of a stored object, or None if it does not exist.
+
+    `use_cache=False` always probes storage (the result is still cached).
+    """
+    key = f"{bucket}/{file_name}"
+    if use_cache:
+        cached = await _cache.get(key)
+        cache_lookup("image-url", cached is not MISSING)
+        if cached is not MISSING:
+            return cached
+
+    image_url = public_object_url(bucket, file_name)
+    # HEAD only: we need the status, not the PNG body
+    with stage("supabase_probe"):
+        response = await get_http_client().head(image_url)
+    if response.status_code == 200:
+        await _cache.set(key, image_url, IMAGE_URL_POSITIVE_TTL)
+        return image_url
+    if response.status_code in (400, 404):
+        await _cache.set(key, None, IMAGE_URL_NEGATIVE_TTL)
+    return None
+
+
+async def remember_object_url(bucket: str, file_name: str, image_url: str):
+    """Record a freshly uploaded object so the next lookup skips the probe."""
+    await _cache.set(f"{bucket}/{file_name}", image_url, IMAGE_URL_POSITIVE_TTL)
@@ -0,0 +1,185 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import httpx
+
+from utils.http_client import get_http_client
+from utils.image_url_cache import remember_object_url, resolve_object_url
+from utils.metrics import stage
+from utils.supabase_helper import public_object_url, upload_object
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# Resized copies stored next to every generated image, so list views don't download the full PNG
+IMAGE_VARIANTS = os.getenv('IMAGE_VARIANTS', 'true').lower() == 'true'
+IMAGE_VARIANT_WIDTHS = sorted({int(w) for w in os.getenv('IMAGE_VARIANT_WIDTHS', '100,300,600').split(',') if w.strip()})
+# AVIF is only produced when this Pillow build can encode it
+IMAGE_VARIANT_FORMATS = [f.strip().lower() for f in os.getenv('IMAGE_VARIANT_FORMATS', 'webp').split(',') if f.strip()]
+IMAGE_VARIANT_QUALITY = int(os.getenv('IMAGE_VARIANT_QUALITY', '80'))
+# Encoding holds the GIL for long stretches, so variants are rendered in worker processes
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', str(min(2, os.cpu_count() or 1))))
+# How many images found in storage without variants are backfilled at once
+IMAGE_VARIANT_BACKFILL_CONCURRENCY = int(os.getenv('IMAGE_VARIANT_BACKFILL_CONCURRENCY', '2'))
+
+CONTENT_TYPES = {"webp": "image/webp", "avif": "image/avif"}
+
+_pool = None
+_formats = None
+_backfills = {}
+_backfill_semaphore = None
+
+
+def variant_formats() -> list:
+    """IMAGE_VARIANT_FORMATS minus any this Pillow build can't encode (checked once, on first use)."""
+    global _formats
+    if _formats is None:
+        from PIL import features
+
+        _formats = [fmt for fmt in IMAGE_VARIANT_FORMATS if features.check(fmt)]
+    return _formats
+
+
+def _enabled() -> bool:
+    return IMAGE_VARIANTS and bool(IMAGE_VARIANT_WIDTHS) and bool(variant_formats())
+
+
+def variant_file_name(file_name: str, width: int, fmt: str) -> str:
+    """`banana.png` at 300px as WebP is stored as `banana_300w.webp`."""
+    return f"{os.path.splitext(file_name)[0]}_{width}w.{fmt}"
+
+
+def render_variants(data: bytes, widths: list, formats: list, quality: int = IMAGE_VARIANT_QUALITY) -> list:
+    """Re-encode an image at each width and format. Returns [(width, fmt, bytes)].
+
+    Never upscales: widths above the source are encoded at the source size, so
+    every configured width exists and clients can build URLs without a lookup.
+    EXIF, XMP and ICC metadata are dropped.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    image.info = {}
+    encoded = {}
+    variants = []
+    for width in widths:
+        size = min(width, image.width)
+        if size != image.width:
+            resized = image.resize((size, max(1, round(image.height * size / image.width))), Image.Resampling.LANCZOS)
+        else:
+            resized = image
+        for fmt in formats:
+            # Widths clamped to the source size share one encoding
+            if (size, fmt) not in encoded:
+                output = BytesIO()
+                resized.save(output, format=fmt.upper(), quality=quality)
+                encoded[size, fmt] = output.getvalue()
+            variants.append((width, fmt, encoded[size, fmt]))
+    return variants
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, not fork: forking a process with a running event loop and open sockets is unsafe
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_VARIANT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_variant_pool():
+    """Cancel pending backfills and stop the worker processes; call before closing the HTTP client."""
+    global _pool
+    for task in list(_backfills.values()):
+        task.cancel()
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def srcset_urls(bucket: str, file_name: str) -> dict:
+    """{format: {width: public URL}} for the variants of a stored image."""
+    return {
+        fmt: {str(width): public_object_url(bucket, variant_file_name(file_name, width, fmt)) for width in IMAGE_VARIANT_WIDTHS}
+        for fmt in variant_formats()
+    }
+
+
+def _marker(file_name: str) -> str:
+    # Uploaded last, so its presence means the whole set is there
+    return variant_file_name(file_name, IMAGE_VARIANT_WIDTHS[-1], variant_formats()[-1])
+
+
+async def store_variants(bucket: str, file_name: str, data: bytes):
+    """Render and upload every variant of `file_name`. Returns the srcset map, or None on failure."""
+    if not _enabled():
+        return None
+    try:
+        with stage("image_variants"):
+            variants = await asyncio.get_running_loop().run_in_executor(
+                _get_pool(), render_variants, data, IMAGE_VARIANT_WIDTHS, variant_formats()
+            )
+    except Exception as e:
+        log.warning("could not render image variants", extra={"bucket": bucket, "file": file_name, "error": str(e)})
+        return None
+
+    # Upsert: a backfill may be retrying a set that was only partly uploaded
+    files = [(variant_file_name(file_name, width, fmt), fmt, body) for width, fmt, body in variants]
+    marker = _marker(file_name)
+    try:
+        uploaded = await asyncio.gather(*[
+            upload_object(bucket, name, body, content_type=CONTENT_TYPES[fmt], upsert=True) for name, fmt, body in files if name != marker
+        ])
+        if not all(uploaded):
+            return None
+        name, fmt, body = next(f for f in files if f[0] == marker)
+        marker_url = await upload_object(bucket, name, body, content_type=CONTENT_TYPES[fmt], upsert=True)
+    except httpx.HTTPError as e:
+        log.warning("image variant upload failed", extra={"bucket": bucket, "file": file_name, "error": str(e)})
+        return None
+    if not marker_url:
+        return None
+    await remember_object_url(bucket, marker, marker_url)
+    return srcset_urls(bucket, file_name)
+
+
+async def _backfill(bucket: str, file_name: str, image_url: str):
+    global _backfill_semaphore
+    if _backfill_semaphore is None:
+        _backfill_semaphore = asyncio.Semaphore(IMAGE_VARIANT_BACKFILL_CONCURRENCY)
+    try:
+        async with _backfill_semaphore:
+            response = await get_http_client().get(image_url)
+            if response.status_code == 200:
+                await store_variants(bucket, file_name, response.content)
+    except httpx.HTTPError as e:
+        log.warning("could not download image for variants", extra={"url": image_url, "error": str(e)})
+    finally:
+        _backfills.pop(f"{bucket}/{file_name}", None)
+
+
+async def variant_srcset(bucket: str, file_name: str, image_url: str):
+    """srcset map for an image already in storage, or None while its variants don't exist yet.
+
+    Images stored before variants existed (or whose variants failed) get them
+    rendered in the background, so a later request finds them.
+    """
+    if not _enabled():
+        return None
+    try:
+        if await resolve_object_url(bucket, _marker(file_name)):
+            return srcset_urls(bucket, file_name)
+    except httpx.HTTPError:
+        # The original is still servable; variants are only an optimization
+        return None
+
+    key = f"{bucket}/{file_name}"
+    if key not in _backfills:
+        _backfills[key] = asyncio.create_task(_backfill(bucket, file_name, image_url))
+    return None
@@ -1,77 +1,108 @@
-import requests
+import httpx
 import os
-from io import BytesIO
-from supabase import create_client, Client
 from fastapi import HTTPException
-from google import genai
-from google.genai import types
-from dotenv import load_dotenv
+from utils.llm_gateway import generate_content
+from utils.http_client import get_http_client
+from utils.supabase_helper import upload_object
+from utils.image_url_cache import resolve_object_url, remember_object_url
+from utils.image_variants import store_variants, variant_srcset
+from utils.single_flight import SingleFlight
+from utils.ingredient_manifest import manifest_url
+from utils.name_normalizer import canonical_ingredient_name, get_name_index
+from utils.metrics import stage
+from utils.log import get_logger
 
-load_dotenv()
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+log = get_logger(__name__)
 
 
-SUPABASE_PUBLIC_URL=os.getenv('SUPABASE_URL')
-SUPABASE_PUBLIC_KEY=os.getenv('SUPABASE_KEY')
 SUPABASE_BUCKET_INGREDIENTS = "ingredients"  
-supabase: Client = create_client(SUPABASE_PUBLIC_URL, SUPABASE_PUBLIC_KEY)
 
 HUGGING_FACE_ACCESS_TOKEN=os.getenv('HUGGING_FACE_API_KEY')
 HUGGING_FACE_MODEL = "stabilityai/stable-diffusion-xl-base-1.0"
 
 SPOONACULAR_API_KEY = os.getenv("SPOONACULAR_API_KEY")
-client = genai.Client(api_key=GEMINI_API_KEY)
+# Overridable so benchmarks can point at a local stand-in (benchmarks/fake_services.py)
+SPOONACULAR_BASE_URL = os.getenv('SPOONACULAR_BASE_URL', 'https://api.spoonacular.com')
+SPOONACULAR_CDN_URL = os.getenv('SPOONACULAR_CDN_URL', 'https://spoonacular.com')
 
+_ingredient_image_flight = SingleFlight("ingredient-image")
 
-def check_supabase_image_ingredient(ingredient_name: str):
+
+def get_ingredient_filename(ingredient_name: str) -> str:
+    """Stored image for an ingredient; "Bananas", "ripe banana" and "banana " share one file."""
+    return get_name_index().file_name("ingredient", canonical_ingredient_name(ingredient_name))
+
+
+def legacy_ingredient_filename(ingredient_name: str) -> str:
+    """Key used before names were canonicalized; older images live here."""
+    return f"{ingredient_name.replace(' ', '_')}.png"
+
+
+async def check_supabase_image_ingredient(ingredient_name: str, use_cache: bool = True):
     """Check if the ingredient image already exists in Supabase Storage."""
-    ingredient_file_name = f"{ingredient_name.replace(' ', '_')}.png"
-    image_url = f"{SUPABASE_PUBLIC_URL}/storage/v1/object/public/{SUPABASE_BUCKET_INGREDIENTS}/{ingredient_file_name}"
+    ingredient_file_name = get_ingredient_filename(ingredient_name)
 
-    # ✅ Test if file exists
-    response = requests.get(image_url)
-    if response.status_code == 200:
+    # ✅ Test if file exists (cached, HEAD on a miss)
+    image_url = await resolve_object_url(SUPABASE_BUCKET_INGREDIENTS, ingredient_file_name, use_cache=use_cache)
+    if image_url:
         return image_url
-    return None
 
-def fetch_spoonacular_image(ingredient_name: str):
+    # Reuse an image stored under the old key, and remember it for every spelling of this ingredient
+    legacy_file_name = legacy_ingredient_filename(ingredient_name)
+    if legacy_file_name != ingredient_file_name:
+        image_url = await resolve_object_url(SUPABASE_BUCKET_INGREDIENTS, legacy_file_name, use_cache=use_cache)
+        if image_url:
+            await get_name_index().link("ingredient", canonical_ingredient_name(ingredient_name), legacy_file_name)
+    return image_url
+
+async def fetch_spoonacular_image(ingredient_name: str):
     """Fetch ingredient image from Spoonacular API."""
-    url = f"https://api.spoonacular.com/food/ingredients/search?query={ingredient_name}&apiKey={SPOONACULAR_API_KEY}"
-    response = requests.get(url)
+    with stage("spoonacular"):
+        return await _fetch_spoonacular_image(ingredient_name)
+
+
+async def _fetch_spoonacular_image(ingredient_name: str):
+    http = get_http_client()
+    response = await http.get(
+        f"{SPOONACULAR_BASE_URL}/food/ingredients/search",
+        params={"query": ingredient_name, "apiKey": SPOONACULAR_API_KEY},
+    )
 
     if response.status_code == 200:
         data = response.json()
         if data.get("results"):
             ingredient_name = data["results"][0]["name"].replace(" ", "-").lower()
-            image_url = f"https://spoonacular.com/cdn/ingredients_100x100/{ingredient_name}.jpg"
+            image_url = f"{SPOONACULAR_CDN_URL}/cdn/ingredients_100x100/{ingredient_name}.jpg"
 
-            # ✅ Verify if Spoonacular Image Exists
-            image_response = requests.get(image_url)
+            # ✅ Verify if Spoonacular Image Exists (headers only, the body is downloaded next)
+            image_response = await http.head(image_url)
             if image_response.status_code == 200:
-                print("Image returned from spoonacular")
+                log.debug("image found on spoonacular", extra={"ingredient": ingredient_name})
                 return image_url  # ✅ Return valid image URL
             else:
-                print(f"❌ Spoonacular returned missing image for {ingredient_name}")
+                log.info("spoonacular image missing", extra={"ingredient": ingredient_name})
                 return None
     return None
 
-def download_image_data_ingredient(image_url):
+async def download_image_data_ingredient(image_url):
     """Download image from URL and return binary data."""
     if not image_url:
         return None  # ✅ If image_url is None, return None immediately
     
     try:
-        response = requests.get(image_url, stream=True)
+        with stage("image_download"):
+            response = await get_http_client().get(image_url)
         response.raise_for_status()
-        image_data = BytesIO(response.content)
-        return image_data.getvalue()
-    except requests.RequestException as e:
-        print(f"❌ Error downloading image: {e}")
+        return response.content
+    except httpx.HTTPError as e:
+        log.warning("image download failed", extra={"url": image_url, "error": str(e)})
         return None
         
 
-def generate_ingredient_image_from_gemini(ingredient_name: str):
+async def generate_ingredient_image_from_gemini(ingredient_name: str):
       """Generate an AI ingredient image using Hugging Face Stable Diffusion."""
+      from google.genai import types
+
       prompt = (
         f"A clear, isolated stock photo of {ingredient_name}, sliced or whole, "
         f"on a clean white background. The ingredient should be fresh, realistic, "
@@ -82,7 +113,7 @@ def generate_ingredient_image_from_gemini(ingredient_name: str):
         f"Size should be 100x100 pixels, perfectly framed, no blur or artistic details."
     )
 
-      response = client.models.generate_content(
+      response = await generate_content(
         model="gemini-2.0-flash-exp-image-generation",
         contents=prompt,
         config=types.GenerateContentConfig(response_modalities=["TEXT", "IMAGE"]),
@@ -95,58 +126,85 @@ def generate_ingredient_image_from_gemini(ingredient_name: str):
       return None  # ❌ no image generated
 
 
-def upload_to_supabase_ingredient(ingredient_name, image_data):
+async def upload_to_supabase_ingredient(ingredient_name, image_data):
     """Upload image to Supabase Storage and return public URL."""
     if not image_data:
-        print("❌ Skipping Supabase upload - No valid image data")
+        log.warning("skipping ingredient upload, no image data", extra={"ingredient": ingredient_name})
         return None    
-    ingredient_file_name = f"{ingredient_name.replace(' ', '_')}.png"
-    storage_path = f"{ingredient_file_name}"
+    storage_path = get_ingredient_filename(ingredient_name)
 
     try:
         # ✅ Upload image to Supabase
-        response = supabase.storage.from_("ingredients").upload(storage_path, image_data)
-
-        # ✅ Handle errors
-        if isinstance(response, Exception):
-            print("❌ Supabase Upload Error:", response)
-            return None
-
-        # ✅ Return public URL
-        return f"{SUPABASE_PUBLIC_URL}/storage/v1/object/public/{SUPABASE_BUCKET_INGREDIENTS}/{storage_path}"
+        stored_url = await upload_object(SUPABASE_BUCKET_INGREDIENTS, storage_path, image_data)
+        if stored_url:
+            await remember_object_url(SUPABASE_BUCKET_INGREDIENTS, storage_path, stored_url)
+        return stored_url
     
-    except Exception as e:
-        print("❌ Unexpected Upload Error:", str(e))
+    except httpx.HTTPError as e:
+        log.warning("ingredient image upload failed", extra={"file": storage_path, "error": str(e)})
         return None
 
-async def generate_ingredient_image(ingredient_name: str):
+async def generate_ingredient_image(ingredient_name: str, use_manifest: bool = True):
     """Fetch or generate an ingredient image and store it in Supabase."""
 
+    # Pre-warmed ingredients (scripts/prewarm_ingredients.py) need no network at all
+    if use_manifest:
+        for file_name in (get_ingredient_filename(ingredient_name), legacy_ingredient_filename(ingredient_name)):
+            prewarmed_url = manifest_url(file_name)
+            if prewarmed_url:
+                return await _stored_ingredient_image(file_name, prewarmed_url)
+
     # Check Supabase Storage First
-    existing_image_url = check_supabase_image_ingredient(ingredient_name)
+    existing_image_url = await check_supabase_image_ingredient(ingredient_name)
     if existing_image_url:
-        return {"image_url": existing_image_url}
+        # check_supabase_image_ingredient links legacy hits, so this is the file that was found
+        return await _stored_ingredient_image(get_ingredient_filename(ingredient_name), existing_image_url)
+
+    # Everything below runs once per ingredient, however many requests miss at the same time
+    async def recheck():
+        stored_url = await check_supabase_image_ingredient(ingredient_name, use_cache=False)
+        return await _stored_ingredient_image(get_ingredient_filename(ingredient_name), stored_url) if stored_url else None
+
+    return await _ingredient_image_flight.do(
+        get_ingredient_filename(ingredient_name),
+        lambda: _fetch_or_generate_ingredient_image(ingredient_name),
+        recheck=recheck,
+    )
+
+
+async def _stored_ingredient_image(file_name: str, image_url: str):
+    srcset = await variant_srcset(SUPABASE_BUCKET_INGREDIENTS, file_name, image_url)
+    return {"image_url": image_url, "srcset": srcset}
+
+
+async def _stored_with_variants(ingredient_name: str, stored_url: str, image_data: bytes):
+    srcset = await store_variants(SUPABASE_BUCKET_INGREDIENTS, get_ingredient_filename(ingredient_name), image_data)
+    return {"image_url": stored_url, "srcset": srcset}
+
 
+async def _fetch_or_generate_ingredient_image(ingredient_name: str):
     #  Try Fetching from Free API (Spoonacular)
-    spoonacular_image_url = fetch_spoonacular_image(ingredient_name)
+    spoonacular_image_url = await fetch_spoonacular_image(ingredient_name)
     if spoonacular_image_url:
-        image_data = download_image_data_ingredient(spoonacular_image_url)
+        image_data = await download_image_data_ingredient(spoonacular_image_url)
         if image_data:
-            stored_url = upload_to_supabase_ingredient(ingredient_name, image_data)
-            return {"image_url": stored_url or spoonacular_image_url}
+            stored_url = await upload_to_supabase_ingredient(ingredient_name, image_data)
+            if stored_url:
+                return await _stored_with_variants(ingredient_name, stored_url, image_data)
+            return {"image_url": spoonacular_image_url, "srcset": None}
 
   
 
     # ✅ Step 4: Generate Using Hugging Face AI
-    generated_image_data = generate_ingredient_image_from_gemini(ingredient_name)
+    generated_image_data = await generate_ingredient_image_from_gemini(ingredient_name)
     if not generated_image_data:
         raise HTTPException(status_code=500, detail="Failed to generate AI image")
     
     if not isinstance(generated_image_data, bytes):
-        print("❌ AI Image Generation Error: Expected bytes, received", type(generated_image_data))
+        log.error("image generation returned no bytes", extra={"type": type(generated_image_data).__name__})
         raise HTTPException(status_code=500, detail="Invalid AI image format")
 
     # ✅ Step 5: Upload AI Image to Supabase
-    stored_url = upload_to_supabase_ingredient(ingredient_name, generated_image_data)
+    stored_url = await upload_to_supabase_ingredient(ingredient_name, generated_image_data)
     if stored_url:
-        return {"image_url": stored_url}
\ No newline at end of file
+        return await _stored_with_variants(ingredient_name, stored_url, generated_image_data)
\ No newline at end of file
@@ -0,0 +1,59 @@
+import json
+import os
+import time
+
+from utils.log import get_logger
+from utils.metrics import cache_lookup
+
+log = get_logger(__name__)
+
+# Written by scripts/prewarm_ingredients.py: {storage file name: public URL}
+INGREDIENT_MANIFEST_PATH = os.getenv('INGREDIENT_MANIFEST_PATH', 'data/ingredient_manifest.json')
+# How often a running worker checks whether the manifest file has been rewritten
+INGREDIENT_MANIFEST_RELOAD_INTERVAL = float(os.getenv('INGREDIENT_MANIFEST_RELOAD_INTERVAL', '60'))
+
+_manifest = {}
+_loaded_mtime = None
+_checked_at = 0.0
+
+
+def read_manifest(path: str = INGREDIENT_MANIFEST_PATH) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f).get("images", {})
+    except FileNotFoundError:
+        return {}
+
+
+def write_manifest(images: dict, path: str = INGREDIENT_MANIFEST_PATH):
+    """Atomically replace the manifest, so a reader never sees a half-written file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"updated_at": int(time.time()), "images": images}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _maybe_reload():
+    global _manifest, _loaded_mtime, _checked_at
+    now = time.monotonic()
+    if _loaded_mtime is not None and now - _checked_at < INGREDIENT_MANIFEST_RELOAD_INTERVAL:
+        return
+    _checked_at = now
+    try:
+        mtime = os.stat(INGREDIENT_MANIFEST_PATH).st_mtime
+    except FileNotFoundError:
+        _manifest, _loaded_mtime = {}, 0
+        return
+    if mtime != _loaded_mtime:
+        _manifest = read_manifest()
+        _loaded_mtime = mtime
+        log.info("loaded ingredient manifest", extra={"images": len(_manifest)})
+
+
+def manifest_url(file_name: str):
+    """Public URL of a pre-warmed ingredient image, or None. A dict lookup on the hot path."""
+    _maybe_reload()
+    url = _manifest.get(file_name)
+    cache_lookup("ingredient-manifest", url is not None)
+    return url
@@ -0,0 +1,520 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import sqlite3
+import time
+import uuid
+from collections import Counter
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+
+from utils.cache import get_redis
+from utils.http_client import get_http_client
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+JOBS_BACKEND = os.getenv('JOBS_BACKEND', 'memory')  # memory | sqlite | redis
+# memory only works with a single app worker; sqlite is shared by workers on one host, redis by any number of hosts
+JOBS_PATH = os.getenv('JOBS_PATH', 'jobs.sqlite3')
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', '8'))
+JOBS_QUEUE_MAX = int(os.getenv('JOBS_QUEUE_MAX', '1000'))
+# How long finished results (and idempotency keys) are kept for polling
+JOBS_RESULT_TTL = float(os.getenv('JOBS_RESULT_TTL', str(24 * 3600)))
+# A job still "running" this long after it started belongs to a worker that died
+JOBS_LEASE = float(os.getenv('JOBS_LEASE', '600'))
+JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', '0.5'))
+JOBS_WEBHOOK_ATTEMPTS = int(os.getenv('JOBS_WEBHOOK_ATTEMPTS', '3'))
+# When set, webhooks carry X-Job-Signature: sha256=<HMAC of the body>
+JOBS_WEBHOOK_SECRET = os.getenv('JOBS_WEBHOOK_SECRET')
+# Comma-separated hosts webhooks may go to (a host also allows its subdomains); empty allows any public host
+JOBS_WEBHOOK_ALLOWED_HOSTS = [
+    host.strip().lower() for host in os.getenv('JOBS_WEBHOOK_ALLOWED_HOSTS', '').split(',') if host.strip()
+]
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class IdempotencyConflict(Exception):
+    """The idempotency key was already used for a different request."""
+
+
+class WebhookRejected(Exception):
+    """The webhook URL is not an http(s) URL on a public host."""
+
+
+async def check_webhook_url(url: str) -> str:
+    """Raise WebhookRejected unless `url` may receive a webhook; returns the address to deliver to.
+
+    The host must be on JOBS_WEBHOOK_ALLOWED_HOSTS (when set) and every
+    address it resolves to must be public: no loopback, private, link-local
+    or reserved ranges, so callers can't make the server post to itself or
+    to cloud metadata endpoints. Deliveries connect to the returned address
+    instead of resolving the name again, so a DNS answer that changes after
+    the check can't send them anywhere else.
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower().rstrip(".")
+    if parts.scheme not in ("http", "https") or not host:
+        raise WebhookRejected("webhook_url must be an http(s) URL")
+    if JOBS_WEBHOOK_ALLOWED_HOSTS and not any(
+        host == allowed or host.endswith(f".{allowed}") for allowed in JOBS_WEBHOOK_ALLOWED_HOSTS
+    ):
+        raise WebhookRejected(f"webhook host {host} is not allowed")
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        addresses = await asyncio.get_running_loop().getaddrinfo(host, port, proto=6)
+    except (OSError, ValueError) as e:
+        raise WebhookRejected(f"webhook host {host} does not resolve: {e}")
+    checked = [ipaddress.ip_address(sockaddr[0].split("%")[0]) for *_, sockaddr in addresses]
+    if not checked:
+        raise WebhookRejected(f"webhook host {host} does not resolve")
+    for address in checked:
+        if not address.is_global or address.is_multicast:
+            raise WebhookRejected(f"webhook host {host} is not a public address")
+    return str(checked[0])
+
+
+def pin_to_address(url: str, address: str):
+    """Point `url` at `address`; returns (url, headers, extensions) for the request.
+
+    The Host header and the TLS server name (SNI and certificate check)
+    stay those of the original host.
+    """
+    parts = urlsplit(url)
+    host = parts.hostname
+    try:
+        ipaddress.ip_address(host)
+        return url, {}, {}
+    except ValueError:
+        pass
+    port = f":{parts.port}" if parts.port else ""
+    userinfo = parts.netloc.rpartition("@")[0]
+    netloc = f"[{address}]" if ":" in address else address
+    netloc = f"{userinfo}@{netloc}{port}" if userinfo else f"{netloc}{port}"
+    return urlunsplit(parts._replace(netloc=netloc)), {"Host": f"{host}{port}"}, {"sni_hostname": host}
+
+
+class MemoryJobStore:
+    """Jobs, idempotency keys and the queue in this process."""
+
+    def __init__(self, max_queued: int = JOBS_QUEUE_MAX):
+        self._jobs = {}
+        self._keys = {}
+        self._queue = asyncio.Queue(max_queued)
+        self._pruned_at = 0.0
+
+    def _prune(self):
+        now = time.time()
+        if now - self._pruned_at < 60:
+            return
+        self._pruned_at = now
+        for table in (self._jobs, self._keys):
+            for key in [key for key, (expires_at, _) in table.items() if expires_at < now]:
+                del table[key]
+
+    async def get(self, job_id: str):
+        expires_at, job = self._jobs.get(job_id, (0, None))
+        return job if expires_at >= time.time() else None
+
+    async def save(self, job: dict, ttl: float):
+        self._prune()
+        self._jobs[job["id"]] = (time.time() + ttl, dict(job))
+
+    async def delete(self, job_id: str):
+        self._jobs.pop(job_id, None)
+
+    async def reserve(self, key: str, job_id: str, ttl: float):
+        """Bind `key` to `job_id` unless it is already bound; returns the existing job id."""
+        expires_at, existing = self._keys.get(key, (0, None))
+        if expires_at >= time.time():
+            return existing
+        self._keys[key] = (time.time() + ttl, job_id)
+        return None
+
+    async def replace(self, key: str, job_id: str, ttl: float):
+        self._keys[key] = (time.time() + ttl, job_id)
+
+    async def enqueue(self, job_id: str):
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            raise JobQueueFull()
+
+    async def dequeue(self, timeout: float):
+        """Pop the next job and mark it running; None if nothing runnable arrived within `timeout`."""
+        try:
+            job_id = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        expires_at, job = self._jobs.get(job_id, (0, None))
+        if job is None or expires_at < time.time() or job["status"] != "queued":
+            return None
+        job.update(status="running", started_at=time.time())
+        return dict(job)
+
+    async def depth(self) -> int:
+        return self._queue.qsize()
+
+
+class SQLiteJobStore:
+    """Jobs and queue in a SQLite file, shared by every worker process on the host and kept across restarts."""
+
+    def __init__(self, path: str = JOBS_PATH, max_queued: int = JOBS_QUEUE_MAX):
+        self.max_queued = max_queued
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, record TEXT, expires_at REAL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS job_keys (key TEXT PRIMARY KEY, job_id TEXT, expires_at REAL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS job_queue (seq INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT)")
+        self._lock = asyncio.Lock()
+
+    async def _run(self, fn, *args):
+        async with self._lock:
+            return await asyncio.to_thread(fn, *args)
+
+    def _get(self, job_id: str):
+        row = self._db.execute("SELECT record FROM jobs WHERE id = ? AND expires_at >= ?", (job_id, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _save(self, job: dict, ttl: float):
+        self._db.execute(
+            "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?)", (job["id"], json.dumps(job), time.time() + ttl)
+        )
+
+    def _delete(self, job_id: str):
+        self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def _reserve(self, key: str, job_id: str, ttl: float):
+        now = time.time()
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._db.execute("DELETE FROM jobs WHERE expires_at < ?", (now,))
+            self._db.execute("DELETE FROM job_keys WHERE expires_at < ?", (now,))
+            row = self._db.execute("SELECT job_id FROM job_keys WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._db.execute("INSERT INTO job_keys VALUES (?, ?, ?)", (key, job_id, now + ttl))
+        finally:
+            self._db.execute("COMMIT")
+        return row[0] if row else None
+
+    def _replace(self, key: str, job_id: str, ttl: float):
+        self._db.execute("INSERT OR REPLACE INTO job_keys VALUES (?, ?, ?)", (key, job_id, time.time() + ttl))
+
+    def _enqueue(self, job_id: str):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            (depth,) = self._db.execute("SELECT COUNT(*) FROM job_queue").fetchone()
+            if depth < self.max_queued:
+                self._db.execute("INSERT INTO job_queue (job_id) VALUES (?)", (job_id,))
+        finally:
+            self._db.execute("COMMIT")
+        return depth < self.max_queued
+
+    def _dequeue(self):
+        # IMMEDIATE takes the write lock up front, so two processes never pop the same row. The job
+        # is marked running in the same transaction: a worker that dies right after leaves it to the lease.
+        now = time.time()
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._db.execute("SELECT seq, job_id FROM job_queue ORDER BY seq LIMIT 1").fetchone()
+            if row is None:
+                return None
+            self._db.execute("DELETE FROM job_queue WHERE seq = ?", (row[0],))
+            record = self._db.execute(
+                "SELECT record FROM jobs WHERE id = ? AND expires_at >= ?", (row[1], now)
+            ).fetchone()
+            job = json.loads(record[0]) if record else None
+            if job is None or job["status"] != "queued":
+                return None
+            job.update(status="running", started_at=now)
+            self._db.execute("UPDATE jobs SET record = ? WHERE id = ?", (json.dumps(job), job["id"]))
+        finally:
+            self._db.execute("COMMIT")
+        return job
+
+    async def get(self, job_id: str):
+        return await self._run(self._get, job_id)
+
+    async def save(self, job: dict, ttl: float):
+        await self._run(self._save, job, ttl)
+
+    async def delete(self, job_id: str):
+        await self._run(self._delete, job_id)
+
+    async def reserve(self, key: str, job_id: str, ttl: float):
+        return await self._run(self._reserve, key, job_id, ttl)
+
+    async def replace(self, key: str, job_id: str, ttl: float):
+        await self._run(self._replace, key, job_id, ttl)
+
+    async def enqueue(self, job_id: str):
+        if not await self._run(self._enqueue, job_id):
+            raise JobQueueFull()
+
+    async def dequeue(self, timeout: float):
+        """Pop the next job and mark it running; None if nothing runnable arrived within `timeout`."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self._run(self._dequeue)
+            if job is not None or time.monotonic() >= deadline:
+                return job
+            await asyncio.sleep(JOBS_POLL_INTERVAL)
+
+    async def depth(self) -> int:
+        return (await self._run(lambda: self._db.execute("SELECT COUNT(*) FROM job_queue").fetchone()))[0]
+
+
+# Check the length and push in one step, so concurrent submitters can't overfill the queue
+_ENQUEUE_SCRIPT = """
+if redis.call('llen', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('lpush', KEYS[1], ARGV[1])
+return 1
+"""
+
+# Pop a job and mark it running in one step, so a worker that dies in between can't strand it as "queued".
+# The record is edited as text because cjson would re-encode empty JSON arrays as objects; submit() puts
+# "started_at" right after "status" so the two always appear together at the top level.
+_DEQUEUE_SCRIPT = """
+local job_id = redis.call('rpop', KEYS[1])
+if not job_id then
+    return false
+end
+local key = ARGV[1] .. job_id
+local record = redis.call('get', key)
+if not record then
+    return false
+end
+local queued = '"status": "queued", "started_at": null'
+local at = string.find(record, queued, 1, true)
+if not at then
+    return false
+end
+record = string.sub(record, 1, at - 1) .. '"status": "running", "started_at": ' .. ARGV[2] .. string.sub(record, at + #queued)
+redis.call('set', key, record, 'KEEPTTL')
+return record
+"""
+
+
+class RedisJobStore:
+    """Jobs as JSON strings with a TTL, idempotency keys via SET NX and the queue as a list."""
+
+    def __init__(self, namespace: str = "jobs", max_queued: int = JOBS_QUEUE_MAX):
+        self.namespace = namespace
+        self.max_queued = max_queued
+        self._redis = get_redis()
+
+    async def get(self, job_id: str):
+        raw = await self._redis.get(f"{self.namespace}:job:{job_id}")
+        return json.loads(raw) if raw is not None else None
+
+    async def save(self, job: dict, ttl: float):
+        await self._redis.set(f"{self.namespace}:job:{job['id']}", json.dumps(job), px=int(ttl * 1000))
+
+    async def delete(self, job_id: str):
+        await self._redis.delete(f"{self.namespace}:job:{job_id}")
+
+    async def reserve(self, key: str, job_id: str, ttl: float):
+        redis_key = f"{self.namespace}:key:{key}"
+        if await self._redis.set(redis_key, job_id, nx=True, px=int(ttl * 1000)):
+            return None
+        existing = await self._redis.get(redis_key)
+        return existing.decode() if isinstance(existing, bytes) else existing
+
+    async def replace(self, key: str, job_id: str, ttl: float):
+        await self._redis.set(f"{self.namespace}:key:{key}", job_id, px=int(ttl * 1000))
+
+    async def enqueue(self, job_id: str):
+        if not await self._redis.eval(_ENQUEUE_SCRIPT, 1, f"{self.namespace}:queue", job_id, self.max_queued):
+            raise JobQueueFull()
+
+    async def dequeue(self, timeout: float):
+        """Pop the next job and mark it running; None if nothing runnable arrived within `timeout`."""
+        deadline = time.monotonic() + timeout
+        while True:
+            record = await self._redis.eval(
+                _DEQUEUE_SCRIPT, 1, f"{self.namespace}:queue", f"{self.namespace}:job:", json.dumps(time.time()),
+            )
+            if record is not None or time.monotonic() >= deadline:
+                return json.loads(record) if record is not None else None
+            await asyncio.sleep(JOBS_POLL_INTERVAL)
+
+    async def depth(self) -> int:
+        return await self._redis.llen(f"{self.namespace}:queue")
+
+
+def make_job_store(kind: str):
+    if kind == "memory":
+        return MemoryJobStore()
+    if kind == "sqlite":
+        return SQLiteJobStore()
+    if kind == "redis":
+        return RedisJobStore()
+    raise ValueError(f"Unknown jobs backend: {kind}")
+
+
+def fingerprint(kind: str, payload: dict) -> str:
+    return hashlib.sha256(json.dumps([kind, payload], sort_keys=True, default=str).encode()).hexdigest()
+
+
+def public_job(job: dict) -> dict:
+    """What clients see from GET /jobs/{id} and webhooks: no payload, no internals."""
+    return {key: job.get(key) for key in ("id", "kind", "status", "created_at", "started_at", "finished_at", "result", "error")}
+
+
+class JobQueue:
+    """Runs slow generations outside the HTTP request and keeps their results for polling.
+
+    Handlers are registered per job kind and receive the JSON payload the job
+    was submitted with. A finished job is kept for JOBS_RESULT_TTL, so a client
+    that lost its connection can fetch the result instead of generating again.
+    """
+
+    def __init__(self, store, workers: int = JOBS_WORKERS):
+        self.store = store
+        self.workers = workers
+        self.handlers = {}
+        self._tasks = []
+        self._counts = Counter()
+
+    def register(self, kind: str, handler):
+        self.handlers[kind] = handler
+
+    async def submit(self, kind: str, payload: dict, idempotency_key: str = None, webhook_url: str = None) -> dict:
+        """Queue a job, or return the live job already submitted under `idempotency_key`."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": "queued",
+            # Kept next to "status": the Redis dequeue script rewrites the two together
+            "started_at": None,
+            "payload": payload,
+            "fingerprint": fingerprint(kind, payload),
+            "webhook_url": webhook_url,
+            "created_at": time.time(),
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        # Saved before the key is bound, so a concurrent retry that finds the key also finds the job
+        await self.store.save(job, JOBS_RESULT_TTL)
+
+        if idempotency_key:
+            key = f"{kind}:{idempotency_key}"
+            existing_id = await self.store.reserve(key, job["id"], JOBS_RESULT_TTL)
+            if existing_id is not None:
+                existing = await self.get(existing_id)
+                # A failed or expired job doesn't hold the key; the retry gets a fresh attempt
+                if existing is not None and existing["status"] != "failed":
+                    await self.store.delete(job["id"])
+                    if existing["fingerprint"] != job["fingerprint"]:
+                        raise IdempotencyConflict()
+                    self._counts["deduplicated"] += 1
+                    return existing
+                await self.store.replace(key, job["id"], JOBS_RESULT_TTL)
+
+        try:
+            await self.store.enqueue(job["id"])
+        except JobQueueFull:
+            await self.store.delete(job["id"])
+            self._counts["rejected"] += 1
+            raise
+        self._counts["submitted"] += 1
+        return job
+
+    async def get(self, job_id: str):
+        job = await self.store.get(job_id)
+        if job is not None and job["status"] == "running" and job["started_at"] + JOBS_LEASE < time.time():
+            await self._finish(job, error="The worker running this job stopped. Submit it again to retry.")
+        return job
+
+    async def _finish(self, job: dict, result=None, error: str = None):
+        job.update(
+            status="failed" if error else "succeeded", result=result, error=error, finished_at=time.time(),
+        )
+        await self.store.save(job, JOBS_RESULT_TTL)
+        self._counts[job["status"]] += 1
+
+    async def _run(self, job: dict):
+        """Run a job the store has already marked running."""
+        try:
+            result = await self.handlers[job["kind"]](job["payload"])
+        except Exception as e:
+            log.warning("job failed", extra={"job_id": job["id"], "kind": job["kind"], "error": str(e)})
+            await self._finish(job, error=str(getattr(e, "detail", None) or e))
+        else:
+            await self._finish(job, result=result)
+        if job["webhook_url"]:
+            await self._notify(job)
+
+    async def _notify(self, job: dict):
+        body = json.dumps(public_job(job)).encode()
+        headers = {"Content-Type": "application/json"}
+        if JOBS_WEBHOOK_SECRET:
+            signature = hmac.new(JOBS_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+            headers["X-Job-Signature"] = f"sha256={signature}"
+        for attempt in range(JOBS_WEBHOOK_ATTEMPTS):
+            try:
+                # Checked again at delivery, and sent to the address that passed the check
+                address = await check_webhook_url(job["webhook_url"])
+                url, host_headers, extensions = pin_to_address(job["webhook_url"], address)
+                response = await get_http_client().post(
+                    url, content=body, headers={**headers, **host_headers}, extensions=extensions,
+                    follow_redirects=False,
+                )
+                if response.status_code < 300:
+                    self._counts["webhooks_delivered"] += 1
+                    return
+                log.warning("webhook rejected", extra={"job_id": job["id"], "status": response.status_code})
+            except WebhookRejected as e:
+                log.warning("webhook not sent", extra={"job_id": job["id"], "error": str(e)})
+                break
+            except httpx.HTTPError as e:
+                log.warning("webhook failed", extra={"job_id": job["id"], "error": str(e)})
+            await asyncio.sleep(2 ** attempt)
+        # The result is still there to poll
+        self._counts["webhooks_failed"] += 1
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self.store.dequeue(timeout=1)
+                if job is not None:
+                    await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # A store hiccup must not kill the worker
+                log.exception("job worker error")
+                await asyncio.sleep(1)
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def stats(self) -> dict:
+        return {
+            "backend": type(self.store).__name__,
+            "workers": len(self._tasks),
+            "queued": await self.store.depth(),
+            **self._counts,
+        }
+
+
+job_queue = JobQueue(make_job_store(JOBS_BACKEND))
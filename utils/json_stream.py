@@ -0,0 +1,61 @@
+import json
+
+
+class JsonArrayStream:
+    """Incrementally pull complete objects out of a streamed JSON array.
+
+    Text before the opening `[` (such as a ```json fence) is ignored. Feed
+    chunks as they arrive; each call returns the objects that closed in it.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._start = None
+        self.done = False
+
+    def feed(self, text: str) -> list:
+        self._buffer += text
+        items = []
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer) and not self.done:
+            char = buffer[pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif not self._in_array:
+                if char == "[":
+                    self._in_array = True
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._start = pos
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # closing bracket of the outer array
+                    self.done = True
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        items.append(json.loads(buffer[self._start:pos + 1]))
+                        self._start = None
+            pos += 1
+
+        # Drop consumed text so long streams don't keep the whole response in memory
+        keep_from = self._start if self._start is not None else pos
+        self._buffer = buffer[keep_from:]
+        if self._start is not None:
+            self._start = 0
+        self._pos = pos - keep_from
+        return items
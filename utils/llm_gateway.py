@@ -0,0 +1,166 @@
+import asyncio
+import os
+import time
+from typing import TYPE_CHECKING
+
+import httpx
+from pydantic import TypeAdapter
+
+from utils.rate_limiter import PRIORITY_FREE, estimate_tokens, limited
+from utils.context_cache import with_cached_prefix, invalidate
+from utils.metrics import LLM_CALL_SECONDS, STAGE_SECONDS, record_usage, stage
+from utils.services import services
+
+# google.genai takes ~0.4s to import; it is loaded on first use (or warmed after startup)
+if TYPE_CHECKING:
+    from google import genai
+    from google.genai import errors, types
+
+GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+
+# Optional override so the gateway can be pointed at a local stand-in (see benchmarks/)
+GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL')
+
+# Upper bound on Gemini calls in flight per worker process
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '256'))
+
+_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+
+def _make_client() -> "genai.Client":
+    from google import genai
+    from google.genai import types
+
+    http_options = types.HttpOptions(
+        base_url=GEMINI_BASE_URL,
+        # httpx defaults to 100 pooled connections; keep the pool at least as wide as the semaphore
+        async_client_args={
+            "limits": httpx.Limits(
+                max_connections=GEMINI_MAX_CONCURRENCY,
+                max_keepalive_connections=GEMINI_MAX_CONCURRENCY,
+            )
+        },
+    )
+    return genai.Client(api_key=GEMINI_API_KEY, http_options=http_options)
+
+
+services.register("genai", _make_client, close=lambda client: client.aio.aclose())
+
+
+def get_client() -> "genai.Client":
+    """Return the shared Gemini client, creating it on first use."""
+    return services.get("genai")
+
+
+def _used_tokens(response):
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", None)
+
+
+def _outcome(e: Exception) -> str:
+    from google.genai import errors
+
+    if isinstance(e, errors.APIError):
+        return "throttled" if e.code == 429 else f"error_{e.code}"
+    return "cancelled" if isinstance(e, (asyncio.CancelledError, GeneratorExit)) else "error"
+
+
+def _stale_cache(config, e: "errors.APIError") -> bool:
+    """True if the call failed because the cached_content it referenced is gone.
+
+    Only errors that name the cache count: NOT_FOUND, or a message about the
+    cachedContents resource (an expired cache can also come back as 403).
+    Any other 400 / 403 is the request's own fault and is raised as is.
+    """
+    if config is None or config.cached_content is None:
+        return False
+    message = (getattr(e, "message", None) or str(e)).lower().replace(" ", "")
+    return e.code == 404 or getattr(e, "status", None) == "NOT_FOUND" or "cachedcontent" in message
+
+
+async def generate_content(model: str, contents, config: "types.GenerateContentConfig" = None, priority: int = PRIORITY_FREE):
+    """Await a Gemini generation without blocking the event loop.
+
+    Waits in the model's quota queue first (lower `priority` goes first);
+    raises rate_limiter.LLMOverloaded if no quota frees up in time. A static
+    system instruction is sent as a cached context when one is available.
+    """
+    from google.genai import errors
+
+    tokens = estimate_tokens(contents, config)
+    queued_at = time.perf_counter()
+    async with limited(model, tokens, priority) as limiter, _semaphore:
+        STAGE_SECONDS.labels("llm_queue").observe(time.perf_counter() - queued_at)
+        client = get_client()
+        call_config = with_cached_prefix(client, model, config)
+        started = time.perf_counter()
+        try:
+            try:
+                response = await client.aio.models.generate_content(model=model, contents=contents, config=call_config)
+            except errors.APIError as e:
+                if not _stale_cache(call_config, e):
+                    raise
+                invalidate(call_config.cached_content)
+                response = await client.aio.models.generate_content(model=model, contents=contents, config=config)
+        except (Exception, asyncio.CancelledError) as e:
+            LLM_CALL_SECONDS.labels(model, _outcome(e)).observe(time.perf_counter() - started)
+            if isinstance(e, errors.APIError) and e.code == 429:
+                limiter.on_throttled()
+            raise
+        LLM_CALL_SECONDS.labels(model, "ok").observe(time.perf_counter() - started)
+        record_usage(model, getattr(response, "usage_metadata", None))
+        limiter.on_success(tokens, _used_tokens(response))
+        return response
+
+
+async def generate_content_stream(model: str, contents, config: "types.GenerateContentConfig" = None, priority: int = PRIORITY_FREE):
+    """Yield response chunks as Gemini produces them. Holds a quota and concurrency slot until the stream ends."""
+    from google.genai import errors
+
+    tokens = estimate_tokens(contents, config)
+    queued_at = time.perf_counter()
+    async with limited(model, tokens, priority) as limiter, _semaphore:
+        STAGE_SECONDS.labels("llm_queue").observe(time.perf_counter() - queued_at)
+        client = get_client()
+        call_config = with_cached_prefix(client, model, config)
+        started = time.perf_counter()
+        used = None
+        usage = None
+        try:
+            try:
+                stream = await client.aio.models.generate_content_stream(model=model, contents=contents, config=call_config)
+            except errors.APIError as e:
+                if not _stale_cache(call_config, e):
+                    raise
+                invalidate(call_config.cached_content)
+                stream = await client.aio.models.generate_content_stream(model=model, contents=contents, config=config)
+            async for chunk in stream:
+                # Usage is cumulative; the last chunk carries the total
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                used = _used_tokens(chunk) or used
+                yield chunk
+        except (Exception, asyncio.CancelledError, GeneratorExit) as e:
+            LLM_CALL_SECONDS.labels(model, _outcome(e)).observe(time.perf_counter() - started)
+            if isinstance(e, errors.APIError) and e.code == 429:
+                limiter.on_throttled()
+            raise
+        LLM_CALL_SECONDS.labels(model, "ok").observe(time.perf_counter() - started)
+        record_usage(model, usage)
+        limiter.on_success(tokens, used)
+
+
+def structured_config(schema, **config) -> "types.GenerateContentConfig":
+    """Generation config that makes Gemini answer with JSON matching `schema` (a Pydantic model or list of one)."""
+    from google.genai import types
+
+    return types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=schema,
+        **config,
+    )
+
+
+def parse_structured(response, schema):
+    """Validate a structured response once. Raises pydantic.ValidationError on bad output."""
+    with stage("json_parse"):
+        return TypeAdapter(schema).validate_json(response.text)
@@ -0,0 +1,73 @@
+import re
+
+# Words that make a description look like food even if the rest is unfamiliar
+FOOD_WORDS = {
+    # meals and eating verbs
+    "breakfast", "brunch", "lunch", "dinner", "supper", "snack", "dessert", "meal", "ate", "eat", "eaten",
+    "had", "drank", "drink", "plate", "bowl", "cup", "glass", "slice", "serving", "portion", "piece",
+    "tbsp", "tsp", "tablespoon", "teaspoon", "gram", "g", "kg", "ml", "oz",
+    # staples
+    "rice", "bread", "toast", "roti", "chapati", "naan", "paratha", "pasta", "noodle", "spaghetti",
+    "oat", "oatmeal", "porridge", "cereal", "granola", "quinoa", "couscous", "bulgur", "tortilla",
+    "wrap", "bagel", "croissant", "pancake", "waffle", "potato", "fries", "chips", "corn", "bun",
+    # proteins
+    "egg", "omelette", "omelet", "chicken", "beef", "mutton", "lamb", "pork", "bacon", "ham", "sausage",
+    "turkey", "fish", "salmon", "tuna", "shrimp", "prawn", "tofu", "tempeh", "paneer", "lentil", "dal",
+    "daal", "bean", "chickpea", "chana", "steak", "kebab", "kabab", "tikka", "keema", "mince", "burger",
+    # dairy
+    "milk", "yogurt", "yoghurt", "curd", "cheese", "butter", "ghee", "cream", "lassi", "raita",
+    # produce
+    "apple", "banana", "orange", "mango", "grape", "berry", "strawberry", "blueberry", "date", "melon",
+    "watermelon", "pear", "peach", "pineapple", "avocado", "salad", "tomato", "onion", "garlic",
+    "spinach", "broccoli", "carrot", "cucumber", "lettuce", "pepper", "mushroom", "cabbage", "peas",
+    "vegetable", "veggie", "fruit",
+    # dishes and drinks
+    "biryani", "pulao", "curry", "karahi", "haleem", "nihari", "korma", "samosa", "pakora", "pizza",
+    "sandwich", "soup", "stew", "taco", "burrito", "sushi", "ramen", "smoothie", "shake", "juice",
+    "coffee", "tea", "chai", "latte", "soda", "cola", "cake", "cookie", "biscuit", "chocolate",
+    "ice", "icecream", "pie", "muffin", "donut", "nuts", "almond", "peanut", "walnut", "honey",
+    "jam", "sauce", "ketchup", "mayo", "hummus", "oil",
+}
+
+# Text made up only of these words is chat, not a meal ("hi", "test", "how are you")
+NON_MEAL_WORDS = {
+    "hi", "hello", "hey", "yo", "test", "testing", "ok", "okay", "yes", "no", "thanks", "thank", "you",
+    "how", "are", "is", "what", "who", "why", "the", "a", "an", "i", "me", "my", "it", "this", "that",
+    "nothing", "none", "idk", "lol", "hmm", "please", "help", "good", "morning", "night", "bye",
+}
+
+_VOWELS = set("aeiouy")
+
+# Below this share of a-z among the letters, the text isn't English and the lexicon can't judge it
+MIN_LATIN_SHARE = 0.8
+
+
+def _singular(word: str) -> str:
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("es") and word[:-2] in FOOD_WORDS:
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def looks_like_meal(description: str) -> bool:
+    """Cheap local pre-filter. Returns False only for text that is obviously not a meal;
+    anything ambiguous returns True and is left to the model to judge."""
+    text = description.lower()
+    letters = [c for c in text if c.isalpha()]
+    words = re.findall(r"[a-z]+", text)
+    # The lexicon is English; Urdu, Hindi, Arabic... ("دال چاول", "दाल चावल") go to the model
+    if len("".join(words)) < MIN_LATIN_SHARE * len(letters):
+        return True
+    if len("".join(words)) < 3:
+        return False
+    if any(word in FOOD_WORDS or _singular(word) in FOOD_WORDS for word in words):
+        return True
+    if all(word in NON_MEAL_WORDS for word in words):
+        return False
+    # Keyboard mashing such as "sdfgh jkl"
+    if all(not (_VOWELS & set(word)) for word in words):
+        return False
+    return True
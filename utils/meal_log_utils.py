@@ -1,63 +1,100 @@
-from google import genai
 from fastapi.responses import JSONResponse
-import json
+from pydantic import ValidationError
 import os
-from dotenv import load_dotenv
-from utils.prompts import get_validation_prompt, get_meal_log_generation_prompt
+from schemas.meal_log_model import MealLogResult
+from utils.prompts import (
+    MEAL_LOG_SYSTEM_PROMPT,
+    MEAL_LOG_VALIDATION_SYSTEM_PROMPT,
+    get_meal_log_generation_prompt,
+    get_validation_prompt,
+)
+from utils.llm_gateway import structured_config, parse_structured
+from utils.model_router import routed_generate
+from utils.meal_lexicon import looks_like_meal
+from utils.nutrition_db import get_nutrition_db, build_meal_log, merge_meal_logs
+from utils.metrics import stage
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# "single": the generation call itself reports is_valid (one round-trip).
+# "two_call": ask a separate yes/no validation prompt first (the original flow).
+MEAL_LOG_VALIDATION_MODE = os.getenv('MEAL_LOG_VALIDATION_MODE', 'single')
+# Reject obvious non-meals ("hi", "test", keyboard mashing) without calling Gemini
+MEAL_LOG_PREFILTER = os.getenv('MEAL_LOG_PREFILTER', 'true').lower() == 'true'
+# Compute macros from data/nutrition.csv when every item is known; only unknown items go to Gemini
+MEAL_LOG_LOCAL_NUTRITION = os.getenv('MEAL_LOG_LOCAL_NUTRITION', 'true').lower() == 'true'
 
-load_dotenv()
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
-client = genai.Client(api_key=GEMINI_API_KEY)
+def invalid_meal_response(message: str):
+    return JSONResponse(content={"log_data": None, "message": message}, status_code=200)
+
 
 async def generate_meal_log_from_text(description: str):
     try:
-        # ✅ Step 1: Validate input
-        validation_prompt = get_validation_prompt(description)
+        # ✅ Step 0: Local pre-filter, no model call
+        if MEAL_LOG_PREFILTER and not looks_like_meal(description):
+            return invalid_meal_response("❌ Could not detect a valid meal description. Please try again with more detail.")
 
-        validation_response = client.models.generate_content(
-    model="gemini-1.5-pro",
-    contents=[validation_prompt]
-)
-        is_valid = validation_response.text.strip().lower() == "yes"
-
-        if not is_valid:
-            return JSONResponse(
-                content={
-                    "log_data": None,
-                    "message": "❌ Could not detect a valid meal description. Please try again with more detail."
-                },
-                status_code=200
-            )
+        # ✅ Step 1: Local nutrition table, no model call when every item resolves
+        local_log = None
+        llm_description = description
+        if MEAL_LOG_LOCAL_NUTRITION:
+            estimate = get_nutrition_db().estimate(description)
+            if estimate.items:
+                local_log = build_meal_log(estimate.items)
+                if not estimate.unknown:
+                    return {"log_data": local_log}
+                # Only the parts the table didn't know go to the model
+                llm_description = ", ".join(estimate.unknown)
 
-        # ✅ Step 2: Generate structured log
-        generation_prompt = get_meal_log_generation_prompt(description)
+        # ✅ Step 2: Validate input (two-call mode only; otherwise the generation below carries is_valid)
+        if MEAL_LOG_VALIDATION_MODE == "two_call" and local_log is None:
+            from google.genai import types
 
-        response = client.models.generate_content(
-    model="gemini-2.5-pro-preview-03-25",
-    contents=[generation_prompt]
-)
-        raw_text = response.text.strip()
+            with stage("prompt_build"):
+                validation_prompt = get_validation_prompt(llm_description)
 
-        clean_json = raw_text.replace("```json", "").replace("```", "").strip()
+            validation_response = await routed_generate(
+                "meal_log.validate",
+                contents=[validation_prompt],
+                config=types.GenerateContentConfig(system_instruction=MEAL_LOG_VALIDATION_SYSTEM_PROMPT),
+            )
+            is_valid = validation_response.text.strip().lower() == "yes"
 
-        meal_data = json.loads(clean_json)
+            if not is_valid:
+                return invalid_meal_response("❌ Could not detect a valid meal description. Please try again with more detail.")
 
-        if meal_data == "INVALID":
-            return JSONResponse(
-                content={"log_data": None, "message": "❌ Unable to detect a valid meal log."},
-                status_code=200
-            )
+        # ✅ Step 3: Generate structured log
+        with stage("prompt_build"):
+            generation_prompt = get_meal_log_generation_prompt(llm_description)
+
+        response = await routed_generate(
+            "meal_log",
+            contents=[generation_prompt],
+            config=structured_config(MealLogResult, system_instruction=MEAL_LOG_SYSTEM_PROMPT),
+        )
+        result = parse_structured(response, MealLogResult)
+
+        if not result.is_valid or result.log is None:
+            if local_log is not None:
+                return {"log_data": local_log}
+            return invalid_meal_response("❌ Unable to detect a valid meal log.")
 
-        print(f'Meal Data from AI: {meal_data}')
+        meal_data = result.log.model_dump()
+        if local_log is not None:
+            meal_data = merge_meal_logs(local_log, meal_data)
+        log.debug("meal log from model", extra={"log_data": meal_data})
         return {"log_data": meal_data}
 
-    except json.JSONDecodeError:
+    except ValidationError as e:
+        log.warning("meal log did not match the schema", extra={"error": str(e)})
         return JSONResponse(
             content={"log_data": None, "message": "❌ Failed to parse AI response. Try again."},
             status_code=500,
         )
     except Exception as e:
+        log.exception("meal log generation failed")
         return JSONResponse(
             content={"log_data": None, "message": f"❌ Internal Error: {str(e)}"},
             status_code=500,
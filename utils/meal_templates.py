@@ -0,0 +1,158 @@
+import itertools
+import json
+import os
+import re
+import sqlite3
+import zlib
+from typing import Optional
+
+from utils.metrics import cache_lookup
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# Serve common free-tier profiles from pre-generated plans (scripts/build_meal_templates.py) without a model call
+MEAL_TEMPLATES = os.getenv('MEAL_TEMPLATES', 'true').lower() == 'true'
+MEAL_TEMPLATES_PATH = os.getenv('MEAL_TEMPLATES_PATH', 'data/meal_templates.sqlite3')
+# Pro users get a freshly generated plan unless this is on
+MEAL_TEMPLATES_FOR_PRO = os.getenv('MEAL_TEMPLATES_FOR_PRO', 'false').lower() == 'true'
+
+# Templates are generated at this portion size and scaled to the others. The factors follow the
+# per-meal weights in MEAL_PLAN_SYSTEM_PROMPT (~400g small, ~575g balanced, ~800g large).
+BASE_PORTION = "balanced"
+PORTION_SCALE = {"small": 0.7, "balanced": 1.0, "medium": 1.0, "regular": 1.0, "normal": 1.0, "large": 1.4}
+# What clients send in `allergies` when there are none
+NO_ALLERGIES = {"none", "no", "n_a", "na", "nil", "nothing", "no_allergies"}
+
+_MASS = re.compile(r"(\d+(?:\.\d+)?)(\s*)(kg|g|ml|l)\b", re.IGNORECASE)
+_LEADING_COUNT = re.compile(r"^\s*(\d+(?:\.\d+)?)")
+
+_library = None
+
+
+def _key_part(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", (value or "").lower()).strip("_") or "none"
+
+
+def template_bucket(meal_goal: str, region: str, dietary_preferences: list, eating_frequency: str) -> str:
+    """Library key for a profile: "weight_loss|india|vegetarian|three_meals"."""
+    diets = "+".join(sorted({_key_part(diet) for diet in dietary_preferences or []} - {"none"})) or "none"
+    return "|".join([_key_part(meal_goal), _key_part(region), diets, _key_part(eating_frequency)])
+
+
+def has_allergies(allergies: list) -> bool:
+    """False for no entries or only placeholders such as "None" or "N/A"."""
+    return any(_key_part(allergy) not in NO_ALLERGIES for allergy in allergies or [])
+
+
+def _scale_amount(value: float, unit: str) -> str:
+    if unit.lower() in ("g", "ml"):
+        return str(max(5, int(round(value / 5) * 5)))
+    return f"{round(value, 1):g}"
+
+
+def _scale_quantity(quantity: str, factor: float) -> str:
+    if _MASS.search(quantity):
+        return _MASS.sub(lambda m: f"{_scale_amount(float(m.group(1)) * factor, m.group(3))}{m.group(2)}{m.group(3)}", quantity)
+    # "2 eggs", "1 cup": whole and half units read better than 1.4 eggs
+    return _LEADING_COUNT.sub(lambda m: f"{max(0.5, round(float(m.group(1)) * factor * 2) / 2):g}", quantity, count=1)
+
+
+def scale_meals(meals: list, factor: float) -> list:
+    """Scale every gram amount, count, calorie and macro of a plan by `factor`."""
+    if factor == 1.0:
+        return meals
+    return [{
+        **meal,
+        "ingredients": [{**i, "quantity": _scale_quantity(i["quantity"], factor)} for i in meal["ingredients"]],
+        "calories": round(meal["calories"] * factor),
+        "macros": {name: round(grams * factor) for name, grams in meal["macros"].items()},
+        "total_weight": _scale_quantity(meal["total_weight"], factor),
+    } for meal in meals]
+
+
+def encode_plan(meals: list) -> bytes:
+    return zlib.compress(json.dumps(meals, separators=(",", ":")).encode(), 9)
+
+
+def create_library(path: str) -> sqlite3.Connection:
+    """Open (creating if needed) a library file for writing."""
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE IF NOT EXISTS templates (id INTEGER PRIMARY KEY, bucket TEXT NOT NULL, plan BLOB NOT NULL)")
+    db.execute("CREATE INDEX IF NOT EXISTS templates_bucket ON templates (bucket)")
+    db.commit()
+    return db
+
+
+class TemplateLibrary:
+    """Read-only view of the template file. A bucket is read and decompressed once, then rotated through in memory."""
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._plans = {}
+        self._cursors = {}
+        self.hits = 0
+        self.misses = 0
+
+    def plans(self, bucket: str) -> list:
+        """Every plan (a list of meals) in a bucket; [] if it has none."""
+        plans = self._plans.get(bucket)
+        if plans is None:
+            rows = self._db.execute("SELECT plan FROM templates WHERE bucket = ? ORDER BY id", (bucket,)).fetchall()
+            plans = [json.loads(zlib.decompress(blob)) for (blob,) in rows]
+            self._plans[bucket] = plans
+        return plans
+
+    def pick(self, bucket: str) -> Optional[list]:
+        """The next plan in the bucket's rotation, or None if the bucket is empty."""
+        plans = self.plans(bucket)
+        cache_lookup("meal-template", bool(plans))
+        if not plans:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return plans[next(self._cursors.setdefault(bucket, itertools.count())) % len(plans)]
+
+    def stats(self) -> dict:
+        return {
+            "buckets": self._db.execute("SELECT COUNT(DISTINCT bucket) FROM templates").fetchone()[0],
+            "plans": self._db.execute("SELECT COUNT(*) FROM templates").fetchone()[0],
+            "buckets_loaded": len(self._plans),
+            "served": self.hits,
+            "fell_back_to_model": self.misses,
+        }
+
+
+def get_template_library() -> Optional[TemplateLibrary]:
+    """The library at MEAL_TEMPLATES_PATH, or None if templates are off or the file hasn't been built."""
+    global _library
+    if _library is None:
+        if not MEAL_TEMPLATES or not os.path.exists(MEAL_TEMPLATES_PATH):
+            _library = False
+        else:
+            _library = TemplateLibrary(MEAL_TEMPLATES_PATH)
+            log.info("meal template library loaded", extra={"path": MEAL_TEMPLATES_PATH, **_library.stats()})
+    return _library or None
+
+
+def template_meal_plan(request) -> Optional[list]:
+    """A pre-generated plan for this MealRequest, scaled to its portion size.
+
+    None means the model has to write one: pro users (unless
+    MEAL_TEMPLATES_FOR_PRO), allergies or health issues (templates are
+    written without them, and matching ingredient names locally can't tell
+    that pesto has nuts or mayo has egg), an unknown portion size, or an
+    empty bucket.
+    """
+    library = get_template_library()
+    if library is None or (request.is_pro and not MEAL_TEMPLATES_FOR_PRO):
+        return None
+    if has_allergies(request.allergies) or request.health_issues:
+        return None
+    factor = PORTION_SCALE.get(_key_part(request.portion_size))
+    if factor is None:
+        return None
+    meals = library.pick(
+        template_bucket(request.meal_goal, request.region, request.dietary_preferences, request.eating_frequency),
+    )
+    return scale_meals(meals, factor) if meals is not None else None
@@ -0,0 +1,121 @@
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest
+
+# With several gunicorn workers, point this at an empty directory (wiped on deploy) so /metrics adds them all up
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+# From a cache probe (ms) to a slow image generation (tens of seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "welleats_http_request_duration_seconds",
+    "Time to finish sending the response, by route template and status",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "welleats_stage_duration_seconds",
+    "Time spent in one step of handling a request",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_CALL_SECONDS = Histogram(
+    "welleats_llm_call_duration_seconds",
+    "Gemini call latency per model, excluding time queued for quota",
+    ["model", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "welleats_llm_tokens_total",
+    "Tokens reported in Gemini usage metadata",
+    ["model", "kind"],
+)
+CACHE_LOOKUPS = Counter(
+    "welleats_cache_lookups_total",
+    "Cache lookups by cache and result",
+    ["cache", "result"],
+)
+
+# usage_metadata field -> `kind` label
+_TOKEN_FIELDS = {
+    "prompt_token_count": "input",
+    "candidates_token_count": "output",
+    "cached_content_token_count": "cached",
+    "thoughts_token_count": "thinking",
+}
+
+
+class stage:
+    """Time a block into STAGE_SECONDS: `with stage("supabase_probe"): ...` (also fine around awaits)."""
+
+    __slots__ = ("_histogram", "_started")
+
+    def __init__(self, name: str):
+        self._histogram = STAGE_SECONDS.labels(name)
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._started)
+        return False
+
+
+def record_usage(model: str, usage):
+    """Count the tokens in a response's usage_metadata."""
+    if usage is None:
+        return
+    for field, kind in _TOKEN_FIELDS.items():
+        count = getattr(usage, field, None)
+        if count:
+            LLM_TOKENS.labels(model, kind).inc(count)
+
+
+def cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def render_metrics() -> tuple:
+    """(body, content type) for the Prometheus scrape."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """ASGI middleware that times every HTTP request until its last body chunk is sent.
+
+    Requests are labelled with the route template (`/jobs/{job_id}`), never
+    the raw path, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - started)
@@ -0,0 +1,299 @@
+import asyncio
+import json
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import List, Optional
+
+import httpx
+
+from utils.llm_gateway import generate_content, generate_content_stream
+from utils.rate_limiter import PRIORITY_FREE, LLMOverloaded
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+GEMINI_PRO_MODEL = os.getenv('GEMINI_PRO_MODEL', 'gemini-2.5-pro-preview-03-25')
+GEMINI_FLASH_MODEL = os.getenv('GEMINI_FLASH_MODEL', 'gemini-2.5-flash-preview-04-17-thinking')
+# Cheap, stable last resort for free-tier routes
+GEMINI_FALLBACK_MODEL = os.getenv('GEMINI_FALLBACK_MODEL', 'gemini-2.0-flash')
+GEMINI_VALIDATION_MODEL = os.getenv('GEMINI_VALIDATION_MODEL', 'gemini-1.5-pro')
+
+# How long a model is skipped as primary after it answers 429 / 5xx
+ROUTER_COOLDOWN_429 = float(os.getenv('ROUTER_COOLDOWN_429', '30'))
+ROUTER_COOLDOWN_5XX = float(os.getenv('ROUTER_COOLDOWN_5XX', '10'))
+# Smoothing for the per-model latency averages; higher reacts faster
+ROUTER_EWMA_ALPHA = float(os.getenv('ROUTER_EWMA_ALPHA', '0.2'))
+# Never hedge earlier than this, however fast a model has looked
+ROUTER_MIN_HEDGE_DELAY = float(os.getenv('ROUTER_MIN_HEDGE_DELAY', '2'))
+
+
+@dataclass
+class Route:
+    """Models to try for one kind of call, best first, and its time budget in seconds."""
+    tiers: List[str]
+    deadline: float
+    # Start the next tier if nothing has come back after this long (None = fall back on errors only)
+    hedge_after: Optional[float] = None
+
+
+ROUTES = {
+    "meal_plan.pro": Route([GEMINI_PRO_MODEL, GEMINI_FLASH_MODEL], deadline=90, hedge_after=40),
+    # Pro users alternate models on odd regenerations to get a different style of plan
+    "meal_plan.pro_alternate": Route([GEMINI_FLASH_MODEL, GEMINI_PRO_MODEL], deadline=90, hedge_after=30),
+    "meal_plan.free": Route([GEMINI_FLASH_MODEL, GEMINI_FALLBACK_MODEL], deadline=60, hedge_after=30),
+    # One meal instead of a whole day: a fraction of the output, so tighter budgets
+    "meal_replace.pro": Route([GEMINI_PRO_MODEL, GEMINI_FLASH_MODEL], deadline=45, hedge_after=15),
+    "meal_replace.free": Route([GEMINI_FLASH_MODEL, GEMINI_FALLBACK_MODEL], deadline=30, hedge_after=10),
+    "recipe.pro": Route([GEMINI_PRO_MODEL, GEMINI_FLASH_MODEL], deadline=60, hedge_after=25),
+    "recipe.free": Route([GEMINI_FLASH_MODEL, GEMINI_FALLBACK_MODEL], deadline=45, hedge_after=20),
+    "analyze_image": Route([GEMINI_PRO_MODEL, GEMINI_FLASH_MODEL], deadline=45, hedge_after=20),
+    "meal_log.validate": Route([GEMINI_VALIDATION_MODEL, GEMINI_FALLBACK_MODEL], deadline=15, hedge_after=5),
+    "meal_log": Route([GEMINI_PRO_MODEL, GEMINI_FLASH_MODEL], deadline=40, hedge_after=15),
+}
+
+# e.g. MODEL_ROUTES='{"analyze_image": {"tiers": ["gemini-2.5-flash"], "deadline": 20}}'
+for _name, _override in json.loads(os.getenv('MODEL_ROUTES', '{}')).items():
+    ROUTES[_name] = Route(**{**ROUTES[_name].__dict__, **_override}) if _name in ROUTES else Route(**_override)
+
+
+class ModelDeadlineExceeded(Exception):
+    pass
+
+
+class ModelStats:
+    """Live view of one model: smoothed latency, its spread, and any cooldown after errors."""
+
+    def __init__(self):
+        self.latency = None
+        self.deviation = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.hedges_lost = 0
+        self.cooldown_until = 0.0
+        self.last_error = None
+
+    def observe(self, seconds: float):
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.deviation += ROUTER_EWMA_ALPHA * (abs(seconds - self.latency) - self.deviation)
+            self.latency += ROUTER_EWMA_ALPHA * (seconds - self.latency)
+
+    def cooling_down(self) -> bool:
+        return time.monotonic() < self.cooldown_until
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "hedges_lost": self.hedges_lost,
+            "latency_ewma": round(self.latency, 3) if self.latency is not None else None,
+            "latency_deviation": round(self.deviation, 3),
+            "cooling_down": self.cooling_down(),
+            "last_error": self.last_error,
+        }
+
+
+MODEL_STATS = {}
+
+
+def _stats(model: str) -> ModelStats:
+    if model not in MODEL_STATS:
+        MODEL_STATS[model] = ModelStats()
+    return MODEL_STATS[model]
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    from google.genai import errors
+
+    if isinstance(exc, errors.APIError):
+        return exc.code == 429 or (exc.code or 0) >= 500
+    # A full quota queue on one model is a reason to try the next tier, not to fail the request
+    return isinstance(exc, (httpx.TimeoutException, httpx.TransportError, LLMOverloaded))
+
+
+def _record_failure(model: str, exc: BaseException):
+    stats = _stats(model)
+    stats.failures += 1
+    stats.last_error = f"{type(exc).__name__}: {exc}"[:200]
+    code = getattr(exc, "code", None)
+    if code == 429:
+        stats.cooldown_until = time.monotonic() + ROUTER_COOLDOWN_429
+    elif _is_retryable(exc):
+        stats.cooldown_until = time.monotonic() + ROUTER_COOLDOWN_5XX
+
+
+# Model whose answer the last routed call in this task returned
+_answered_by: ContextVar[Optional[str]] = ContextVar("answered_by", default=None)
+
+
+def answered_by_primary(route_name: str) -> bool:
+    """Whether the last routed_generate / routed_generate_stream in this task was answered by the
+    route's first tier, rather than by a fallback or hedge. Only those answers are worth caching
+    under the primary model's name."""
+    return _answered_by.get() == ROUTES[route_name].tiers[0]
+
+
+def plan(route: Route) -> List[str]:
+    """Order the route's tiers for this call: healthy models first, keeping the configured preference."""
+    healthy, cooling = [], []
+    for model in route.tiers:
+        stats = _stats(model)
+        # A model that is currently slower than the whole budget can only time out
+        too_slow = stats.latency is not None and stats.latency > route.deadline
+        (cooling if stats.cooling_down() or too_slow else healthy).append(model)
+    return healthy + cooling
+
+
+def hedge_delay(route: Route, model: str) -> Optional[float]:
+    """When to stop waiting on `model` alone: a few deviations past its usual latency, capped by the route."""
+    if route.hedge_after is None:
+        return None
+    stats = _stats(model)
+    if stats.latency is None or stats.calls < 5:
+        return route.hedge_after
+    return min(route.hedge_after, max(ROUTER_MIN_HEDGE_DELAY, stats.latency + 4 * stats.deviation))
+
+
+async def _timed_call(model: str, contents, config, priority: int):
+    started = time.monotonic()
+    _stats(model).calls += 1
+    response = await generate_content(model=model, contents=contents, config=config, priority=priority)
+    _stats(model).observe(time.monotonic() - started)
+    return response
+
+
+async def routed_generate(route_name: str, contents, config=None, priority: int = PRIORITY_FREE):
+    """generate_content with tiered fallback, hedging and a hard deadline for `route_name`.
+
+    The first tier runs alone until its hedge delay passes, then the next
+    tier is started alongside it and whichever answers first wins. A 429,
+    5xx or transport error moves on to the next tier at once. Raises
+    ModelDeadlineExceeded if nothing answers within the route's deadline.
+    """
+    route = ROUTES[route_name]
+    models = plan(route)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + route.deadline
+    _answered_by.set(None)
+    pending = {}
+    started = {}
+    last_error = None
+
+    def launch():
+        model = models.pop(0)
+        task = asyncio.create_task(_timed_call(model, contents, config, priority))
+        pending[task] = model
+        started[task] = loop.time()
+        log.debug("calling model", extra={"route": route_name, "model": model})
+
+    launch()
+    try:
+        while pending:
+            wait = deadline - loop.time()
+            if wait <= 0:
+                raise ModelDeadlineExceeded(f"{route_name}: no model answered within {route.deadline:.0f}s")
+            hedge_at = None
+            if models:
+                newest = max(pending, key=started.get)
+                delay = hedge_delay(route, pending[newest])
+                if delay is not None:
+                    hedge_at = started[newest] + delay
+                    wait = min(wait, max(0, hedge_at - loop.time()))
+
+            done, _ = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if hedge_at is not None and loop.time() >= hedge_at:
+                    log.info("model is slow, hedging", extra={"route": route_name, "model": pending[newest]})
+                    launch()
+                continue
+
+            for task in done:
+                model = pending.pop(task)
+                exc = task.exception()
+                if exc is None:
+                    _answered_by.set(model)
+                    return task.result()
+                _record_failure(model, exc)
+                last_error = exc
+                log.warning("model call failed", extra={"route": route_name, "model": model, "error": str(exc)})
+                if not _is_retryable(exc):
+                    raise exc
+                if models:
+                    launch()
+        raise last_error
+    finally:
+        # Losers are cancelled; their elapsed time still tells us they were slow
+        for task, model in pending.items():
+            task.cancel()
+            stats = _stats(model)
+            stats.hedges_lost += 1
+            stats.observe(loop.time() - started[task])
+
+
+async def routed_generate_stream(route_name: str, contents, config=None, priority: int = PRIORITY_FREE):
+    """generate_content_stream with fallback until the first chunk arrives.
+
+    Once a model has started streaming, switching would duplicate output, so
+    only errors and silence before the first chunk move on to the next tier.
+    The route's deadline bounds the whole stream.
+    """
+    route = ROUTES[route_name]
+    models = plan(route)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + route.deadline
+    _answered_by.set(None)
+    last_error = None
+
+    for i, model in enumerate(models):
+        has_fallback = i < len(models) - 1
+        first_chunk_timeout = route.hedge_after if has_fallback and route.hedge_after else route.deadline
+        log.debug("streaming from model", extra={"route": route_name, "model": model})
+        stats = _stats(model)
+        stats.calls += 1
+        started = loop.time()
+        stream = generate_content_stream(model=model, contents=contents, config=config, priority=priority)
+        try:
+            try:
+                async with asyncio.timeout(min(deadline, started + first_chunk_timeout) - loop.time()):
+                    first = await anext(stream)
+            except StopAsyncIteration:
+                return
+            except TimeoutError:
+                stats.hedges_lost += 1
+                stats.observe(loop.time() - started)
+                last_error = ModelDeadlineExceeded(f"{route_name}: {model} sent nothing in time")
+                continue
+            except Exception as e:
+                _record_failure(model, e)
+                last_error = e
+                if not _is_retryable(e):
+                    raise
+                continue
+
+            stats.observe(loop.time() - started)
+            _answered_by.set(model)
+            yield first
+            # Time each read separately: a timeout scope must not span a yield to the consumer
+            while True:
+                try:
+                    async with asyncio.timeout(deadline - loop.time()):
+                        chunk = await anext(stream)
+                except StopAsyncIteration:
+                    return
+                except TimeoutError:
+                    raise ModelDeadlineExceeded(f"{route_name}: stream exceeded {route.deadline:.0f}s")
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    raise last_error or ModelDeadlineExceeded(f"{route_name}: no model available")
+
+
+def router_stats() -> dict:
+    return {
+        "routes": {name: route.__dict__ for name, route in ROUTES.items()},
+        "models": {model: stats.snapshot() for model, stats in MODEL_STATS.items()},
+    }
@@ -0,0 +1,121 @@
+import asyncio
+import csv
+import hashlib
+import os
+import re
+import sqlite3
+import unicodedata
+
+from utils.nutrition_db import NUMBER_WORDS, UNITS, normalize_food_name
+
+INGREDIENT_SYNONYMS_PATH = os.getenv(
+    'INGREDIENT_SYNONYMS_PATH',
+    os.path.join(os.path.dirname(__file__), "..", "data", "ingredient_synonyms.csv"),
+)
+# Persistent map of canonical names to the stored image each one uses
+NAME_INDEX_PATH = os.getenv(
+    'NAME_INDEX_PATH',
+    os.path.join(os.path.dirname(__file__), "..", "data", "name-index.sqlite3"),
+)
+
+# Words that describe how an ingredient is prepared or bought, not what it is
+INGREDIENT_DESCRIPTORS = {
+    "fresh", "ripe", "raw", "organic", "large", "small", "medium", "big", "whole", "chopped", "diced",
+    "sliced", "minced", "grated", "shredded", "crushed", "peeled", "cubed", "halved", "finely", "roughly",
+    "thinly", "boneless", "skinless", "cooked", "boiled", "steamed", "toasted", "roasted", "optional",
+    "to", "taste", "for", "garnish", "of", "about", "approx", "approximately", "some", "few", "pinch",
+    "dash", "handful", "cup", "piece", "serving", "clove", "sprig", "stick", "bunch", "head",
+}
+# Joining words that don't change which dish a meal name refers to ("Mac & Cheese" = "mac and cheese")
+MEAL_STOPWORDS = {"a", "an", "the", "and", "with", "w"}
+
+
+def slugify(text: str) -> str:
+    normalized = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    slug = re.sub(r"[^\w\s-]", "", normalized).strip().lower()
+    return re.sub(r"[\s_-]+", "_", slug)
+
+
+def _load_synonyms(path: str) -> dict:
+    try:
+        with open(path, newline="") as f:
+            return {normalize_food_name(row["variant"]): normalize_food_name(row["canonical"]) for row in csv.DictReader(f)}
+    except FileNotFoundError:
+        return {}
+
+
+_synonyms = None
+
+
+def _synonym(name: str) -> str:
+    global _synonyms
+    if _synonyms is None:
+        _synonyms = _load_synonyms(INGREDIENT_SYNONYMS_PATH)
+    return _synonyms.get(name, name)
+
+
+def canonical_ingredient_name(name: str) -> str:
+    """"Bananas", "2 ripe bananas (sliced)" and "banana " all become "banana"."""
+    # Anything in brackets or after the first comma is a note ("tomato, diced", "rice (basmati)")
+    head = re.sub(r"\(.*?\)", " ", name).split(",")[0]
+    phrase = _synonym(normalize_food_name(head))
+    words = [
+        word for word in phrase.split()
+        if word not in INGREDIENT_DESCRIPTORS and word not in UNITS and word not in NUMBER_WORDS
+    ]
+    # Scripts with no ASCII transliteration normalize to nothing; keep them as typed
+    return (_synonym(" ".join(words)) if words else phrase) or name.strip().casefold()
+
+
+def canonical_meal_name(name: str) -> str:
+    """Case, accents, punctuation, plurals and joining words don't make a different dish."""
+    words = [word for word in normalize_food_name(name.replace("&", " and ")).split() if word not in MEAL_STOPWORDS]
+    return " ".join(words) or name.strip().casefold()
+
+
+class NameIndex:
+    """SQLite-backed index from (kind, canonical name) to the stored image file it resolves to.
+
+    Canonical names map to `<slug>.png` by default. When an image already
+    exists under another key (e.g. one stored before normalization), the
+    name is linked to that file so every spelling reuses one asset.
+    """
+
+    def __init__(self, path: str = NAME_INDEX_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS assets (kind TEXT, name TEXT, file_name TEXT, PRIMARY KEY (kind, name))"
+        )
+        self._db.commit()
+        self._assets = {(kind, name): file_name for kind, name, file_name in self._db.execute("SELECT * FROM assets")}
+        self._lock = asyncio.Lock()
+
+    def file_name(self, kind: str, canonical: str) -> str:
+        linked = self._assets.get((kind, canonical))
+        if linked:
+            return linked
+        return f"{slugify(canonical) or hashlib.sha1(canonical.encode()).hexdigest()[:16]}.png"
+
+    def _link(self, kind: str, canonical: str, file_name: str):
+        self._db.execute("INSERT OR REPLACE INTO assets VALUES (?, ?, ?)", (kind, canonical, file_name))
+        self._db.commit()
+
+    async def link(self, kind: str, canonical: str, file_name: str):
+        if self._assets.get((kind, canonical)) == file_name:
+            return
+        self._assets[(kind, canonical)] = file_name
+        async with self._lock:
+            await asyncio.to_thread(self._link, kind, canonical, file_name)
+
+    def __len__(self):
+        return len(self._assets)
+
+
+_index = None
+
+
+def get_name_index() -> NameIndex:
+    global _index
+    if _index is None:
+        _index = NameIndex()
+    return _index
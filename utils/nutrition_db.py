@@ -0,0 +1,311 @@
+import csv
+import difflib
+import math
+import os
+import re
+import sqlite3
+import unicodedata
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+NUTRITION_CSV_PATH = os.getenv(
+    'NUTRITION_CSV_PATH',
+    os.path.join(os.path.dirname(__file__), "..", "data", "nutrition.csv"),
+)
+# ":memory:" rebuilds from the CSV at startup; point at a file to reuse the built table
+NUTRITION_DB_PATH = os.getenv('NUTRITION_DB_PATH', ':memory:')
+NUTRITION_FUZZY_CUTOFF = float(os.getenv('NUTRITION_FUZZY_CUTOFF', '0.88'))
+# A single item heavier than this ("500 eggs") is more likely a typo than a meal; the model gets it
+NUTRITION_MAX_ITEM_GRAMS = float(os.getenv('NUTRITION_MAX_ITEM_GRAMS', '2000'))
+
+# Grams (or ml, treated as grams) per unit when the food has no unit of its own
+GENERIC_UNIT_GRAMS = {
+    "g": 1, "kg": 1000, "ml": 1, "l": 1000, "oz": 28.35, "lb": 453.6,
+    "cup": 240, "tbsp": 15, "tsp": 5, "bowl": 300, "plate": 350, "glass": 250,
+    "slice": 30, "scoop": 66, "handful": 28, "can": 355, "bag": 28,
+}
+MASS_UNITS = {"g", "kg", "ml", "l", "oz", "lb"}
+
+UNIT_ALIASES = {
+    "gram": "g", "grams": "g", "gm": "g", "gms": "g", "gr": "g", "kgs": "kg",
+    "milliliter": "ml", "millilitre": "ml", "mls": "ml", "liter": "l", "litre": "l",
+    "ounce": "oz", "ounces": "oz", "lbs": "lb", "pound": "lb", "pounds": "lb",
+    "cups": "cup", "tablespoon": "tbsp", "tablespoons": "tbsp", "tbsps": "tbsp",
+    "teaspoon": "tsp", "teaspoons": "tsp", "bowls": "bowl", "plates": "plate", "glasses": "glass",
+    "slices": "slice", "scoops": "scoop", "handfuls": "handful", "cans": "can", "bags": "bag",
+    "pieces": "piece", "pcs": "piece", "pc": "piece", "servings": "serving",
+}
+UNITS = set(GENERIC_UNIT_GRAMS) | set(UNIT_ALIASES) | {"piece", "serving"}
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "half": 0.5, "couple": 2, "few": 3, "dozen": 12,
+}
+
+# Words that may surround a food name without changing what it is
+FILLER_WORDS = {
+    "i", "had", "have", "ate", "eaten", "eat", "drank", "some", "my", "the", "of", "for", "just", "also",
+    "then", "today", "this", "morning", "breakfast", "brunch", "lunch", "dinner", "supper", "snack",
+    "meal", "small", "medium", "large", "big", "plain", "fresh", "boiled", "cooked", "steamed", "hot",
+    "cold", "homemade", "whole", "sliced", "chopped", "toasted", "raw", "baked", "roasted", "ripe",
+    "little", "bit", "side", "extra", "regular", "normal",
+}
+
+SEPARATORS = re.compile(r",|;|\+|&|\n|\band\b|\bwith\b|\bplus\b|\bon\b|\bover\b")
+SEPARATOR_WORDS = {"and", "with", "plus", "on", "over"}
+# "no eggs, just toast", "without sugar", "didn't finish the rice": leave the whole text to the model
+NEGATIONS = re.compile(r"\b(?:no|not|without|never|nothing|skip|skipped|except|instead|minus|hold)\b|n't\b|\bdidnt\b|\bdont\b")
+TOKENS = re.compile(r"\d+/\d+|\d+(?:\.\d+)?|[a-z]+")
+
+
+def _singular(word: str) -> str:
+    if len(word) <= 3 or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("oes") or word.endswith(("xes", "ches", "shes", "sses")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def normalize_food_name(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+    return " ".join(_singular(word) for word in re.findall(r"[a-z]+", text))
+
+
+@dataclass
+class Food:
+    name: str
+    kcal: float
+    protein: float
+    carbs: float
+    fat: float
+    unit: str
+    unit_g: float
+    serving_g: float
+    prep_minutes: int
+
+
+@dataclass
+class LoggedItem:
+    food: Food
+    grams: float
+    quantity: str
+
+
+@dataclass
+class LocalEstimate:
+    items: List[LoggedItem] = field(default_factory=list)
+    # Description fragments that could not be resolved locally
+    unknown: List[str] = field(default_factory=list)
+
+
+class NutritionDB:
+    """Per-100g nutrition table in SQLite with a normalized alias index and a fuzzy fallback."""
+
+    def __init__(self, csv_path: str = NUTRITION_CSV_PATH, db_path: str = NUTRITION_DB_PATH):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS foods (
+                id INTEGER PRIMARY KEY, name TEXT, kcal REAL, protein REAL, carbs REAL, fat REAL,
+                unit TEXT, unit_g REAL, serving_g REAL, prep_minutes INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS aliases (alias TEXT PRIMARY KEY, food_id INTEGER REFERENCES foods (id));
+        """)
+        if self._db.execute("SELECT COUNT(*) FROM foods").fetchone()[0] == 0:
+            self._load_csv(csv_path)
+        self._aliases = [row[0] for row in self._db.execute("SELECT alias FROM aliases")]
+        # Aliases that contain a separator word ("corn on the cob") must not be split apart
+        self.protected_aliases = sorted(
+            (alias for alias in self._aliases if SEPARATOR_WORDS & set(alias.split())),
+            key=len,
+            reverse=True,
+        )
+
+    def _load_csv(self, csv_path: str):
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                cursor = self._db.execute(
+                    "INSERT INTO foods (name, kcal, protein, carbs, fat, unit, unit_g, serving_g, prep_minutes)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (row["name"], float(row["kcal_per_100g"]), float(row["protein_g"]), float(row["carbs_g"]),
+                     float(row["fat_g"]), row["unit"], float(row["unit_g"]), float(row["serving_g"]),
+                     int(row["prep_minutes"])),
+                )
+                for alias in [row["name"], *row["aliases"].split(";")]:
+                    # First food to claim an alias keeps it
+                    self._db.execute(
+                        "INSERT OR IGNORE INTO aliases (alias, food_id) VALUES (?, ?)",
+                        (normalize_food_name(alias), cursor.lastrowid),
+                    )
+        self._db.commit()
+
+    def lookup(self, name: str) -> Optional[Food]:
+        row = self._db.execute(
+            "SELECT f.name, f.kcal, f.protein, f.carbs, f.fat, f.unit, f.unit_g, f.serving_g, f.prep_minutes"
+            " FROM aliases a JOIN foods f ON f.id = a.food_id WHERE a.alias = ?",
+            (normalize_food_name(name),),
+        ).fetchone()
+        return Food(*row) if row else None
+
+    def fuzzy_lookup(self, name: str) -> Optional[Food]:
+        matches = difflib.get_close_matches(normalize_food_name(name), self._aliases, n=1, cutoff=NUTRITION_FUZZY_CUTOFF)
+        return self.lookup(matches[0]) if matches else None
+
+    def _parse_item(self, fragment: str) -> Optional[LoggedItem]:
+        tokens = TOKENS.findall(fragment)
+        while tokens and tokens[0] in FILLER_WORDS:
+            tokens.pop(0)
+
+        count = None
+        while tokens and (tokens[0][0].isdigit() or tokens[0] in NUMBER_WORDS):
+            token = tokens.pop(0)
+            if "/" in token:
+                numerator, denominator = token.split("/")
+                if not int(denominator):
+                    return None
+                value = int(numerator) / int(denominator)
+            elif token[0].isdigit():
+                value = float(token)
+            else:
+                value = NUMBER_WORDS[token]
+            # "half a cup" -> 0.5, "1 1/2 cups" -> 1.5
+            count = value if count is None else (count * value if token in ("a", "an") else count + value)
+        # "0 apples" is nothing to log; let the model read it
+        if count is not None and count <= 0:
+            return None
+
+        unit = None
+        if tokens and tokens[0] in UNITS:
+            token = tokens.pop(0)
+            unit = UNIT_ALIASES.get(token, token)
+            if tokens and tokens[0] == "of":
+                tokens.pop(0)
+        # A second amount ("a plate of 0 rice") leaves it unclear how much was eaten
+        if any(token[0].isdigit() for token in tokens):
+            return None
+
+        food = self._match_food(tokens)
+        if food is None:
+            return None
+
+        if unit in MASS_UNITS:
+            grams = (count or 1) * GENERIC_UNIT_GRAMS[unit]
+        elif unit == "serving":
+            grams = (count or 1) * food.serving_g
+        elif unit is None and count is None:
+            grams = food.serving_g
+        elif unit is None or unit == "piece" or unit == food.unit:
+            grams = (count or 1) * food.unit_g
+        else:
+            grams = (count or 1) * GENERIC_UNIT_GRAMS[unit]
+
+        quantity = f"{round(grams)}g"
+        if count is not None and unit not in MASS_UNITS:
+            unit_name = unit or food.unit
+            if count > 1 and unit_name not in ("tbsp", "tsp"):
+                unit_name += "es" if unit_name.endswith(("s", "sh", "ch")) else "s"
+            quantity = f"{count:g} {unit_name} ({quantity})"
+        return LoggedItem(food=food, grams=grams, quantity=quantity)
+
+    def _match_food(self, tokens) -> Optional[Food]:
+        words = [_singular(token) for token in tokens if not token[0].isdigit()]
+        # Longest run of words that is a known alias; everything around it must be filler
+        for length in range(len(words), 0, -1):
+            for start in range(len(words) - length + 1):
+                food = self.lookup(" ".join(words[start:start + length]))
+                if food is not None:
+                    rest = words[:start] + words[start + length:]
+                    if all(word in FILLER_WORDS for word in rest):
+                        return food
+                    # "chiken biryani": a known word next to an unknown one, try the phrase as a whole
+                    break
+            else:
+                continue
+            break
+        # Typos such as "bananna"
+        remaining = [word for word in words if word not in FILLER_WORDS]
+        return self.fuzzy_lookup(" ".join(remaining)) if remaining else None
+
+    def estimate(self, description: str) -> LocalEstimate:
+        """Split a free-text meal into items and resolve each against the table."""
+        text = unicodedata.normalize("NFKD", description).encode("ascii", "ignore").decode("ascii").lower()
+        for alias in self.protected_aliases:
+            text = re.sub(rf"\b{re.escape(alias)}\b", alias.replace(" ", "_"), text)
+
+        estimate = LocalEstimate()
+        if NEGATIONS.search(text):
+            estimate.unknown.append(description)
+            return estimate
+
+        # A dish whose name contains a separator ("fish & chips", "mac n cheese") is one item, not two
+        whole = self._parse_item(text.replace("_", " "))
+        fragments = [text] if whole is not None else SEPARATORS.split(text)
+        for fragment in fragments:
+            fragment = fragment.replace("_", " ").strip()
+            if not TOKENS.findall(fragment) or all(t in FILLER_WORDS for t in TOKENS.findall(fragment)):
+                continue
+            item = whole if whole is not None else self._parse_item(fragment)
+            if item is None or item.grams > NUTRITION_MAX_ITEM_GRAMS:
+                estimate.unknown.append(fragment)
+            else:
+                estimate.items.append(item)
+        return estimate
+
+
+def build_meal_log(items: List[LoggedItem]) -> dict:
+    """MealLog-shaped dict for locally resolved items. Totals are rounded up, as the LLM prompt asks for upper bounds."""
+    names = [item.food.name for item in items]
+    name = names[0] if len(names) == 1 else f"{', '.join(names[:-1])} and {names[-1]}"
+    prep_minutes = max(item.food.prep_minutes for item in items)
+
+    def total(attribute):
+        return math.ceil(sum(getattr(item.food, attribute) * item.grams / 100 for item in items))
+
+    return {
+        "name": name,
+        "ingredients": [{"name": item.food.name, "quantity": item.quantity} for item in items],
+        "calories": total("kcal"),
+        "macros": {"protein": total("protein"), "carbs": total("carbs"), "fats": total("fat")},
+        "cooking_time": f"{prep_minutes} minutes" if prep_minutes else "No cooking",
+        "difficulty": "easy" if prep_minutes <= 30 else "intermediate",
+        "total_weight": f"{round(sum(item.grams for item in items))}g",
+    }
+
+
+def merge_meal_logs(local_log: dict, llm_log: dict) -> dict:
+    """Combine a local estimate with an LLM estimate for the items the table didn't know."""
+
+    def grams(weight: str) -> int:
+        match = re.search(r"\d+", weight or "")
+        return int(match.group()) if match else 0
+
+    def minutes(cooking_time: str) -> int:
+        return grams(cooking_time)
+
+    difficulties = ["easy", "intermediate", "expert"]
+    difficulty = max(
+        (local_log["difficulty"], llm_log["difficulty"]),
+        key=lambda d: difficulties.index(d) if d in difficulties else 0,
+    )
+    return {
+        "name": f"{llm_log['name']} with {local_log['name']}",
+        "ingredients": llm_log["ingredients"] + local_log["ingredients"],
+        "calories": local_log["calories"] + llm_log["calories"],
+        "macros": {k: local_log["macros"][k] + llm_log["macros"][k] for k in ("protein", "carbs", "fats")},
+        "cooking_time": f"{max(minutes(local_log['cooking_time']), minutes(llm_log['cooking_time']))} minutes",
+        "difficulty": difficulty,
+        "total_weight": f"{grams(local_log['total_weight']) + grams(llm_log['total_weight'])}g",
+    }
+
+
+_db = None
+
+
+def get_nutrition_db() -> NutritionDB:
+    global _db
+    if _db is None:
+        _db = NutritionDB()
+    return _db
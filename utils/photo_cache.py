@@ -0,0 +1,121 @@
+import itertools
+import time
+from collections import OrderedDict
+
+from utils.metrics import cache_lookup
+from utils.response_cache import RESPONSE_CACHES
+
+
+class MultiIndexHash:
+    """Hamming-radius index over fixed-width hashes (multi-index hashing).
+
+    The hash is split into `radius + 1` disjoint chunks. Two hashes within
+    `radius` bits of each other must agree exactly on at least one chunk
+    (pigeonhole), so a search only verifies entries sharing a chunk with
+    the query instead of scanning the whole index.
+    """
+
+    def __init__(self, radius: int, bits: int = 64):
+        chunks = radius + 1
+        widths = [bits // chunks + (i < bits % chunks) for i in range(chunks)]
+        self.radius = radius
+        self._chunks = []
+        shift = 0
+        for width in widths:
+            self._chunks.append((shift, (1 << width) - 1))
+            shift += width
+        # one {chunk value: {entry id: full hash}} table per chunk
+        self._tables = [{} for _ in self._chunks]
+        self.size = 0
+
+    def add(self, value: int, entry_id):
+        self.size += 1
+        for (shift, mask), table in zip(self._chunks, self._tables):
+            table.setdefault((value >> shift) & mask, {})[entry_id] = value
+
+    def remove(self, value: int, entry_id):
+        self.size -= 1
+        for (shift, mask), table in zip(self._chunks, self._tables):
+            key = (value >> shift) & mask
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.pop(entry_id, None)
+                if not bucket:
+                    del table[key]
+
+    def search(self, value: int) -> list:
+        """Return (distance, entry_id) pairs within the radius, closest first."""
+        matches = {}
+        for (shift, mask), table in zip(self._chunks, self._tables):
+            for entry_id, candidate in table.get((value >> shift) & mask, {}).items():
+                if entry_id not in matches:
+                    distance = (candidate ^ value).bit_count()
+                    if distance <= self.radius:
+                        matches[entry_id] = distance
+        return sorted(((distance, entry_id) for entry_id, distance in matches.items()), key=lambda m: m[0])
+
+
+class PhotoAnalysisCache:
+    """Near-duplicate photo cache: serves a stored analysis for any hash within `max_distance` bits.
+
+    Entries are partitioned by scope (a user id, or "global"), expire after
+    `ttl` and are evicted LRU once `max_entries` is reached.
+    """
+
+    def __init__(self, name: str, max_entries: int, max_distance: int, ttl: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # entry id -> (scope, hash, value, expires_at), least recently used first
+        self._entries = OrderedDict()
+        self._indexes = {}
+        self._ids = itertools.count()
+        RESPONSE_CACHES[name] = self
+
+    def get(self, scope: str, value: int):
+        index = self._indexes.get(scope)
+        if index is not None:
+            now = time.monotonic()
+            for _, entry_id in index.search(value):
+                entry = self._entries[entry_id]
+                if entry[3] <= now:
+                    self._remove(entry_id)
+                    continue
+                self._entries.move_to_end(entry_id)
+                self.hits += 1
+                cache_lookup(self.name, True)
+                return entry[2]
+        self.misses += 1
+        cache_lookup(self.name, False)
+        return None
+
+    def set(self, scope: str, value: int, analysis):
+        entry_id = next(self._ids)
+        self._entries[entry_id] = (scope, value, analysis, time.monotonic() + self.ttl)
+        if scope not in self._indexes:
+            self._indexes[scope] = MultiIndexHash(self.max_distance)
+        self._indexes[scope].add(value, entry_id)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id):
+        scope, value, _, _ = self._entries.pop(entry_id)
+        index = self._indexes[scope]
+        index.remove(value, entry_id)
+        if not index.size:
+            del self._indexes[scope]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "ttl": self.ttl,
+            "entries": len(self._entries),
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
@@ -1,178 +1,160 @@
-from schemas.meal_plan_model import MealRequest
+from schemas.meal_plan_model import Meal, MealRequest
 from schemas.recipe_model import RecipeRequest
 
-def generate_meal_plan_prompt(request: MealRequest) -> str:
-    return f"""
-    You are a world-class AI nutritionist and meal planner. Your job is to generate a **personalized daily meal plan** that aligns with the user's dietary preferences, health conditions, regional food availability, and nutritional needs.
-
-    ### **📌 User Profile & Preferences**
-    - **Meal Goal:** {request.meal_goal} (e.g., weight loss, muscle gain, balanced diet)
-    - **Dietary Preferences:** {", ".join(request.dietary_preferences) if request.dietary_preferences else "None"}
-    - **Allergies / Food Restrictions:** {", ".join(request.allergies) if request.allergies else "None"}
-    - **Region / Country:** {request.region} (Ensure meals use common ingredients in this region)
-    - **Activity Level:** {request.activity_level} (e.g., sedentary, moderately active, highly active)
-    - **Age:** {request.age}
-    - **Gender:** {request.gender}
-    - **Portion Size Preference:** {request.portion_size} (small, balanced, large)
-    - **Health Issues:** {", ".join(request.health_issues) if request.health_issues else "None"}
-    - **Cooking Experience:** {request.cooking_experience} (beginner, intermediate, expert)
-    - **Eating Frequency:** {request.eating_frequency} (Three Meals, Two Meals, Intermittent Fasting, Small Frequent Meals, OMAD)
-    - **BMI:** {request.bmi}, **BMI Category:** {request.bmi_category} 
-    - **Meals Per Day:** {request.meal_count} (Ensure meal count aligns with eating frequency)
-    - **Snack & Sweet Preference:** Include a healthy snack and a dessert based on user goals & restrictions.
-
-    ---
-
-    ### **📌 Meal Plan Generation Rules**
-    1️⃣ **Ensure meal diversity & avoid repetition**  
-    - Suggest different meal types each day.  
-    - Rotate proteins, grains, and vegetables (e.g., oatmeal one day, eggs the next, smoothies another day).  
-
-    2️⃣ **Regional Adaptation & Ingredient Substitution**  
-    - If an ingredient is uncommon in **{request.region}**, suggest a regional substitute.  
-    - Use locally available foods whenever possible.  
-
-    3️⃣ **Balance Nutrition & Precise Portion Control**
-    - Adjust portion sizes based on **{request.portion_size}** and **{request.activity_level}**.
-    - Ensure each meal provides **protein, healthy fats, and complex carbs** in balanced amounts.
-    - Each ingredient must include a precise weight in **grams (g)**.
-    - The **total meal weight (in grams)** must reflect the `{request.portion_size}`:
-        - **Small portion** = Lower total weight (~350–450g per meal)
-        - **Balanced portion** = Standard total weight (~500–650g per meal)
-        - **Large portion** = Higher total weight (~700–900g per meal)
-    - Scale ingredients accordingly to ensure that **nutritional values match the portion size**.
-    - Estimate macronutrients (**protein, carbs, fats, and calories**) conservatively. Internally consider a **realistic range**, but return the **upper bound** estimate for each value. This ensures we do not **underestimate** caloric intake (rounding off to nearest integer).
-    - The final meal plan must clearly **list each ingredient with an exact gram amount**.
-
-    4️⃣ **Strictly Adhere to Dietary Preferences & Allergies**  
-    - Exclude any ingredients from: **{", ".join(request.allergies) if request.allergies else "None"}**  
-    - Ensure meals are strictly **{", ".join(request.dietary_preferences) if request.dietary_preferences else "not restricted"}**  
-
-    5️⃣ **Adapt to Cooking Skill Level**  
-    - If the user is a **{request.cooking_experience}** cook, recommend meals that match their skill level.  
-    - Provide **quick meals** for beginners and more elaborate dishes for experienced cooks.  
-
-    6️⃣ **Meals Per Day (Includes Snack & Dessert)**
-    - Generate **{request.meal_count} meals per day** based on **{request.eating_frequency}**.
-    - If `{request.eating_frequency}` is **"two_meals"** or **"intermittent_fasting"**, include only **breakfast & dinner**.
-    - If `{request.eating_frequency}` is **"one_large_meal"**, make it a nutrient-dense meal covering all macronutrients.
-    - Ensure **one healthy snack** and **one dessert** are always included.
-    - The **snack and dessert must align with {request.meal_goal}, {request.dietary_preferences}, {request.allergies}, and {request.health_issues}**.
-    - Avoid ingredients that conflict with **allergies** or worsen **health conditions** (e.g., limit sugar for diabetics).
-    - The **dessert must be healthy** (e.g., no refined sugars for weight loss or diabetes).
-    - **Ensure meal plans are well-balanced with protein, healthy fats, and complex carbs based on the user's dietary goals.**
-
-    7️⃣  🚫 Ingredient & Meal Name Uniqueness
-
+# Static instructions go out as the system instruction (and, where supported, a cached
+# context), so they are identical byte-for-byte across users. Everything user-specific
+# lives in the short per-request prompts below.
+
+MEAL_PLAN_SYSTEM_PROMPT = """
+You are a world-class AI nutritionist and meal planner. Your job is to generate a **personalized daily meal plan** that aligns with the user's dietary preferences, health conditions, regional food availability, and nutritional needs.
+
+The user's profile is given in the message as `key: value` lines. Lists are comma-separated; "none" means no restriction.
+
+### **📌 Meal Plan Generation Rules**
+1️⃣ **Ensure meal diversity & avoid repetition**
+- Suggest different meal types each day.
+- Rotate proteins, grains, and vegetables (e.g., oatmeal one day, eggs the next, smoothies another day).
+
+2️⃣ **Regional Adaptation & Ingredient Substitution**
+- Use ingredients common in the user's `region`; if one is uncommon there, suggest a regional substitute.
+- Use locally available foods whenever possible.
+
+3️⃣ **Balance Nutrition & Precise Portion Control**
+- Adjust portion sizes based on `portion_size` and `activity_level`.
+- Ensure each meal provides **protein, healthy fats, and complex carbs** in balanced amounts.
+- Each ingredient must include a precise weight in **grams (g)**.
+- The **total meal weight (in grams)** must reflect `portion_size`:
+    - **Small portion** = Lower total weight (~350–450g per meal)
+    - **Balanced portion** = Standard total weight (~500–650g per meal)
+    - **Large portion** = Higher total weight (~700–900g per meal)
+- Scale ingredients accordingly to ensure that **nutritional values match the portion size**.
+- Estimate macronutrients (**protein, carbs, fats, and calories**) conservatively. Internally consider a **realistic range**, but return the **upper bound** estimate for each value. This ensures we do not **underestimate** caloric intake (rounding off to nearest integer).
+- The final meal plan must clearly **list each ingredient with an exact gram amount**.
+
+4️⃣ **Strictly Adhere to Dietary Preferences & Allergies**
+- Exclude every ingredient listed in `allergies`.
+- Ensure meals strictly follow `dietary_preferences`.
+
+5️⃣ **Adapt to Cooking Skill Level**
+- Recommend meals that match `cooking_experience` (beginner, intermediate, expert).
+- Provide **quick meals** for beginners and more elaborate dishes for experienced cooks.
+
+6️⃣ **Meals Per Day (Includes Snack & Dessert)**
+- Generate exactly `meals_per_day` meals, consistent with `eating_frequency`.
+- If `eating_frequency` is **"two_meals"** or **"intermittent_fasting"**, include only **breakfast & dinner**.
+- If `eating_frequency` is **"one_large_meal"**, make it a nutrient-dense meal covering all macronutrients.
+- Ensure **one healthy snack** and **one dessert** are always included.
+- The **snack and dessert must align with** `goal`, `dietary_preferences`, `allergies` and `health_issues`.
+- Avoid ingredients that conflict with **allergies** or worsen **health conditions** (e.g., limit sugar for diabetics).
+- The **dessert must be healthy** (e.g., no refined sugars for weight loss or diabetes).
+- **Ensure meal plans are well-balanced with protein, healthy fats, and complex carbs based on the user's dietary goals.**
+
+7️⃣ 🚫 **Ingredient & Meal Name Uniqueness**
 - Do **not** repeat the same meal name, even if it contains different ingredients.
 - Keep track of **previous meal names and ingredients** during generation.
 - Ensure each meal introduces **at least one new primary ingredient or preparation style**.
 - If unsure, ask yourself: *"Does this meal feel similar to a previous one?"* If yes, change it.
 - Meals should feel different in terms of cuisine, base ingredients, or flavor profile.
 
+8️⃣ **Output**
+- Return one object per meal in the order they are eaten, following the response schema.
+"""
 
 
-    8️⃣ **Strict JSON Format** (No additional text, only JSON output)  
-    - The response must be a JSON array where each object represents a meal:
-json
-    [
-        {{
-            "meal": "Breakfast",
-            "name": "Oatmeal with Banana & Honey",
-            "ingredients": [
-                {{"name": "rolled oats", "quantity": "50g"}},
-                {{"name": "banana", "quantity": "100g"}},
-                {{"name": "honey", "quantity": "15g"}},
-                {{"name": "almond milk", "quantity": "200ml"}}
-            ],
-            "calories": 350,
-            "cooking_instructions": [
-                "Boil almond milk.",
-                "Add oats & cook for 5 minutes.",
-                "Top with banana & drizzle honey."
-            ],
-            "macros": {{"protein": 8, "carbs": 50, "fats": 5}},
-            "cooking_time": "10 minutes",
-            "difficulty": "easy",
-            "total_weight": "450g"
-        }},
-        ...
-    ]
-    
-// ✅ Notice how lunch and dinner use different proteins and sides
+def _joined(values, empty: str = "none") -> str:
+    return ", ".join(values) if values else empty
 
-    """
 
+def generate_meal_plan_prompt(request: MealRequest) -> str:
+    """Compact user profile; the rules are in MEAL_PLAN_SYSTEM_PROMPT."""
+    return f"""Create today's meal plan for this user.
+{_meal_profile(request)}"""
+
+
+def _meal_profile(request: MealRequest) -> str:
+    return f"""goal: {request.meal_goal}
+dietary_preferences: {_joined(request.dietary_preferences)}
+allergies: {_joined(request.allergies)}
+health_issues: {_joined(request.health_issues)}
+region: {request.region}
+activity_level: {request.activity_level}
+age: {request.age}
+gender: {request.gender}
+portion_size: {request.portion_size}
+cooking_experience: {request.cooking_experience}
+eating_frequency: {request.eating_frequency}
+meals_per_day: {request.meal_count}
+bmi: {request.bmi} ({request.bmi_category})
+"""
 
-def get_validation_prompt(description: str) -> str:
-    return f"""
-You are a strict meal log validator. Respond with only one word: "yes" or "no".
 
-Here is the user's input:
-"{description}"
+def _meal_summary(meal: Meal, max_ingredients: int = 4) -> str:
+    """One line per meal: enough for the model to avoid repeating a dish or its main ingredients."""
+    ingredients = ", ".join(ingredient.name for ingredient in meal.ingredients[:max_ingredients])
+    return f"- {meal.meal}: {meal.name} ({ingredients}), {meal.calories} kcal"
 
-Does it look like a valid meal description (containing food items, what they ate, or meal-related info)?
-        """
 
-def get_meal_log_generation_prompt(description: str) -> str:
-    return f"""
-You are a certified AI nutritionist trained to analyze real-world meal descriptions. Your job is to extract structured, accurate nutritional information from a user's free-text meal entry.
+def generate_meal_replacement_prompt(request: MealRequest, replaced: Meal, kept: list, used_this_week: str = "") -> str:
+    """Ask for one meal in place of `replaced`, with the rest of the day as one-line summaries.
 
----
+    Same system instruction as a full plan, so the uniqueness rules apply
+    against the meals that stay (and, for a weekly plan, against `used_this_week`).
+    """
+    kept_lines = "\n".join(_meal_summary(meal) for meal in kept) or "- none"
+    week = f"also used this week (do not repeat):\n{used_this_week}\n" if used_this_week else ""
+    return f"""Replace one meal in today's plan for this user. Return only the new meal.
+slot: {replaced.meal}
+target_calories: about {replaced.calories} kcal
+rejected (do not suggest again): {replaced.name} ({", ".join(ingredient.name for ingredient in replaced.ingredients)})
+rest of the day (keep; the new meal must differ from these in name and main ingredients):
+{kept_lines}
+{week}{_meal_profile(request)}"""
+
+
+def generate_week_day_prompt(request: MealRequest, day: int, days: int, style: str, used: str) -> str:
+    """One day of a weekly plan: the usual profile, a style for the day, and what the week already uses."""
+    avoid = f"already used this week (do not repeat these meals; use their main ingredients sparingly):\n{used}\n" if used else ""
+    return f"""Create the meal plan for day {day + 1} of {days} of this user's week.
+style_of_the_day: {style} (a leaning, not a rule; every meal must still fit the profile)
+{avoid}{_meal_profile(request)}"""
+
+
+MEAL_LOG_VALIDATION_SYSTEM_PROMPT = """
+You are a strict meal log validator. Respond with only one word: "yes" or "no".
+Answer "yes" if the user's input looks like a valid meal description (containing food items, what they ate, or meal-related info).
+"""
 
-The user described their meal as:
-\"\"\"
-{description}
-\"\"\"
 
----
+def get_validation_prompt(description: str) -> str:
+    return description
+
+
+MEAL_LOG_SYSTEM_PROMPT = """
+You are a certified AI nutritionist trained to analyze real-world meal descriptions. Your job is to extract structured, accurate nutritional information from a user's free-text meal entry, which is the whole of the user's message.
 
 ### 🍽️ Instructions:
 
 1. Parse the ingredients and estimate **quantities in grams or standard servings** (e.g., 1 cup, 2 slices).
    - If no quantity is mentioned, **assume a typical portion size** based on common meal patterns.
-2. Estimate **total calories** and **macronutrients** (protein, carbs, fats) for the entire meal.  
+2. Estimate **total calories** and **macronutrients** (protein, carbs, fats) for the entire meal.
    - Use realistic nutritional values based on **USDA/FoodData Central or similar databases**.
    - Internally estimate a realistic **range** of values for each nutrient and total calories based on ingredients, portion sizes, and preparation.
-- **Return only the upper bound** of your estimate — this ensures we do not underestimate anything.
-
+   - **Return only the upper bound** of your estimate — this ensures we do not underestimate anything.
    - Avoid generic underestimation. Assume full servings, sauces, oils, and garnishes if likely.
 3. Estimate the **total weight of the dish** in grams.
 4. Return a **reasonable cooking time** and **difficulty level** (easy, intermediate, expert).
-5. If no valid meal can be confidently extracted, respond with the exact string `"INVALID"`.
+5. If no valid meal can be confidently extracted (the text names no food or drink, or is unrelated to eating), set `is_valid` to false and leave `log` null.
+"""
 
----
 
-🎯 Output must be returned in **strict JSON** format like below:
-
-```json
-{{
-  "name": "Grilled Chicken with Brown Rice",
-  "ingredients": [
-    {{ "name": "Grilled chicken breast", "quantity": "150g" }},
-    {{ "name": "Brown rice", "quantity": "1 cup (195g)" }},
-    {{ "name": "Olive oil", "quantity": "1 tbsp" }}
-  ],
-  "calories": 750,
-  "macros": {{
-    "protein": 50,
-    "carbs": 50,
-    "fats": 30
-  }},
-  "cooking_time": "25 minutes",
-  "difficulty": "easy",
-  "total_weight": "500g"
-}}
-"""
+def get_meal_log_generation_prompt(description: str) -> str:
+    return description
 
-def generate_recipe_prompt(request: RecipeRequest) -> str:
-    return f"""
+
+RECIPE_SYSTEM_PROMPT = """
 You are a professional chef and nutritionist. Help users create a healthy, creative recipe based on leftover ingredients.
 
-The user has provided:
-- **Ingredients**: {', '.join(request.ingredients)}
-- **Tags**: {', '.join(request.tags or [])}
-- **Lifestyle**: {request.lifestyle or "None"}
+The user's message lists their `ingredients`, `tags` and `lifestyle`.
 
 📌 Your tasks:
 - Suggest a **creative recipe** using ONLY or mostly the listed ingredients.
@@ -182,39 +164,18 @@ The user has provided:
 🔒 **Strict Output Rules**:
 - **Estimate** realistic macros (`protein`, `carbs`, `fats`) and `calories` based on common ingredient knowledge.
 - **Only** set a macro value to `0` if it is truly negligible or missing.
-- Always output `macros` (`protein`, `carbs`, `fats`) and `calories` as **integers** (no decimals, no strings).
-- Respond only with **pure JSON** (no markdown, no explanations, no comments).
-
-📦 Output format:
-```json
-{{
-  "name": "Zucchini Feta Omelette",
-  "ingredients": [
-    {{ "name": "zucchini", "quantity": "100g" }},
-    {{ "name": "feta cheese", "quantity": "50g" }},
-    {{ "name": "eggs", "quantity": "2 large" }}
-  ],
-  "instructions": [
-    "Grate the zucchini and squeeze out excess moisture.",
-    "Beat the eggs with crumbled feta and zucchini.",
-    "Cook the mixture in a non-stick pan for 5–7 minutes.",
-    "Fold and serve warm."
-  ],
-  "estimated_time": "10 minutes",
-  "difficulty": "easy",
-  "calories": 350,
-  "macros": {{
-    "protein": 25,
-    "carbs": 10,
-    "fats": 20
-  }},
-  "servings": 2
-}}
+- Output `macros` (`protein`, `carbs`, `fats`) and `calories` as whole numbers.
+"""
+
 
+def generate_recipe_prompt(request: RecipeRequest) -> str:
+    return f"""ingredients: {_joined(request.ingredients)}
+tags: {_joined(request.tags)}
+lifestyle: {request.lifestyle or "none"}
 """
 
-def generate_ai_analysis_prompt():
-    return """
+
+IMAGE_ANALYSIS_SYSTEM_PROMPT = """
 You are a nutrition and food vision expert. Given a real-world food image, analyze it and return structured meal data that matches a specific schema for logging meals.
 
 ---
@@ -235,39 +196,13 @@ Please perform the following:
 
 5. Suggest `"difficulty"`level for cooking this dish and best estimation for `"cooking_time"`.
 
+6. If the image does not show food, set `meal_data` to null.
+
 ---
 
-🎯 Format your response in **strict JSON** using this structure:
-
-```json
-{
-  "meal_data": {
-    "meal": "Snack",
-    "name": "Grilled Chicken and Jalapeño Sandwich on Brown Bread",
-    "macros": {
-      "fats": 15,
-      "carbs": 45,
-      "protein": 30
-    },
-    "calories": 420,
-    "difficulty": easy,
-    "ingredients": [
-      {
-        "name": "Grilled chicken breast",
-        "quantity": "100g"
-      },
-      {
-        "name": "Jalapeño slices",
-        "quantity": "20g"
-      },
-      {
-        "name": "Brown bread",
-        "quantity": "2 slices (60g)"
-      }
-    ],
-    "cooking_time": 30 minutes,
-    "total_weight": "180g"
-  },
-  "description": "A hearty sandwich made with grilled chicken, jalapeño slices, and two slices of toasted brown bread. Served on a white plate with light garnishing. Ideal for a quick high-protein snack."
-}
-"""
\ No newline at end of file
+Also return a one- or two-sentence `description` of the dish as served.
+"""
+
+
+def generate_ai_analysis_prompt():
+    return "Analyze this meal photo."
@@ -0,0 +1,215 @@
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+
+# Lower value = served first
+PRIORITY_PRO = 0
+PRIORITY_FREE = 1
+
+# Per-model quotas; anything not listed uses the defaults below.
+# Override with GEMINI_RATE_LIMITS='{"gemini-2.5-pro-preview-03-25": {"rpm": 150, "tpm": 2000000}}'
+GEMINI_RATE_LIMITS = {
+    "gemini-2.5-pro-preview-03-25": {"rpm": 150, "tpm": 2_000_000},
+    "gemini-2.5-flash-preview-04-17-thinking": {"rpm": 1000, "tpm": 1_000_000},
+    "gemini-2.0-flash": {"rpm": 2000, "tpm": 4_000_000},
+    "gemini-1.5-pro": {"rpm": 1000, "tpm": 4_000_000},
+    **json.loads(os.getenv('GEMINI_RATE_LIMITS', '{}')),
+}
+GEMINI_DEFAULT_RPM = float(os.getenv('GEMINI_DEFAULT_RPM', '500'))
+GEMINI_DEFAULT_TPM = float(os.getenv('GEMINI_DEFAULT_TPM', '1000000'))
+
+# Adaptive concurrency per model: starts here, halves on 429, grows by ~1 per round-trip of successes
+LLM_CONCURRENCY_INITIAL = float(os.getenv('LLM_CONCURRENCY_INITIAL', '64'))
+LLM_CONCURRENCY_MIN = float(os.getenv('LLM_CONCURRENCY_MIN', '1'))
+LLM_CONCURRENCY_MAX = float(os.getenv('LLM_CONCURRENCY_MAX', '256'))
+
+# Give up on a queued call after this long, or refuse outright past this many waiters
+LLM_QUEUE_MAX_WAIT = float(os.getenv('LLM_QUEUE_MAX_WAIT', '30'))
+LLM_QUEUE_MAX_DEPTH = int(os.getenv('LLM_QUEUE_MAX_DEPTH', '1000'))
+
+# Rough prompt-size estimate before the real usage is known
+CHARS_PER_TOKEN = 4
+TOKENS_PER_IMAGE = 258
+DEFAULT_OUTPUT_TOKENS = 2000
+
+
+class LLMOverloaded(Exception):
+    """A call waited too long for quota, or the queue was already full."""
+
+
+def estimate_tokens(contents, config=None) -> int:
+    """Prompt tokens (including the system instruction) from text length plus a fixed cost per image, plus the expected output."""
+    tokens = 0
+    for item in contents if isinstance(contents, list) else [contents]:
+        if isinstance(item, str):
+            tokens += len(item) // CHARS_PER_TOKEN
+        elif getattr(item, "text", None):
+            tokens += len(item.text) // CHARS_PER_TOKEN
+        else:
+            tokens += TOKENS_PER_IMAGE
+    if config is not None and isinstance(config.system_instruction, str):
+        tokens += len(config.system_instruction) // CHARS_PER_TOKEN
+    max_output = getattr(config, "max_output_tokens", None) if config is not None else None
+    return tokens + (max_output or DEFAULT_OUTPUT_TOKENS)
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute`, holding at most one minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        """Correct an earlier estimate once the real cost is known; may go negative (debt)."""
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class ModelLimiter:
+    """Quota gate for one model: RPM and TPM buckets, an AIMD concurrency limit and a priority queue."""
+
+    def __init__(self, model: str, rpm: float, tpm: float):
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.limit = LLM_CONCURRENCY_INITIAL
+        self.in_flight = 0
+        self._queue = []
+        self._seq = itertools.count()
+        self._timer = None
+        # Reporting
+        self.admitted = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.wait_ewma = 0.0
+        self.wait_max = 0.0
+
+    def queue_depth(self) -> int:
+        return sum(1 for *_, future, _ in self._queue if not future.done())
+
+    async def acquire(self, tokens: int, priority: int):
+        if self.queue_depth() >= LLM_QUEUE_MAX_DEPTH:
+            self.rejected += 1
+            raise LLMOverloaded(f"{self.model}: {LLM_QUEUE_MAX_DEPTH} calls already queued")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), future, tokens))
+        queued_at = time.monotonic()
+        self._pump()
+        try:
+            await asyncio.wait_for(future, LLM_QUEUE_MAX_WAIT)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise LLMOverloaded(f"{self.model}: no quota within {LLM_QUEUE_MAX_WAIT:g}s")
+        except asyncio.CancelledError:
+            # Admitted at the same moment we were cancelled: hand the slot back
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+        waited = time.monotonic() - queued_at
+        self.wait_ewma += 0.1 * (waited - self.wait_ewma)
+        self.wait_max = max(self.wait_max, waited)
+
+    def release(self):
+        self.in_flight -= 1
+        self._pump()
+
+    def on_success(self, estimated_tokens: int, used_tokens: int = None):
+        if used_tokens is not None:
+            self.tokens.adjust(used_tokens - estimated_tokens)
+        self.limit = min(LLM_CONCURRENCY_MAX, self.limit + 1 / self.limit)
+
+    def on_throttled(self):
+        self.throttled += 1
+        self.limit = max(LLM_CONCURRENCY_MIN, self.limit / 2)
+
+    def _pump(self):
+        """Admit waiters from the head of the queue while concurrency and both buckets allow."""
+        while self._queue:
+            _, _, future, tokens = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            if self.in_flight >= math.floor(self.limit):
+                return
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if wait > 0:
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(wait, self._wake)
+                return
+            heapq.heappop(self._queue)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+            self.admitted += 1
+            future.set_result(None)
+
+    def _wake(self):
+        self._timer = None
+        self._pump()
+
+    def snapshot(self) -> dict:
+        by_priority = {}
+        for priority, _, future, _ in self._queue:
+            if not future.done():
+                by_priority[priority] = by_priority.get(priority, 0) + 1
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queue_depth": sum(by_priority.values()),
+            "queued_by_priority": by_priority,
+            "wait_ewma_ms": round(self.wait_ewma * 1000, 1),
+            "wait_max_ms": round(self.wait_max * 1000, 1),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+            "requests_available": round(self.requests.tokens, 1),
+            "tokens_available": round(self.tokens.tokens),
+        }
+
+
+LIMITERS = {}
+
+
+def get_limiter(model: str) -> ModelLimiter:
+    if model not in LIMITERS:
+        quota = GEMINI_RATE_LIMITS.get(model, {})
+        LIMITERS[model] = ModelLimiter(model, quota.get("rpm", GEMINI_DEFAULT_RPM), quota.get("tpm", GEMINI_DEFAULT_TPM))
+    return LIMITERS[model]
+
+
+@asynccontextmanager
+async def limited(model: str, tokens: int, priority: int = PRIORITY_FREE):
+    """Hold a quota slot for `model` for the duration of the block."""
+    limiter = get_limiter(model)
+    await limiter.acquire(tokens, priority)
+    try:
+        yield limiter
+    finally:
+        limiter.release()
+
+
+def limiter_stats() -> dict:
+    return {model: limiter.snapshot() for model, limiter in LIMITERS.items()}
@@ -1,55 +1,47 @@
-from schemas.recipe_model import RecipeRequest
+from schemas.recipe_model import Recipe, RecipeRequest
 from fastapi.responses import JSONResponse
-from google import genai
-import json
-import os
-from dotenv import load_dotenv
-from utils.prompts import generate_recipe_prompt
+from pydantic import ValidationError
+from utils.prompts import RECIPE_SYSTEM_PROMPT, generate_recipe_prompt
+from utils.llm_gateway import structured_config, parse_structured
+from utils.model_router import routed_generate
+from utils.rate_limiter import PRIORITY_FREE, PRIORITY_PRO
+from utils.metrics import stage
+from utils.log import get_logger
 
-load_dotenv()
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-
-
-client = genai.Client(api_key=GEMINI_API_KEY)
+log = get_logger(__name__)
 
 async def generate_recipe_from_leftovers(request: RecipeRequest):
-    print(f"📥 Received recipe generation request: {request}")
+    # Choose model route
+    route_name = "recipe.pro" if request.is_pro else "recipe.free"
+    log.info("recipe request", extra={"route": route_name, "ingredients": len(request.ingredients)})
     try:
         # 🧠 Prompt creation
-        generation_prompt = generate_recipe_prompt(request)
-        print(f"📝 Generated prompt:\n{generation_prompt}")
-
-        # Choose model
-        model_name = "gemini-2.5-pro-preview-03-25" if request.is_pro else "gemini-2.5-flash-preview-04-17-thinking"
-        print(f"👉 Using Gemini model: {model_name}")
+        with stage("prompt_build"):
+            generation_prompt = generate_recipe_prompt(request)
+        log.debug("recipe prompt", extra={"prompt": generation_prompt})
 
         # Call Gemini
-        response = client.models.generate_content(
-            model=model_name,
-            contents=[generation_prompt]
+        response = await routed_generate(
+            route_name,
+            contents=[generation_prompt],
+            config=structured_config(Recipe, system_instruction=RECIPE_SYSTEM_PROMPT),
+            priority=PRIORITY_PRO if request.is_pro else PRIORITY_FREE,
         )
-        raw_text = response.text.strip()
-        print(f"🔙 Raw Gemini response:\n{raw_text}")
-
-        # Clean JSON
-        clean_json = raw_text.replace("```json", "").replace("```", "").strip()
-        print(f"🧹 Cleaned JSON before parsing:\n{clean_json}")
+        log.debug("recipe raw response", extra={"text": response.text, "sample": 0.01})
 
-        # Parse JSON
-        recipe_data = json.loads(clean_json)
-        print(f"✅ Successfully parsed recipe data:\n{recipe_data}")
+        # Validate against the response schema
+        recipe_data = parse_structured(response, Recipe).model_dump()
 
         return {"recipe": recipe_data}
 
-    except json.JSONDecodeError as e:
-        print(f"❌ JSONDecodeError: {e}")
-        print(f"🔎 Raw text received from Gemini:\n{raw_text}")
+    except ValidationError as e:
+        log.warning("recipe did not match the schema", extra={"route": route_name, "error": str(e)})
         return JSONResponse(
             status_code=500,
             content={"recipe": None, "message": "❌ Failed to parse Gemini response."}
         )
     except Exception as e:
-        print(f"🔥 Exception occurred: {e}")
+        log.exception("recipe generation failed", extra={"route": route_name})
         return JSONResponse(
             status_code=500,
             content={"recipe": None, "message": f"❌ Internal Server Error: {str(e)}"}
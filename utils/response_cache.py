@@ -0,0 +1,69 @@
+import hashlib
+import json
+
+from utils.cache import MISSING, DiskCache, MemoryCache, RedisCache
+from utils.metrics import cache_lookup
+
+# Every ResponseCache registers itself here so its counters can be reported
+RESPONSE_CACHES = {}
+
+
+def canonical_key(fields: dict) -> str:
+    """Stable hash of request fields: key order, list order and letter case don't matter."""
+
+    def canonical(value):
+        if isinstance(value, str):
+            return value.strip().casefold()
+        if isinstance(value, (list, tuple, set)):
+            return sorted(canonical(v) for v in value)
+        if isinstance(value, dict):
+            return {k: canonical(v) for k, v in value.items()}
+        return value
+
+    payload = json.dumps(canonical(fields), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def make_backend(kind: str, name: str, max_entries: int, path: str = None):
+    """Build a cache backend by name: "memory", "disk" or "redis"."""
+    if kind == "memory":
+        return MemoryCache(max_entries)
+    if kind == "disk":
+        return DiskCache(path or f"{name}.cache.sqlite3", max_entries)
+    if kind == "redis":
+        return RedisCache(name)
+    raise ValueError(f"Unknown cache backend: {kind}")
+
+
+class ResponseCache:
+    """TTL cache for full LLM responses with hit/miss counters."""
+
+    def __init__(self, name: str, backend, ttl: float):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        RESPONSE_CACHES[name] = self
+
+    async def get(self, key: str):
+        value = await self.backend.get(key)
+        cache_lookup(self.name, value is not MISSING)
+        if value is MISSING:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value):
+        await self.backend.set(key, value, self.ttl)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
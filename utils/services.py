@@ -0,0 +1,64 @@
+import asyncio
+import importlib
+import inspect
+import os
+import threading
+
+# Heavy modules the first requests will need; imported in the background once the app is up
+SERVICES_WARM_IMPORTS = [m for m in os.getenv('SERVICES_WARM_IMPORTS', 'google.genai,PIL.Image').split(',') if m]
+# Registered clients built during the same warm-up (SSL contexts and connection pools aren't free either)
+SERVICES_WARM_CLIENTS = [c for c in os.getenv('SERVICES_WARM_CLIENTS', 'genai').split(',') if c]
+
+
+class Services:
+    """App-scoped SDK clients, one of each per worker, created on first use.
+
+    Modules register a factory (and optionally a close function) for each
+    client they own; nothing is constructed until something asks for it, so
+    importing the app stays cheap. The lifespan hook closes whatever was
+    created.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._closers = {}
+        self._instances = {}
+        # Warm-up builds clients on a thread while requests may ask for them
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory, close=None):
+        self._factories[name] = factory
+        if close is not None:
+            self._closers[name] = close
+
+    def get(self, name: str):
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = self._instances[name] = self._factories[name]()
+        return instance
+
+    def created(self) -> list:
+        return list(self._instances)
+
+    async def warm(self, modules: list = SERVICES_WARM_IMPORTS, clients: list = SERVICES_WARM_CLIENTS):
+        """Import heavy modules and build clients off the event loop, so the first request doesn't pay for them."""
+        for module in modules:
+            await asyncio.to_thread(importlib.import_module, module)
+        for name in clients:
+            if name in self._factories:
+                await asyncio.to_thread(self.get, name)
+
+    async def aclose(self):
+        for name, instance in list(self._instances.items()):
+            close = self._closers.get(name)
+            if close is not None:
+                result = close(instance)
+                if inspect.isawaitable(result):
+                    await result
+        self._instances.clear()
+
+
+services = Services()
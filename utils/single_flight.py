@@ -0,0 +1,80 @@
+import asyncio
+import os
+import uuid
+
+from utils.cache import get_redis
+from utils.config import REDIS_URL
+
+SINGLE_FLIGHT_LOCK_TTL = float(os.getenv('SINGLE_FLIGHT_LOCK_TTL', '120'))
+SINGLE_FLIGHT_POLL_INTERVAL = float(os.getenv('SINGLE_FLIGHT_POLL_INTERVAL', '0.5'))
+
+# Only delete the lock if we still own it
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution.
+
+    Callers in the same process share one task per key. The task is detached
+    from whoever started it: a caller that is cancelled (its client went
+    away) stops waiting, but the work carries on for the others, and if
+    nobody is left it still finishes and stores its result. When REDIS_URL is
+    set, a lock in Redis does the same across workers: a worker that finds the
+    lock taken polls `recheck()` until the other worker's result shows up, and
+    only runs `fn()` itself if the lock is released or expires without one.
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._inflight = {}
+
+    async def do(self, key: str, fn, recheck=None):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(key, fn, recheck))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Nobody may be waiting any more; don't warn about an unretrieved exception
+        if not task.cancelled():
+            task.exception()
+
+    async def _run(self, key: str, fn, recheck):
+        if not REDIS_URL:
+            return await fn()
+
+        redis = get_redis()
+        lock_key = f"single-flight:{self.namespace}:{key}"
+        token = uuid.uuid4().hex
+        deadline = asyncio.get_running_loop().time() + SINGLE_FLIGHT_LOCK_TTL
+        while not await redis.set(lock_key, token, nx=True, px=int(SINGLE_FLIGHT_LOCK_TTL * 1000)):
+            # Another worker is producing this key; wait for its result to land
+            if recheck is not None:
+                result = await recheck()
+                if result is not None:
+                    return result
+            if asyncio.get_running_loop().time() > deadline:
+                break
+            await asyncio.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+        else:
+            try:
+                # The previous holder may have finished between our miss and acquiring the lock
+                if recheck is not None:
+                    result = await recheck()
+                    if result is not None:
+                        return result
+                return await fn()
+            finally:
+                await redis.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+
+        # Lock holder took longer than the lock TTL; don't wait forever
+        return await fn()
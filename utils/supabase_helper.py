@@ -1,8 +1,54 @@
-from supabase import Client, create_client, StorageException
 import os
 
+from utils.http_client import get_http_client
+from utils.metrics import stage
+from utils.log import get_logger
+from utils.services import services
+
+log = get_logger(__name__)
+
 
 SUPABASE_PUBLIC_URL=os.getenv('SUPABASE_URL')
 SUPABASE_PUBLIC_KEY=os.getenv('SUPABASE_KEY')
 SUPABASE_BUCKET = "meal_images"  
-supabase: Client = create_client(SUPABASE_PUBLIC_URL, SUPABASE_PUBLIC_KEY)
\ No newline at end of file
+
+
+def _make_supabase():
+    # The SDK pulls in auth/realtime/postgrest clients (~0.3s to import); only build it if something needs it
+    from supabase import create_client
+
+    return create_client(SUPABASE_PUBLIC_URL, SUPABASE_PUBLIC_KEY)
+
+
+services.register("supabase", _make_supabase)
+
+
+def get_supabase():
+    """Supabase SDK client. Uploads and existence probes go through the REST API and don't need it."""
+    return services.get("supabase")
+
+
+def public_object_url(bucket: str, file_name: str) -> str:
+    return f"{SUPABASE_PUBLIC_URL}/storage/v1/object/public/{bucket}/{file_name}"
+
+
+async def upload_object(bucket: str, file_name: str, data: bytes, content_type: str = "image/png", upsert: bool = False):
+    """Upload through the Storage REST API on the shared connection pool. Returns the public URL or None.
+
+    With `upsert`, an existing object is overwritten instead of the upload failing.
+    """
+    with stage("supabase_upload"):
+        response = await get_http_client().post(
+            f"{SUPABASE_PUBLIC_URL}/storage/v1/object/{bucket}/{file_name}",
+            content=data,
+            headers={
+                "Authorization": f"Bearer {SUPABASE_PUBLIC_KEY}",
+                "apikey": SUPABASE_PUBLIC_KEY,
+                "Content-Type": content_type,
+                "x-upsert": "true" if upsert else "false",
+            },
+        )
+    if response.status_code != 200:
+        log.warning("supabase upload failed", extra={"bucket": bucket, "file": file_name, "status": response.status_code, "body": response.text[:200]})
+        return None
+    return public_object_url(bucket, file_name)
@@ -0,0 +1,98 @@
+import os
+import re
+from collections import Counter
+
+from utils.name_normalizer import canonical_ingredient_name, canonical_meal_name
+
+# Days of one weekly plan generated at once; every call still queues behind the model rate limiter
+WEEK_PLAN_CONCURRENCY = int(os.getenv('WEEK_PLAN_CONCURRENCY', '7'))
+# How many meals in a week may share a primary ingredient before the extras are replaced
+WEEK_PLAN_MAX_PRIMARY_REPEATS = int(os.getenv('WEEK_PLAN_MAX_PRIMARY_REPEATS', '3'))
+# Replacement rounds for repeated meals: replacements made at the same time can repeat each other,
+# so the week is checked again after each round and what still repeats is replaced once more
+WEEK_PLAN_DEDUPE_ROUNDS = int(os.getenv('WEEK_PLAN_DEDUPE_ROUNDS', '2'))
+# Cap on the names listed in a prompt's "already used" line
+WEEK_PLAN_USED_NAMES_MAX = int(os.getenv('WEEK_PLAN_USED_NAMES_MAX', '40'))
+
+# Days generated at the same time can't see each other's meals; a different style per day keeps them apart.
+# Styles rather than proteins or cuisines, so none of them conflicts with a diet or an allergy.
+WEEK_DAY_STYLES = [
+    "one-pot dishes and stews",
+    "grilled and roasted dishes",
+    "fresh salads and grain bowls",
+    "stir-fries and quick pan dishes",
+    "baked and oven dishes",
+    "soups and light broths",
+    "wraps, flatbreads and sandwiches",
+]
+
+_AMOUNT = re.compile(r"(\d+(?:\.\d+)?)\s*(?:g|ml)\b", re.IGNORECASE)
+
+
+def week_day_style(day: int) -> str:
+    return WEEK_DAY_STYLES[day % len(WEEK_DAY_STYLES)]
+
+
+def primary_ingredient(meal: dict) -> str:
+    """Canonical name of the heaviest ingredient (by the grams in its quantity), or the first one."""
+    ingredients = meal.get("ingredients") or []
+    if not ingredients:
+        return ""
+
+    def grams(ingredient):
+        amounts = _AMOUNT.findall(ingredient.get("quantity", ""))
+        return float(amounts[-1]) if amounts else 0.0
+
+    return canonical_ingredient_name(max(ingredients, key=grams)["name"])
+
+
+class UsedMeals:
+    """Meal names and primary ingredients already in the week, kept small enough to send with every day."""
+
+    def __init__(self, avoid_names=()):
+        self.names = {}
+        self.primaries = Counter()
+        for name in avoid_names:
+            self.names.setdefault(canonical_meal_name(name), name)
+
+    def add(self, meals: list):
+        for meal in meals:
+            self.names.setdefault(canonical_meal_name(meal["name"]), meal["name"])
+            primary = primary_ingredient(meal)
+            if primary:
+                self.primaries[primary] += 1
+
+    def summary(self) -> str:
+        """One line of names and one of primary ingredients, or "" while nothing is used yet."""
+        if not self.names:
+            return ""
+        names = list(self.names.values())[-WEEK_PLAN_USED_NAMES_MAX:]
+        lines = f"meals: {', '.join(names)}"
+        if self.primaries:
+            lines += "\nmain ingredients: " + ", ".join(
+                f"{name} x{count}" if count > 1 else name for name, count in self.primaries.most_common()
+            )
+        return lines
+
+
+def find_duplicates(days: list, avoid_names=()) -> list:
+    """(day, index) of every meal to replace, in day order.
+
+    A meal is a duplicate if an earlier meal (or one in `avoid_names`) has
+    the same canonical name, or if its primary ingredient already leads
+    WEEK_PLAN_MAX_PRIMARY_REPEATS earlier meals. The first occurrence always stays.
+    """
+    seen = {canonical_meal_name(name) for name in avoid_names}
+    primaries = Counter()
+    duplicates = []
+    for day, meals in enumerate(days):
+        for index, meal in enumerate(meals):
+            name = canonical_meal_name(meal["name"])
+            primary = primary_ingredient(meal)
+            if name in seen or (primary and primaries[primary] >= WEEK_PLAN_MAX_PRIMARY_REPEATS):
+                duplicates.append((day, index))
+                continue
+            seen.add(name)
+            if primary:
+                primaries[primary] += 1
+    return duplicates